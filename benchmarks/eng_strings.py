@@ -0,0 +1,82 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the vectorized engineering formatting of the plots.
+
+Compares "eng_strings" with a loop of "eng_string" over a column of mixed
+values (magnitudes from 1e-15 to 1e12, both signs and some zeros), and
+checks that both give the same output.
+
+Usage:
+    python benchmarks/eng_strings.py [--size N] [--repeat R]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from smoc.util.text_format import eng_string, eng_strings  # pylint: disable=wrong-import-position
+
+
+def make_values(size, seed=0):
+    """Get a column of mixed values to format.
+
+    Arguments:
+        size (int): number of values.
+        seed (int, optional): seed of the random generator (default: 0).
+
+    Returns:
+        numpy.ndarray: the values.
+    """
+    rng = np.random.RandomState(seed)
+    values = rng.uniform(1, 10, size) * 10.0**rng.randint(-15, 13, size)
+    values *= rng.choice([-1, 1], size)
+    values[rng.rand(size) < 0.01] = 0
+    return values
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=100000, help="values to format")
+    parser.add_argument('--repeat', type=int, default=5, help="timing repetitions")
+    args = parser.parse_args()
+
+    values = make_values(args.size)
+    for sig_figs in (1, 2, 3, 4):
+        for si in (True, False):
+            expected = [eng_string(val, sig_figs, si) for val in values]
+            if list(eng_strings(values, sig_figs, si)) != expected:
+                print(f"Output mismatch (sig_figs={sig_figs}, si={si})")
+                return 1
+
+    scalar = min(timeit.repeat(lambda: [eng_string(val) for val in values],
+                               number=1, repeat=args.repeat))
+    vector = min(timeit.repeat(lambda: eng_strings(values), number=1, repeat=args.repeat))
+
+    print(f"{args.size} values (best of {args.repeat}):")
+    print(f"  eng_string loop: {scalar:.3f}s")
+    print(f"  eng_strings:     {vector:.3f}s ({scalar / vector:.1f}x)")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
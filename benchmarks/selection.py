@@ -0,0 +1,123 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the 'penalty' and 'constrained' selection modes.
+
+Runs both modes on a synthetic problem, answered by a fake client instead of
+the simulator, and compares the number of simulations to find the first
+feasible design. Each design has four variables in [0, 1]. The objectives
+are the sum of the variables and the sum of their squared distances to 1
+(both minimized). The constraints are a band on "GBW" (the product of the
+first two variables, plus 0.5) and a lower limit on "GAIN" (the sum of the
+last two variables). The 'narrow' problem has a very narrow GBW band.
+
+Usage:
+    python benchmarks/selection.py [--seeds N] [--pop-size P] [--max-gen G]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from smoc.optimizer.ga import OptimizerNSGA2  # pylint: disable=wrong-import-position
+
+CIRCUIT_VARS = {key: [0, 1] for key in ('W1', 'W2', 'L1', 'L2')}
+OBJECTIVES = {'AREA': -1.0, 'NOISE': -1.0}
+PROBLEMS = {
+    'moderate': {'GBW': [1.2, 1.4], 'GAIN': [1.6, 'None']},
+    'narrow': {'GBW': [1.2, 1.21], 'GAIN': [1.2, 'None']},
+}
+
+
+class FakeClient:
+    """A client that answers the simulation requests with the synthetic
+    problem, with the same interface as the "socad.Client".
+    """
+
+    def __init__(self):
+        """Create the client."""
+        self.req = None
+
+    def send_data(self, obj):
+        """Store the request, answered by "recv_data"."""
+        self.req = obj
+
+    def recv_data(self):
+        """Answer the last request.
+
+        Returns:
+            dict: response.
+        """
+        data = [dict(AREA=sum(var.values()),
+                     NOISE=sum((1 - val)**2 for val in var.values()),
+                     GBW=var['W1'] * var['W2'] + 0.5,
+                     GAIN=var['L1'] + var['L2']) for var in self.req['data']]
+        return dict(type=self.req['type'], data=data, id=self.req['id'])
+
+
+def first_feasible(constraints, selection, pop_size, max_gen, seed):
+    """Run an optimization and get the simulations to the first feasible design.
+
+    Arguments:
+        constraints (dict): limits of each constraint.
+        selection (str): selection mode.
+        pop_size (int): population size.
+        max_gen (int): number of generations.
+        seed (int): seed of the optimizer.
+
+    Returns:
+        int or None: number of simulations, or None if no feasible design
+            was found.
+    """
+    optimizer = OptimizerNSGA2(OBJECTIVES, constraints, CIRCUIT_VARS, pop_size, max_gen,
+                               FakeClient(), selection=selection, seed=seed)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(io.StringIO()):
+        optimizer.run_ga(os.path.join(tmp_dir, 'cp.pickle'), checkpoint_freq=max_gen + 1,
+                         sel_best=0, verbose=False)
+
+    return optimizer.first_feasible
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seeds', type=int, default=20, help="runs of each mode")
+    parser.add_argument('--pop-size', type=int, default=20, help="population size")
+    parser.add_argument('--max-gen', type=int, default=40, help="number of generations")
+    args = parser.parse_args()
+
+    print(f"Simulations to the first feasible design (pop {args.pop_size}, "
+          f"{args.max_gen} gens, {args.seeds} seeds):")
+    for problem, constraints in PROBLEMS.items():
+        for selection in OptimizerNSGA2.selections:
+            sims = [first_feasible(constraints, selection, args.pop_size, args.max_gen, seed)
+                    for seed in range(args.seeds)]
+            found = [val for val in sims if val is not None]
+            median = f"{statistics.median(found):.0f}" if found else '-'
+            print(f"  {problem:>8} | {selection:>11} | found: {len(found)}/{args.seeds} | "
+                  f"median: {median}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
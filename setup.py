@@ -53,6 +53,7 @@ setup(
     install_requires=[
         'deap>=1.2.2',
         'bokeh>=0.13.0',
+        'numpy>=1.14',
         'pyyaml>=3.13',
         'socad>=0.1.0'
     ],
@@ -19,7 +19,8 @@ import argparse
 import os.path
 import sys
 
-from smoc import smoc
+from smoc import smoc, tuning
+from smoc.optimizer.journal import journal_fname
 
 
 class CustomFormatter(argparse.HelpFormatter):
@@ -89,11 +90,21 @@ def main():
         action='store_true',
         help='run the program in debug mode')
 
+    parser.add_argument(
+        '-t',
+        '--tune',
+        metavar='FILE',
+        dest='tuning_file',
+        default=None,
+        help='tune the optimizer parameters against recorded simulations, with the given '
+        'tuning file')
+
     args = parser.parse_args()
 
     project_file = args.project_file
     checkpoint_file = args.checkpoint_file
     debug = args.debug
+    tuning_file = args.tuning_file
 
     # Print the program license
     print("\nSMOC  Copyright (C) 2018  Miguel Fernandes")
@@ -107,11 +118,20 @@ def main():
     if not os.path.isfile(project_file):
         print("[ERROR] Invalid CONFIG file. Exiting the program...")
         return 11
-    # Check if checkpoint file exists
-    if checkpoint_file and not os.path.isfile(checkpoint_file):
+    # Check if checkpoint file exists (or its journal, if the run stopped in
+    # the initial evaluation)
+    if checkpoint_file and not os.path.isfile(checkpoint_file) \
+            and not os.path.isfile(journal_fname(checkpoint_file)):
         print("[ERROR] Invalid CHECKPOINT file. Exiting the program...")
         return 12
 
+    # Tune the optimizer offline, without the simulator
+    if tuning_file:
+        if not os.path.isfile(tuning_file):
+            print("[ERROR] Invalid TUNING file. Exiting the program...")
+            return 13
+        return tuning.run_tuning(project_file, tuning_file)
+
     # Run the optimizer
     return smoc.run_smoc(project_file, checkpoint_file, debug)
 
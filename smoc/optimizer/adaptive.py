@@ -0,0 +1,172 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Adaptive control of the variation operators."""
+
+import logging
+import random
+
+logger = logging.getLogger('smoc.adaptive')
+
+# Variation operators, stored in the "operator" attribute of the offspring
+CROSSOVER = 'cx'
+MUTATION = 'mut'
+REPRODUCTION = 'rep'
+
+
+def var_or(population, toolbox, lambda_, cx_prob, mut_prob, rng=random):
+    """Vary the population, tagging each offspring with its operator.
+
+    Same as the "deap.algorithms.varOr", but the operator that created each
+    offspring is stored in its "operator" attribute.
+
+    Arguments:
+        population (list): individuals to vary.
+        toolbox (Toolbox): toolbox with the "mate" and "mutate" operators.
+        lambda_ (int): number of children to produce.
+        cx_prob (float): probability of crossover.
+        mut_prob (float): probability of mutation.
+        rng (Random, optional): random generator (default: the "random"
+            module).
+
+    Raises:
+        ValueError: If the sum of the probabilities is greater than 1.
+
+    Returns:
+        list: offspring.
+    """
+    if cx_prob + mut_prob > 1.0:
+        raise ValueError("The sum of the crossover and mutation probabilities must be "
+                         "smaller or equal to 1.0.")
+
+    offspring = []
+    for _ in range(lambda_):
+        op_choice = rng.random()
+        if op_choice < cx_prob:
+            ind1, ind2 = [toolbox.clone(ind) for ind in rng.sample(population, 2)]
+            ind1, ind2 = toolbox.mate(ind1, ind2)
+            del ind1.fitness.values
+            ind1.operator = CROSSOVER
+            offspring.append(ind1)
+        elif op_choice < cx_prob + mut_prob:
+            ind = toolbox.clone(rng.choice(population))
+            ind, = toolbox.mutate(ind)
+            del ind.fitness.values
+            ind.operator = MUTATION
+            offspring.append(ind)
+        else:
+            ind = toolbox.clone(rng.choice(population))
+            ind.operator = REPRODUCTION
+            offspring.append(ind)
+
+    return offspring
+
+
+class OperatorControl:
+    """Adapt the probabilities and distribution indexes of the operators.
+
+    The success of an operator is the fraction of its offspring that survive
+    the selection. The distribution index (eta) of each operator follows the
+    1/5 success rule: if more than 1/5 of the offspring survive, the operator
+    explores more (smaller eta), otherwise it refines (larger eta). The
+    probabilities of crossover and mutation are proportional to the smoothed
+    success of each operator, keeping their sum.
+
+    Arguments:
+        cx_prob (float): initial probability of crossover.
+        mut_prob (float): initial probability of mutation.
+        cx_eta (float): initial crowding degree of the crossover.
+        mut_eta (float): initial crowding degree of the mutation.
+
+    Keyword Arguments:
+        factor (float, optional): multiplicative step of eta (default: 1.2).
+        eta_min (float, optional): min eta (default: 2).
+        eta_max (float, optional): max eta (default: 100).
+        prob_min (float, optional): min fraction of the probabilities given
+            to each operator (default: 0.1).
+        alpha (float, optional): smoothing factor of the success (default: 0.3).
+    """
+
+    def __init__(self, cx_prob, mut_prob, cx_eta, mut_eta, factor=1.2, eta_min=2,
+                 eta_max=100, prob_min=0.1, alpha=0.3):
+        """Create the operator control."""
+        self.prob = {CROSSOVER: cx_prob, MUTATION: mut_prob}
+        self.eta = {CROSSOVER: float(cx_eta), MUTATION: float(mut_eta)}
+        self.total_prob = cx_prob + mut_prob
+        self.factor = factor
+        self.eta_min = eta_min
+        self.eta_max = eta_max
+        self.prob_min = prob_min
+        self.alpha = alpha
+        # Smoothed success of each operator, starting at the 1/5 target
+        self.success = {CROSSOVER: 0.2, MUTATION: 0.2}
+
+    def update(self, gen, offspring, population):
+        """Adapt the operators from the offspring that survived the selection.
+
+        Arguments:
+            gen (int): generation number.
+            offspring (list): offspring of the generation.
+            population (list): population selected for the next generation.
+
+        Returns:
+            dict: success rate of each operator in the generation.
+        """
+        survivors = {id(ind) for ind in population}
+
+        rates = {}
+        for op in (CROSSOVER, MUTATION):
+            created = [ind for ind in offspring if getattr(ind, 'operator', None) == op]
+            if not created:
+                continue
+
+            rate = sum(1 for ind in created if id(ind) in survivors) / len(created)
+            rates[op] = rate
+            self.success[op] = self.alpha * rate + (1 - self.alpha) * self.success[op]
+
+            # 1/5 success rule
+            eta = self.eta[op] / self.factor if rate > 0.2 else self.eta[op] * self.factor
+            self.eta[op] = min(self.eta_max, max(self.eta_min, eta))
+
+        # Probability matching, keeping a min probability for each operator
+        total_success = sum(self.success.values())
+        if total_success > 0:
+            for op in (CROSSOVER, MUTATION):
+                share = self.prob_min + (1 - 2 * self.prob_min) * self.success[op] / total_success
+                self.prob[op] = self.total_prob * share
+
+        logger.info("Generation %d operators | %s", gen, ' | '.join(
+            f"{op}: success={rates[op]:.0%} prob={self.prob[op]:.2f} eta={self.eta[op]:.1f}"
+            if op in rates else f"{op}: no offspring" for op in (CROSSOVER, MUTATION)))
+
+        return rates
+
+    def state(self):
+        """Get the current operator parameters.
+
+        Returns:
+            dict: probabilities, etas and smoothed success of the operators.
+        """
+        return dict(prob=dict(self.prob), eta=dict(self.eta), success=dict(self.success))
+
+    def load_state(self, state):
+        """Restore the operator parameters, e.g. from a checkpoint.
+
+        Arguments:
+            state (dict): state returned by "state".
+        """
+        self.prob = dict(state['prob'])
+        self.eta = dict(state['eta'])
+        self.success = dict(state['success'])
@@ -0,0 +1,434 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""External archive of the non-dominated evaluated individuals."""
+
+import bisect
+import math
+import operator
+import os
+import pickle
+
+
+def archive_fname(checkpoint_fname):
+    """Get the archive file name of a checkpoint file name.
+
+    Arguments:
+        checkpoint_fname (str): checkpoint file name, e.g. "cp_20180909.pickle".
+
+    Returns:
+        str: archive file name, e.g. "cp_20180909.archive".
+    """
+    return os.path.splitext(checkpoint_fname)[0] + '.archive'
+
+
+def covers(point1, point2):
+    """Check if a point weakly dominates another (maximization).
+
+    Arguments:
+        point1 (tuple): first point.
+        point2 (tuple): second point.
+
+    Returns:
+        bool: True if the first point is not worse in all objectives.
+    """
+    return all(map(operator.ge, point1, point2))
+
+
+class SortedFront:
+    """Bi-objective non-dominated front, sorted by the first objective.
+
+    As the front is sorted by the first objective, it's sorted in the reverse
+    order by the second one, so the points that dominate or are dominated by a
+    new point are found with a binary search.
+    """
+
+    def __init__(self):
+        """Create the empty front."""
+        self.first = []    # First objective of each point, in ascending order
+        self.second = []   # Symmetric of the second objective, in ascending order
+        self.items = []
+
+    def __len__(self):
+        """Number of points in the front."""
+        return len(self.items)
+
+    def update(self, point, item):
+        """Insert a point, if not dominated, removing the points it dominates.
+
+        Arguments:
+            point (tuple): objectives to maximize.
+            item (object): item of the point.
+
+        Returns:
+            bool: True if the point was inserted.
+        """
+        first, second = point[0], -point[1]
+
+        # The point with the largest second objective among the points with a
+        # larger first objective is the only one that may cover the new point
+        start = bisect.bisect_left(self.first, first)
+        if start < len(self.first) and self.second[start] <= second:
+            return False
+
+        # The dominated points are contiguous, with a smaller first objective
+        # and a smaller second objective
+        low = bisect.bisect_left(self.second, second)
+        up = bisect.bisect_right(self.first, first)
+        del self.first[low:up], self.second[low:up], self.items[low:up]
+
+        self.first.insert(low, first)
+        self.second.insert(low, second)
+        self.items.insert(low, item)
+
+        return True
+
+    def members(self):
+        """Get the items of the front.
+
+        Returns:
+            list: items, sorted by the first objective.
+        """
+        return list(self.items)
+
+    def clear(self):
+        """Remove all the points."""
+        self.__init__()
+
+
+class Node:
+    """Node of a ND-tree, with the bounds of the points below it."""
+
+    def __init__(self):
+        """Create an empty leaf."""
+        self.children = []  # Empty in the leaves
+        self.points = []    # (point, item) of a leaf
+        self.ideal = None   # Best value of each objective below the node
+        self.nadir = None   # Worst value of each objective below the node
+
+    def is_empty(self):
+        """Check if the node has no points below it."""
+        return not self.children and not self.points
+
+    def extend(self, point):
+        """Extend the bounds of the node with a new point.
+
+        Arguments:
+            point (tuple): point.
+        """
+        if self.ideal is None:
+            self.ideal, self.nadir = tuple(point), tuple(point)
+        else:
+            self.ideal = tuple(map(max, self.ideal, point))
+            self.nadir = tuple(map(min, self.nadir, point))
+
+    def distance(self, point):
+        """Distance between a point and the middle of the node bounds."""
+        return math.sqrt(sum(((low + up) / 2 - val) ** 2
+                             for low, up, val in zip(self.nadir, self.ideal, point)))
+
+
+class NDTree:
+    """Non-dominated front in a ND-tree (Jaszkiewicz and Lust, 2018).
+
+    Each node keeps the ideal and nadir points of the points below it, so a new
+    point is only compared with the points of the nodes whose bounds may
+    dominate or be dominated by it. The bounds are not shrunk when the points
+    are removed, as they still bound the remaining points.
+
+    Keyword Arguments:
+        max_leaf (int, optional): max points in a leaf. A full leaf is split
+            in "num_children" leaves (default: 20).
+        num_children (int or None, optional): children of a split leaf. If
+            None, it's the number of objectives plus one (default: None).
+    """
+
+    def __init__(self, max_leaf=20, num_children=None):
+        """Create the empty tree."""
+        self.max_leaf = max_leaf
+        self.num_children = num_children
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        """Number of points in the tree."""
+        return self.size
+
+    def update(self, point, item):
+        """Insert a point, if not dominated, removing the points it dominates.
+
+        Arguments:
+            point (tuple): objectives to maximize.
+            item (object): item of the point.
+
+        Returns:
+            bool: True if the point was inserted.
+        """
+        point = tuple(point)
+        if self.root is not None:
+            if not self.update_node(self.root, point):
+                return False
+            if self.root.is_empty():
+                self.root = None
+
+        if self.root is None:
+            self.root = Node()
+        self.insert(self.root, point, item)
+        self.size += 1
+
+        return True
+
+    def update_node(self, node, point):
+        """Remove the points of a node dominated by a new point.
+
+        Arguments:
+            node (Node): node.
+            point (tuple): new point.
+
+        Returns:
+            bool: False if the new point is covered by a point of the node.
+        """
+        if covers(node.nadir, point):
+            return False  # All points of the node cover the new point
+        if covers(point, node.ideal) and point != node.ideal:
+            self.size -= self.count(node)  # The new point dominates all points
+            node.children, node.points = [], []
+            return True
+        if not covers(node.ideal, point) and not covers(point, node.nadir):
+            return True  # No point of the node is comparable with the new point
+
+        if not node.children:
+            for other, _ in node.points:
+                if covers(other, point):
+                    return False
+            num_points = len(node.points)
+            node.points = [entry for entry in node.points if not covers(point, entry[0])]
+            self.size -= num_points - len(node.points)
+            return True
+
+        for child in list(node.children):
+            if not self.update_node(child, point):
+                return False
+            if child.is_empty():
+                node.children.remove(child)
+
+        return True
+
+    def insert(self, node, point, item):
+        """Insert a non-dominated point in the closest leaf below a node.
+
+        Arguments:
+            node (Node): node.
+            point (tuple): new point.
+            item (object): item of the point.
+        """
+        while node.children:
+            node.extend(point)
+            node = min(node.children, key=lambda child: child.distance(point))
+
+        node.extend(point)
+        node.points.append((point, item))
+        if len(node.points) > self.max_leaf:
+            self.split(node)
+
+    def split(self, leaf):
+        """Split a full leaf, spreading its points by the farthest ones.
+
+        Arguments:
+            leaf (Node): full leaf.
+        """
+        points = leaf.points
+        num_children = min(self.num_children or len(points[0][0]) + 1, len(points))
+
+        def dist(idx1, idx2):
+            return math.sqrt(sum((val1 - val2) ** 2
+                                 for val1, val2 in zip(points[idx1][0], points[idx2][0])))
+
+        # The first seed is the point farthest from the others, and the next
+        # ones are the points farthest from the seeds
+        others = list(range(len(points)))
+        seeds = [max(others, key=lambda idx: sum(dist(idx, other) for other in others))]
+        while len(seeds) < num_children:
+            others = [idx for idx in others if idx not in seeds]
+            seeds.append(max(others, key=lambda idx: sum(dist(idx, seed) for seed in seeds)))
+
+        leaf.points = []
+        for idx in seeds:
+            child = Node()
+            child.extend(points[idx][0])
+            child.points.append(points[idx])
+            leaf.children.append(child)
+
+        for idx in range(len(points)):
+            if idx not in seeds:
+                point = points[idx][0]
+                child = min(leaf.children, key=lambda child: child.distance(point))
+                child.extend(point)
+                child.points.append(points[idx])
+
+    @staticmethod
+    def count(node):
+        """Count the points below a node."""
+        if not node.children:
+            return len(node.points)
+        return sum(NDTree.count(child) for child in node.children)
+
+    def members(self):
+        """Get the items of the tree.
+
+        Returns:
+            list: items.
+        """
+        items = []
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+            items.extend(item for _, item in node.points)
+
+        return items
+
+    def clear(self):
+        """Remove all the points."""
+        self.root = None
+        self.size = 0
+
+
+class Archive:
+    """Unbounded archive of the non-dominated evaluated individuals.
+
+    Every evaluated individual is offered to the archive, so the non-dominated
+    designs found along the optimization are kept even if the selection drops
+    them. With two objectives the archive is a sorted front, and with more
+    objectives a ND-tree, so the insertion stays fast with large archives.
+
+    The individuals inserted in the archive are appended to its file after
+    each batch, and the file is rewritten with the current members when
+    "save" is called (e.g. with the checkpoints).
+
+    Arguments:
+        num_obj (int): number of objectives.
+
+    Keyword Arguments:
+        fname (str or None, optional): archive file path. If None, the archive
+            is not saved (default: None).
+        constrained (bool, optional): use the constraint-domination, i.e. the
+            archive only keeps the individuals with the smallest "violation"
+            (the feasible ones, if any) (default: False).
+        max_leaf (int, optional): max points in a leaf of the ND-tree
+            (default: 20).
+        num_children (int or None, optional): children of a split leaf of the
+            ND-tree. If None, it's the number of objectives plus one
+            (default: None).
+    """
+
+    def __init__(self, num_obj, fname=None, constrained=False, max_leaf=20, num_children=None):
+        """Create the empty archive."""
+        self.fname = fname
+        self.constrained = constrained
+        if num_obj == 2:
+            self.front = SortedFront()
+        else:
+            self.front = NDTree(max_leaf, num_children)
+        self.violation = math.inf  # Violation of the members
+
+    def __len__(self):
+        """Number of members."""
+        return len(self.front)
+
+    def insert(self, ind):
+        """Insert an evaluated individual, if it's not dominated by a member.
+
+        Arguments:
+            ind (Individual): evaluated individual.
+
+        Returns:
+            bool: True if the individual was inserted.
+        """
+        if not ind.fitness.valid:
+            return False
+
+        violation = ind.violation if self.constrained else 0.0
+        if violation > self.violation:
+            return False
+        if violation < self.violation:
+            # Dominates all members, e.g. the first feasible individual
+            self.front.clear()
+            self.violation = violation
+
+        return self.front.update(ind.fitness.wvalues, ind)
+
+    def add(self, individuals):
+        """Insert evaluated individuals, appending the inserted ones to the file.
+
+        Arguments:
+            individuals (list): evaluated individuals.
+
+        Returns:
+            int: number of inserted individuals.
+        """
+        inserted = [ind for ind in individuals if self.insert(ind)]
+        if inserted and self.fname is not None:
+            with open(self.fname, 'ab') as f:
+                pickle.dump(inserted, f)
+
+        return len(inserted)
+
+    def members(self):
+        """Get the members of the archive.
+
+        Returns:
+            list: non-dominated individuals.
+        """
+        return self.front.members()
+
+    def load(self, fname):
+        """Insert the individuals of an archive file.
+
+        A truncated last record (e.g. a crash while writing) is ignored.
+
+        Arguments:
+            fname (str): archive file path.
+
+        Returns:
+            int: number of members after loading, or 0 if the file doesn't
+                exist.
+        """
+        if not os.path.isfile(fname):
+            return 0
+
+        with open(fname, 'rb') as f:
+            while True:
+                try:
+                    individuals = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                for ind in individuals:
+                    self.insert(ind)
+
+        return len(self)
+
+    def save(self):
+        """Rewrite the file with the current members, dropping the dominated ones.
+
+        The file is replaced atomically, so a crash keeps the previous archive.
+        """
+        if self.fname is None:
+            return
+
+        tmp_fname = self.fname + '.tmp'
+        with open(tmp_fname, 'wb') as f:
+            pickle.dump(self.members(), f)
+        os.replace(tmp_fname, self.fname)
@@ -0,0 +1,367 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Batch Bayesian optimization with Gaussian processes."""
+
+import logging
+import math
+import time
+
+import numpy as np
+from deap import tools
+
+from ..util.text_format import time_string
+from .ga import BudgetExceeded, OptimizerNSGA2
+from .gp import GaussianProcess
+from .indicators import hypervolume, reference_point
+
+logger = logging.getLogger('smoc.bayes')
+
+
+class OptimizerBayes(OptimizerNSGA2):
+    """A simulation-based circuit optimizer for small simulation budgets.
+
+    Each objective and constraint measurement is modeled by a Gaussian process,
+    fitted to all the simulated designs. At each iteration, a batch of designs
+    is selected with Thompson sampling: for each design of the batch, the
+    models are sampled jointly on random candidates, and the candidate with the
+    largest hypervolume improvement of the sampled feasible front is selected
+    (its sampled objectives join the front, so the batch is spread). The batch
+    is simulated in one request, so its size ("lambda", i.e. the "pop_size" by
+    default) should match the parallel jobs of the simulator.
+
+    The evaluation, constraint handling, checkpoints and plots are the ones of
+    the "OptimizerNSGA2". The "population" has all the simulated designs, and
+    "max_gen" is the number of iterations after the initial sample. The
+    candidates are always compared by their violation first, so only the
+    "constrained" selection is supported, and the island migration, local
+    search and adaptive operators of the evolutionary loop aren't.
+
+    Arguments:
+        *args: arguments of the "OptimizerNSGA2".
+        init_size (int or None, optional): designs of the initial Latin
+            hypercube sample. If None, it's the "pop_size" (default: None).
+        candidates (int, optional): random candidates of each sample, half of
+            them around the designs of the front (default: 500).
+        **kwargs: keyword arguments of the "OptimizerNSGA2".
+    """
+
+    selections = ('constrained',)
+    loop_options = False
+
+    def __init__(self, *args, init_size=None, candidates=500, **kwargs):
+        """Create the Bayesian Optimizer."""
+        super().__init__(*args, **kwargs)
+
+        self.init_size = init_size or self.pop_size
+        self.num_candidates = candidates
+        self.weights = np.array(list(self.objectives.values()), dtype=float)
+        self.keys = list(dict.fromkeys(list(self.objectives) + list(self.constraints)))
+
+        self.low = np.array(self.bound_low)
+        self.span = np.array(self.bound_up) - self.low
+
+    def make_individual(self, point):
+        """Create an individual from a normalized point.
+
+        Arguments:
+            point (ndarray): variables normalized to [0, 1].
+
+        Returns:
+            Individual: individual, snapped to the grid of the variables.
+        """
+        ind = self.individual_class((self.low + point * self.span).tolist())
+        if self.grid is not None:
+            self.grid.snap(ind)
+
+        return ind
+
+    def latin_hypercube(self, size):
+        """Create the initial sample, spread over the design space.
+
+        Arguments:
+            size (int): number of designs.
+
+        Returns:
+            list: individuals.
+        """
+        points = np.empty((size, len(self.circuit_vars)))
+        for col in range(points.shape[1]):
+            strata = self.rng.sample(range(size), size)
+            points[:, col] = [(stratum + self.rng.random()) / size for stratum in strata]
+
+        return [self.make_individual(point) for point in points]
+
+    def objective_values(self, results):
+        """Get the objectives to maximize of simulation results.
+
+        Arguments:
+            results (list): simulation results (dict).
+
+        Returns:
+            ndarray: weighted objectives, one row per result.
+        """
+        values = [[res.get(key, math.nan) for key in self.objectives] for res in results]
+        return np.array(values, dtype=float).reshape(len(results), len(self.weights)) \
+            * self.weights
+
+    def fit_models(self, population):
+        """Fit a Gaussian process to each measurement of the simulated designs.
+
+        The failed measurements ("nan") are not used. A measurement without
+        enough results has no model, so it's always missing in the samples.
+
+        Arguments:
+            population (list): simulated individuals.
+
+        Returns:
+            dict: Gaussian process of each measurement.
+        """
+        points = (np.array([list(ind) for ind in population]) - self.low) / self.span
+
+        models = {}
+        for key in self.keys:
+            values = np.array([ind.result.get(key, math.nan) for ind in population], dtype=float)
+            valid = np.isfinite(values)
+            if valid.sum() < 2:
+                continue
+            model = GaussianProcess()
+            try:
+                model.fit(points[valid], values[valid])
+            except ValueError:
+                continue
+            models[key] = model
+
+        return models
+
+    def candidates(self, front_points, np_rng):
+        """Create random candidates, half of them around the front designs.
+
+        Arguments:
+            front_points (ndarray): normalized variables of the front designs.
+            np_rng (RandomState): NumPy random generator.
+
+        Returns:
+            ndarray: normalized candidates.
+        """
+        num_vars = len(self.circuit_vars)
+        if not len(front_points):
+            return np_rng.rand(self.num_candidates, num_vars)
+
+        num_local = self.num_candidates // 2
+        centers = front_points[np_rng.randint(len(front_points), size=num_local)]
+        local = np.clip(centers + 0.05 * np_rng.randn(num_local, num_vars), 0, 1)
+
+        return np.vstack([np_rng.rand(self.num_candidates - num_local, num_vars), local])
+
+    def select_candidate(self, sample, front, ref, np_rng):
+        """Select the best candidate of a sample of the models.
+
+        The feasible candidate with the largest hypervolume improvement of the
+        front is selected. If no candidate improves the front, the best one of
+        a random weighted Tchebycheff scalarization is selected, and if no
+        candidate is feasible, the one with the smallest violation.
+
+        Arguments:
+            sample (dict): sampled values of each measurement on the candidates.
+            front (list): objectives of the front (to maximize).
+            ref (list): hypervolume reference point (minimization space).
+            np_rng (RandomState): NumPy random generator.
+
+        Returns:
+            tuple: index of the selected candidate and its sampled objectives.
+        """
+        num_cand = len(next(iter(sample.values())))
+        results = [{key: (sample[key][idx] if key in sample else math.nan) for key in self.keys}
+                   for idx in range(num_cand)]
+        objectives = self.objective_values(results)
+        violations = np.array([self.violation(res) for res in results])
+
+        feasible = np.flatnonzero((violations == 0) & np.isfinite(objectives).all(axis=1))
+        if not len(feasible):
+            idx = int(np.where(np.isnan(violations), np.inf, violations).argmin())
+            return idx, objectives[idx]
+
+        # Only the candidates not dominated by the front can improve it
+        front_arr = np.array(front, dtype=float).reshape(len(front), len(self.weights))
+        base_hv = hypervolume(front, ref) if front else 0.0
+        best, best_hvi = None, 0.0
+        for idx in feasible:
+            point = objectives[idx]
+            if len(front_arr) and (front_arr >= point).all(axis=1).any():
+                continue
+            hvi = hypervolume(front + [point.tolist()], ref) - base_hv
+            if hvi > best_hvi:
+                best, best_hvi = idx, hvi
+
+        if best is None:
+            scale = np.ptp(objectives[feasible], axis=0)
+            scaled = (objectives[feasible] - objectives[feasible].min(axis=0)) \
+                / np.where(scale > 0, scale, 1)
+            weights = np_rng.dirichlet(np.ones(len(self.weights)))
+            best = feasible[int((weights * scaled).min(axis=1).argmax())]
+
+        return int(best), objectives[best]
+
+    def propose(self, population, batch_size):
+        """Select the next batch of designs to simulate.
+
+        Arguments:
+            population (list): simulated individuals.
+            batch_size (int): number of designs of the batch.
+
+        Returns:
+            list: individuals of the batch.
+        """
+        np_rng = np.random.RandomState(self.rng.getrandbits(32))
+        models = self.fit_models(population)
+
+        objectives = self.objective_values([ind.result for ind in population])
+        feasible = [idx for idx, ind in enumerate(population)
+                    if self.violation(ind.result) == 0 and np.isfinite(objectives[idx]).all()]
+        front_inds = tools.sortLogNondominated([population[idx] for idx in feasible],
+                                               len(feasible), first_front_only=True) \
+            if feasible else []
+        front = self.objective_values([ind.result for ind in front_inds]).tolist()
+        ref_values = objectives[feasible] if feasible else \
+            objectives[np.isfinite(objectives).all(axis=1)]
+        ref = reference_point(ref_values.tolist()) if len(ref_values) else None
+
+        if not models or ref is None:
+            logger.info("Not enough results to fit the models, sampling at random")
+            return self.latin_hypercube(batch_size)
+
+        # Without feasible designs, the candidates are taken around the least
+        # infeasible ones
+        if front_inds:
+            centers = front_inds
+        else:
+            centers = sorted(population, key=lambda ind: self.violation(ind.result))[:5]
+        front_points = (np.array([list(ind) for ind in centers]) - self.low) / self.span
+
+        batch = []
+        for _ in range(batch_size):
+            cand = self.candidates(front_points, np_rng)
+            sample = {key: model.sample(cand, np_rng) for key, model in models.items()}
+            idx, point = self.select_candidate(sample, front, ref, np_rng)
+            if np.isfinite(point).all():
+                front.append(point.tolist())
+            batch.append(self.make_individual(cand[idx]))
+
+        return batch
+
+    def ga_mu_plus_lambda(self, mu, lambda_, checkpoint_load, checkpoint_fname,
+                          checkpoint_freq, sel_best, verbose):
+        """The batch Bayesian optimization loop.
+
+        Replaces the evolutionary algorithm of the "OptimizerNSGA2": the
+        initial sample is simulated, and at each iteration a batch of
+        "lambda_" designs is selected and simulated.
+
+        Arguments:
+            mu (int): not used (all the simulated designs are kept).
+            lambda_ (int): designs simulated in each iteration.
+            checkpoint_load (str or None): checkpoint file to load, if provided.
+                If the journal is enabled, an iteration recorded in the journal
+                of the checkpoint is continued.
+            checkpoint_fname (str): name of the checkpoint file to save.
+            checkpoint_freq (str): checkpoint saving frequency (relative to gen).
+            sel_best (int): not used.
+            verbose (bool): not used.
+
+        Returns:
+            tuple: all the simulated designs and the logbook.
+        """
+        stats = self.statistics()
+        cp, replay = self.start_run(checkpoint_load, checkpoint_fname)
+
+        if replay is not None and replay['generation'] > 0:
+            population, logbook = self.restore(replay)
+            start_gen = replay['generation']
+
+        elif cp is not None:
+            population, logbook = self.restore(cp)
+            start_gen = cp['generation'] + 1
+            logger.info("Running from a checkpoint | simulated designs: %d | iteration: %d",
+                        len(population), start_gen)
+
+        else:  # Simulate the initial sample
+            if replay is not None:
+                _, logbook = self.restore(replay)
+                population = replay['offspring']
+                self.journal.begin(replay)
+            else:
+                population = self.latin_hypercube(self.init_size)
+                logbook = tools.Logbook()
+                logbook.header = 'gen', 'evals', 'population', 'fitness', 'result'
+                if self.journal is not None:
+                    self.journal.begin(self.checkpoint(0, None, logbook, offspring=population))
+            start_gen = 1
+
+            invalid_inds = [ind for ind in population if not ind.fitness.valid]
+            logger.info("Starting the initial sample | evaluations: %d", len(invalid_inds))
+            start_time = time.time()
+            num_sims = self.evaluate(invalid_inds, offspring=population)
+
+            with self.profiler.span('statistics'):
+                logbook.record(gen=0, evals=num_sims, **stats.compile(population))
+            if self.dashboard is not None:
+                self.update_dashboard(0, invalid_inds, population)
+            self.profiler.end_generation(0)
+            logger.info("Finished the initial sample. Elapsed time: %s\n",
+                        time_string(time.time() - start_time))
+
+        for gen in range(start_gen, self.max_gen + 1):
+            if replay is not None and gen == replay['generation']:
+                batch = replay['offspring']
+                self.journal.begin(replay)
+            else:
+                with self.profiler.span('acquisition'):
+                    batch = self.propose(population, lambda_)
+                if self.journal is not None:
+                    self.journal.begin(self.checkpoint(gen, population, logbook,
+                                                       offspring=batch))
+
+            invalid_inds = [ind for ind in batch if not ind.fitness.valid]
+            logger.info("Starting iteration %d/%d | evaluations: %d", gen, self.max_gen,
+                        len(invalid_inds))
+            start_time = time.time()
+
+            try:
+                num_sims = self.evaluate(invalid_inds, population, batch)
+            except BudgetExceeded as err:
+                logger.warning("Stopping at iteration %d: %s", gen, err)
+                break
+
+            population = population + batch
+
+            with self.profiler.span('statistics'):
+                logbook.record(gen=gen, evals=num_sims, **stats.compile(population))
+
+            if gen % checkpoint_freq == 0:
+                self.save_checkpoint(checkpoint_fname, gen, population, logbook)
+
+            feasible = sum(1 for ind in population if self.violation(ind.result) == 0)
+            logger.info("Finished iteration. Elapsed time: %s | simulated: %d | feasible: %d\n",
+                        time_string(time.time() - start_time), len(population), feasible)
+
+            if self.dashboard is not None:
+                self.update_dashboard(gen, invalid_inds, population)
+
+            self.profiler.end_generation(gen)
+
+        self.end_run()
+
+        return population, logbook
@@ -0,0 +1,123 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Elimination of duplicated individuals before the simulation."""
+
+import copy
+import logging
+
+logger = logging.getLogger('smoc.dedup')
+
+MODES = ('copy', 'regenerate')
+
+
+class Deduplicator:
+    """Find the individuals whose design was already (or is being) simulated.
+
+    The design vectors are quantized with a resolution relative to the range
+    of each variable, so near-duplicates have the same key in a hash index. A
+    duplicate either copies the results of the evaluated individual with the
+    same key ('copy'), or is mutated until it is distinct ('regenerate',
+    copying the results if it is still a duplicate after "max_retries").
+
+    Arguments:
+        toolbox (Toolbox): toolbox with the "mutate" operator.
+        bound_low (list): lower bounds of the circuit variables.
+        bound_up (list): upper bounds of the circuit variables.
+
+    Keyword Arguments:
+        mode (str, optional): 'copy' or 'regenerate' (default: 'copy').
+        resolution (float, optional): quantization step, relative to the
+            variables range (default: 1e-6).
+        max_retries (int, optional): max mutations to regenerate a duplicate
+            (default: 10).
+
+    Raises:
+        ValueError: If the mode is invalid.
+    """
+
+    def __init__(self, toolbox, bound_low, bound_up, mode='copy', resolution=1e-6,
+                 max_retries=10):
+        """Create the deduplicator."""
+        if mode not in MODES:
+            raise ValueError(f"Invalid deduplication mode '{mode}' (valid modes: {MODES})")
+
+        self.toolbox = toolbox
+        self.bound_low = bound_low
+        self.quanta = [(up - low) * resolution or resolution
+                       for low, up in zip(bound_low, bound_up)]
+        self.mode = mode
+        self.max_retries = max_retries
+        self.saved = 0  # Simulations saved in the whole run
+
+    def key(self, ind):
+        """Get the hash key of the quantized design vector of an individual.
+
+        Arguments:
+            ind (Individual): individual.
+
+        Returns:
+            tuple: quantized design vector.
+        """
+        return tuple(round((val - low) / quantum)
+                     for val, low, quantum in zip(ind, self.bound_low, self.quanta))
+
+    def unique(self, individuals, evaluated=()):
+        """Get the individuals that must be simulated.
+
+        Arguments:
+            individuals (list): individuals to evaluate.
+            evaluated (list, optional): evaluated individuals, e.g. the current
+                population (default: ()).
+
+        Returns:
+            tuple: individuals to simulate, and (duplicate, original) pairs
+                whose results are copied after the simulation.
+        """
+        index = {self.key(ind): ind for ind in evaluated if ind.fitness.valid}
+
+        unique = []
+        duplicates = []
+        for ind in individuals:
+            key = self.key(ind)
+
+            if key in index and self.mode == 'regenerate':
+                for _ in range(self.max_retries):
+                    self.toolbox.mutate(ind)
+                    key = self.key(ind)
+                    if key not in index:
+                        break
+
+            if key in index:
+                duplicates.append((ind, index[key]))
+            else:
+                index[key] = ind
+                unique.append(ind)
+
+        self.saved += len(duplicates)
+
+        return unique, duplicates
+
+    @staticmethod
+    def copy_results(duplicates):
+        """Copy the evaluation of the originals to the duplicates.
+
+        Arguments:
+            duplicates (list): (duplicate, original) pairs.
+        """
+        for ind, orig in duplicates:
+            ind.fitness.values = orig.fitness.values
+            ind.result = copy.copy(orig.result)
+            ind.violation = orig.violation
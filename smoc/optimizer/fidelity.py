@@ -0,0 +1,183 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Multi-fidelity evaluation, with cheap simulation stages before the full one."""
+
+import logging
+import math
+
+logger = logging.getLogger('smoc.fidelity')
+
+
+class WorstObjectives:
+    """Worst value found for each objective, to complete the results of the
+    designs without a valid value.
+
+    The designs rejected by a cheap stage don't have the objectives, and the
+    failed simulations have them as NaN. Both get the worst value found in the
+    full simulations (or -1/1 for a maximized/minimized objective if there are
+    no full simulations yet), so the penalty makes them worse than any design
+    with valid results, instead of NaN fitnesses that are never dominated.
+
+    Arguments:
+        objectives (dict): optimization objectives (fitness weights).
+    """
+
+    def __init__(self, objectives):
+        """Create the worst objective values."""
+        self.objectives = objectives
+        self.worst = {}
+
+    def update(self, res):
+        """Update the worst objective values with the results of a full simulation.
+
+        Arguments:
+            res (dict): simulation results of one individual.
+        """
+        for key, weight in self.objectives.items():
+            val = res.get(key)
+            if val is None or not math.isfinite(val):
+                continue
+            if key not in self.worst:
+                self.worst[key] = val
+            elif weight < 0:  # Minimize
+                self.worst[key] = max(self.worst[key], val)
+            else:
+                self.worst[key] = min(self.worst[key], val)
+
+    def complete(self, res):
+        """Replace the missing or non-finite objectives of an individual.
+
+        Arguments:
+            res (dict): simulation results of one individual.
+
+        Returns:
+            dict: results with a finite value in all the objectives.
+        """
+        missing = {key: self.worst.get(key, -math.copysign(1.0, weight))
+                   for key, weight in self.objectives.items()
+                   if res.get(key) is None or not math.isfinite(res[key])}
+
+        return dict(res, **missing) if missing else res
+
+
+class MultiFidelity:
+    """Reject the designs that fail the constraints of cheap simulation stages.
+
+    Each stage simulates the designs that passed the previous stages with the
+    analyses of its server run file (e.g. only the DC operating point), and
+    checks the constraints that can be computed from its results. Only the
+    designs that fulfill them are simulated in the next stage, and the last
+    stage is the full simulation. The rejected designs keep the results of the
+    stage that rejected them, so their penalty only has the checked constraints,
+    and their missing objectives get the worst value found in the full
+    simulations.
+
+    Arguments:
+        simulate (callable): simulates a list of individuals, given the stage
+            name in the "stage" keyword, the constraints to extract in the
+            "measurements" keyword and the analyses to disable in the
+            "disable" keyword, and returns their results.
+        penalty (callable): computes the penalty of the results of an
+            individual, given the constraints to check.
+        objectives (dict): optimization objectives (fitness weights).
+        constraints (dict): optimization constraints.
+        stages (list): cheap stages, in the simulation order. Each stage is a
+            dictionary with its 'name' (the stage of the server run file), the
+            'constraints' checked with its results and the analyses to
+            'disable' during its run (optional, e.g. [ac, noise, tran]).
+
+    Raises:
+        ValueError: If a stage is invalid.
+    """
+
+    def __init__(self, simulate, penalty, objectives, constraints, stages):
+        """Create the multi-fidelity evaluation."""
+        self.simulate = simulate
+        self.penalty = penalty
+        self.objectives = objectives
+        self.stages = []
+        self.measurements = {}  # Measurements extracted by each stage
+        self.disable = {}  # Analyses disabled by each stage
+
+        checked = []
+        for stage in stages:
+            name = stage.get('name')
+            if not name or name in (stage_name for stage_name, _ in self.stages):
+                raise ValueError(f"Invalid or repeated fidelity stage name '{name}'")
+
+            unknown = set(stage.get('constraints', ())) - set(constraints)
+            if unknown:
+                raise ValueError(f"Unknown constraints of the fidelity stage '{name}': "
+                                 f"{', '.join(sorted(unknown))}")
+
+            disable = stage.get('disable', [])
+            if not isinstance(disable, list) or \
+                    not all(isinstance(analysis, str) for analysis in disable):
+                raise ValueError(f"The analyses to disable in the fidelity stage '{name}' "
+                                 f"must be a list of names")
+            self.disable[name] = disable
+
+            checked.extend(key for key in stage.get('constraints', ()) if key not in checked)
+            self.stages.append((name, {key: constraints[key]
+                                       for key in stage.get('constraints', ())}))
+            # A stage extracts the constraints checked up to it, so the results
+            # of the designs it rejects have the constraints of all its stages
+            self.measurements[name] = list(checked)
+
+        # Worst value of each objective in the full simulations
+        self.worst = WorstObjectives(objectives)
+        self.rejected = {name: 0 for name, _ in self.stages}  # Rejected in the whole run
+
+    def run(self, individuals):
+        """Simulate the individuals through the stages.
+
+        Arguments:
+            individuals (list): individuals to simulate.
+
+        Returns:
+            list: simulation results of each individual, from the full
+                simulation or from the stage that rejected it.
+        """
+        sim_res = [None] * len(individuals)
+        survivors = list(range(len(individuals)))
+
+        for name, constraints in self.stages:
+            if not survivors:
+                break
+
+            stage_res = self.simulate([individuals[idx] for idx in survivors], stage=name,
+                                      measurements=self.measurements[name],
+                                      disable=self.disable[name])
+
+            passed = []
+            for idx, res in zip(survivors, stage_res):
+                if self.penalty(res, constraints) > 0:
+                    sim_res[idx] = res
+                else:
+                    passed.append(idx)
+
+            logger.info("Fidelity stage %s | simulated: %d | rejected: %d", name,
+                        len(survivors), len(survivors) - len(passed))
+            self.rejected[name] += len(survivors) - len(passed)
+            survivors = passed
+
+        if survivors:
+            full_res = self.simulate([individuals[idx] for idx in survivors])
+            for idx, res in zip(survivors, full_res):
+                sim_res[idx] = res
+                self.worst.update(res)
+
+        return sim_res
@@ -15,19 +15,42 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 """NSGA-II genetic algorithm using DEAP."""
 
-import array
 import copy
 import logging
 import math
+import os
 import random
 import time
 
-from deap import algorithms, base, creator, tools
+from deap import base, tools
 
 from ..util import file
+from ..util.profiling import Profiler
+from ..util.progress import ProgressMonitor
+from ..util.text_format import time_string
+from .adaptive import CROSSOVER, MUTATION, OperatorControl, var_or
+from .archive import Archive, archive_fname
+from .dedup import Deduplicator
+from .fidelity import MultiFidelity, WorstObjectives
+from .grid import VariableGrid
+from .individual import create_legacy_classes, individual_class
+from .indicators import hypervolume, reference_point
+from .journal import Journal, journal_fname
+from .local_search import LocalSearch
+from .montecarlo import YIELD_KEY, YieldEstimator
+from .operators import cx_simulated_binary_bounded, mut_polynomial_bounded
+from .selection import sel_constrained_nsga2, sort_constrained_fronts
 
 logger = logging.getLogger('smoc.ga')
 
+# Constraint handling modes
+SELECTIONS = ('penalty', 'constrained')
+
+
+class BudgetExceeded(Exception):
+    """The server refused the simulations, due to its budget or deadline."""
+
+
 # Organize everything in the class
 class OptimizerNSGA2:
     """A simulation-based circuit optimizer based on the NSGA-II algorithm.
@@ -59,16 +82,99 @@ class OptimizerNSGA2:
             individual penalty. Changes the variation rate of the fitness
             penalty with the distance from a valid value (default: 1).
         debug (bool, optional): debug (default: False).
+        montecarlo_cfg (dict or None, optional): Monte-Carlo yield estimation
+            parameters, passed to "YieldEstimator". The yield is stored in the
+            "YIELD" simulation result, which can be used as an objective or
+            constraint. If None, the yield is not estimated (default: None).
+        profiler (Profiler or None, optional): profiler that measures the
+            timing spans of the optimization. If None, a profiler without
+            metrics file is used (default: None).
+        dashboard (Dashboard or None, optional): live dashboard updated at each
+            generation. If None, there's no live dashboard (default: None).
+        migrator (callable or None, optional): island migration, called after
+            the selection of each generation with the generation, population
+            and selection operator, and returns the new population. If None,
+            there's no migration (default: None).
+        selection (str, optional): constraint handling. In 'penalty', the
+            fitness of the invalid individuals is penalized. In 'constrained',
+            the fitness is not penalized and the NSGA-II selection uses the
+            constraint-domination. If None, the first selection of the engine
+            ('penalty' in NSGA-II) (default: None).
+        mut_indpb (float or None, optional): independent probability of
+            mutation of each circuit variable. If None, uses the "mut_prob"
+            (default: None).
+        adaptive (bool, optional): adapt the probabilities and crowding
+            degrees of the crossover and mutation to their success along the
+            optimization (default: False).
+        local_search_cfg (dict or None, optional): parameters of the pattern
+            search that refines the pareto front, passed to "LocalSearch". If
+            None, there's no local search (default: None).
+        dedup_cfg (dict or None, optional): parameters of the elimination of
+            duplicated individuals, passed to "Deduplicator". If None, all the
+            individuals with an invalid fitness are simulated (default: None).
+        var_grids (dict or None, optional): grid of the discretized circuit
+            variables, passed to "VariableGrid". The individuals created by the
+            genetic operators are snapped to the grid. If None, all variables
+            are continuous (default: None).
+        fidelity_cfg (dict or None, optional): cheap simulation stages, in
+            'stages', passed to "MultiFidelity". Only the individuals that
+            fulfill the constraints of each stage are simulated in the next
+            one. If None, the individuals only have the full simulation
+            (default: None).
+        progress_cfg (dict or None, optional): parameters of the monitor of
+            the server progress messages, passed to "ProgressMonitor"
+            (default: None).
+        journal_cfg (dict or None, optional): parameters of the write-ahead
+            journal of the evaluations, passed to "Journal". The journal is
+            saved next to the checkpoint, so a run that stops during a
+            generation continues it from the checkpoint. If None, there's no
+            journal (default: None).
+        archive_cfg (dict or None, optional): parameters of the external
+            archive of the non-dominated evaluated individuals, passed to
+            "Archive". The archive is saved next to the checkpoint, and its
+            members are the first pareto front of the results. If None, the
+            fronts are sorted from the final population (default: None).
+        seed (int or None, optional): seed of the random generator of the
+            optimizer. In debug, the seed is 16384. If None, the generator is
+            seeded from the system (default: None).
+
+    Raises:
+        ValueError: If the selection, a variable grid or a fidelity stage is
+            invalid, or an option isn't supported by the engine.
     """
 
+    # Selections of the engine (the first one is the default)
+    selections = SELECTIONS
+    # The engines with their own loop don't run the options of "ga_mu_plus_lambda"
+    loop_options = True
+
     # pylint: disable=too-many-instance-attributes,no-member
     def __init__(self, objectives, constraints, circuit_vars, pop_size, max_gen,
                  client=None, mut_prob=0.1, cx_prob=0.8, mut_eta=20, cx_eta=20,
-                 penalty_delta=2, penalty_weight=1, debug=False):
+                 penalty_delta=2, penalty_weight=1, debug=False, montecarlo_cfg=None,
+                 profiler=None, dashboard=None, migrator=None, selection=None,
+                 mut_indpb=None, adaptive=False, local_search_cfg=None, dedup_cfg=None,
+                 var_grids=None, fidelity_cfg=None, progress_cfg=None, journal_cfg=None,
+                 archive_cfg=None, seed=None):
         """Create the NSGA-II Optimizer using the DEAP library."""
-        # If debugging we should have a fixed seed to have coherent results
-        if debug:
-            random.seed(16384)
+        if selection is None:
+            selection = self.selections[0]
+        if selection not in self.selections:
+            raise ValueError(f"Invalid selection '{selection}' (valid selections of "
+                             f"{type(self).__name__}: {self.selections})")
+        if not self.loop_options:
+            enabled = [name for name, option in (
+                ('island migration', migrator is not None),
+                ('local search', local_search_cfg is not None),
+                ('adaptive operators', adaptive)) if option]
+            if enabled:
+                raise ValueError(f"{type(self).__name__} doesn't support the "
+                                 f"{', '.join(enabled)}")
+
+        # Each optimizer has its own random generator, so several optimizers can
+        # run in the same process. If debugging we should have a fixed seed to
+        # have coherent results.
+        self.rng = random.Random(16384 if debug else seed)
 
         # INFO: The sum of mut_prob and cx_prob shall be in [0, 1]
         self.mut_prob = mut_prob
@@ -80,10 +186,46 @@ class OptimizerNSGA2:
         self.max_gen = max_gen
         self.penalty_delta = penalty_delta
         self.penalty_weight = penalty_weight
+        self.selection = selection
+        self.mut_indpb = mut_indpb if mut_indpb is not None else mut_prob
 
         if client is not None:
             self.client = client
 
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.progress = ProgressMonitor(**(progress_cfg or {}))
+        self.journal_cfg = journal_cfg
+        self.journal = None  # Created with the checkpoint file name
+        self.archive_cfg = archive_cfg
+        self.archive = None  # Created with the checkpoint file name
+        self.dashboard = dashboard
+        self.migrator = migrator
+        self.hv_ref = None  # Hypervolume reference point of the convergence curve
+        self.num_sims = 0   # Simulations performed, to find the first feasible individual
+        self.req_id = 0     # Id of the last request sent to the server
+        self.first_feasible = None
+
+        # The nominal constraints are the ones that can be checked without the yield
+        self.nominal_constraints = {
+            key: val for key, val in constraints.items() if key != YIELD_KEY}
+
+        if fidelity_cfg is not None:
+            self.fidelity = MultiFidelity(self.simulate, self.penalty, objectives, constraints,
+                                          fidelity_cfg.get('stages', []))
+        else:
+            self.fidelity = None
+
+        # Worst objective values, given to the failed simulations and to the
+        # designs rejected by a fidelity stage
+        self.worst = (self.fidelity.worst if self.fidelity is not None
+                      else WorstObjectives(objectives))
+
+        if montecarlo_cfg is not None:
+            self.yield_estimator = YieldEstimator(self.simulate_mc, self.is_feasible,
+                                                  **montecarlo_cfg)
+        else:
+            self.yield_estimator = None
+
         # Set bounds
         bound_low = []
         bound_up = []
@@ -91,45 +233,107 @@ class OptimizerNSGA2:
         for val in circuit_vars.values():
             bound_low.append(float(val[0]))
             bound_up.append(float(val[1]))
-
-        # Define the Fitness
-        fitness_weights = tuple(objectives.values())
-        creator.create("FitnessMulti", base.Fitness, weights=fitness_weights)
-        # Define an individual
-        creator.create("Individual", array.array, typecode='d', fitness=creator.FitnessMulti,
-                       result=dict)
+        self.bound_low = bound_low
+        self.bound_up = bound_up
+
+        if var_grids:
+            self.grid = VariableGrid(self.circuit_vars, bound_low, bound_up, var_grids)
+            for idx, key in enumerate(self.circuit_vars):
+                if self.grid.steps[idx] is not None:
+                    logger.info("Discretized variable %s | step: %s | values: %d", key,
+                                self.grid.steps[idx], self.grid.num_values(idx))
+        else:
+            self.grid = None
+
+        # Define an individual (with its fitness). The classes are not created in
+        # the DEAP "creator", so the optimizers don't replace each other's classes.
+        self.individual_class = individual_class(tuple(objectives.values()))
 
         toolbox = base.Toolbox()
 
         # random generated float
         toolbox.register("attr_float", self.uniform, bound_low, bound_up)
         # Define an individual as a list of floats (iterate over "att_float"
-        # and place the result in "creator.Individual")
-        toolbox.register("individual", tools.initIterate, creator.Individual, toolbox.attr_float)
+        # and place the result in an "Individual")
+        toolbox.register("individual", tools.initIterate, self.individual_class,
+                         toolbox.attr_float)
+        if self.grid is not None:
+            toolbox.decorate("individual", self.grid.decorator)
         # Define the population as a list of individuals (the # of individuals
         # is only defined when the population is initialized)
         toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
-        # operator for selecting individuals for breeding the next generation
-        toolbox.register("select", tools.selNSGA2)
+        # operator for selecting individuals for breeding the next generation.
+        # In the "constrained" selection, the infeasible individuals are
+        # dominated by the feasible ones and compared by their violation,
+        # instead of penalizing their fitness.
+        if selection == 'constrained':
+            toolbox.register("select", sel_constrained_nsga2)
+        else:
+            toolbox.register("select", tools.selNSGA2)
 
         # register the goal / fitness function
         toolbox.register("evaluate", self.eval_circuit)
-        # The constraints handling is made in the "eval_circuit" function
+        # The constraints handling is made in the "eval_circuit" function (penalty)
+        # or in the selection (constrained)
         ##self.toolbox.decorate("evaluate", (self.feasibility, 0, self.distance))
 
-        # register the crossover operator
-        toolbox.register("mate", tools.cxSimulatedBinaryBounded,
-                         low=bound_low, up=bound_up, eta=cx_eta)
+        self.toolbox = toolbox
 
-        # register the mutation operator
-        toolbox.register("mutate", tools.mutPolynomialBounded, low=bound_low,
-                         up=bound_up, eta=mut_eta, indpb=mut_prob)
+        # register the crossover and mutation operators
+        self.register_operators(cx_eta, mut_eta)
 
-        self.toolbox = toolbox
+        if adaptive:
+            self.operator_control = OperatorControl(cx_prob, mut_prob, cx_eta, mut_eta)
+        else:
+            self.operator_control = None
 
-    @staticmethod
-    def uniform(bound_low, bound_up):
+        if dedup_cfg is not None:
+            self.deduplicator = Deduplicator(self.toolbox, bound_low, bound_up, **dedup_cfg)
+        else:
+            self.deduplicator = None
+
+        if local_search_cfg is not None:
+            self.local_search = LocalSearch(self.evaluate, self.toolbox, self.sort_fronts,
+                                            bound_low, bound_up, grid=self.grid, rng=self.rng,
+                                            **local_search_cfg)
+        else:
+            self.local_search = None
+
+    def register_operators(self, cx_eta, mut_eta):
+        """Register the crossover and mutation operators in the toolbox.
+
+        With discretized variables, the offspring are snapped to the grid.
+
+        Arguments:
+            cx_eta (float): crowding degree of the crossover.
+            mut_eta (float): crowding degree of the mutation.
+        """
+        self.toolbox.register("mate", cx_simulated_binary_bounded, low=self.bound_low,
+                              up=self.bound_up, eta=cx_eta, rng=self.rng)
+        self.toolbox.register("mutate", mut_polynomial_bounded, low=self.bound_low,
+                              up=self.bound_up, eta=mut_eta, indpb=self.mut_indpb, rng=self.rng)
+
+        if self.grid is not None:
+            self.toolbox.decorate("mate", self.grid.decorator)
+            self.toolbox.decorate("mutate", self.grid.decorator)
+
+    def adapt_operators(self, gen, offspring, population):
+        """Adapt the operators to the offspring that survived the selection.
+
+        Arguments:
+            gen (int): generation number.
+            offspring (list): offspring of the generation.
+            population (list): population selected for the next generation.
+        """
+        control = self.operator_control
+        control.update(gen, offspring, population)
+
+        self.cx_prob = control.prob[CROSSOVER]
+        self.mut_prob = control.prob[MUTATION]
+        self.register_operators(control.eta[CROSSOVER], control.eta[MUTATION])
+
+    def uniform(self, bound_low, bound_up):
         """Generate random numbers between "low" and "up".
 
         If the arguments are lists, generates a list of values.
@@ -141,142 +345,595 @@ class OptimizerNSGA2:
         Returns:
             list: generated numbers.
         """
-        return [random.uniform(a, b) for a, b in zip(bound_low, bound_up)]
+        return [self.rng.uniform(a, b) for a, b in zip(bound_low, bound_up)]
 
-    def eval_circuit(self, individuals):
-        """Evaluate individuals and return the fitness and simulation results.
-
-        This function also performs constraint handling, to penalize the
-        individuals whose simulation results are not within the specifications
-        defined in the configuration file. More info about the constraint
-        handling can be found here:
-        TODO: https://METER LINK CONSTRAINT HANDLING
+    def simulate(self, individuals, req_type='updateAndRun', **kwargs):
+        """Send the individuals to the simulator and get the simulation results.
 
         Arguments:
-            individuals (list): list of individuals to evaluate. The number of
+            individuals (list): list of individuals to simulate. The number of
                 individuals in the list is equal to the number of parallel
                 simulations to perform.
+            req_type (str, optional): type of the request sent to the server
+                (default: 'updateAndRun').
+            **kwargs: extra request parameters. If provided, the request data
+                is a dictionary with the circuit variables in 'variables'.
 
         Raises:
+            BudgetExceeded: If the server refused the simulations.
             KeyError: If the received response type or format is invalid.
-            TypeError: If the constraints limits are invalid.
 
         Returns:
-            tuple: individuals' fitness and simulation results.
+            list: simulation results of each individual.
         """
         # A list with the variables of all individuals stored in dictionaries
         variables = []
 
         # Map the individual variables values to a dictionary with the
-        # respective variable value and name
+        # respective variable value and name. The discretized variables are
+        # sent with the grid values.
         for ind in individuals:
-            variables.append({key: ind[idx] for idx, key in enumerate(self.circuit_vars)})
+            values = self.grid.values(ind) if self.grid is not None else ind
+            variables.append({key: values[idx] for idx, key in enumerate(self.circuit_vars)})
+
+        data = dict(variables=variables, **kwargs) if kwargs else variables
 
-        # Send the request to the server
-        req = dict(type='updateAndRun', data=variables)
-        self.client.send_data(req)
+        # Send the request to the server. The id routes the response in a
+        # multi-client server.
+        self.req_id += 1
+        req = dict(type=req_type, data=data, id=self.req_id)
+        with self.profiler.span('simulate.send'):
+            self.client.send_data(req)
         # Wait for data from server
-        res = self.client.recv_data()
+        with self.profiler.span('simulate.wait'):
+            res = self.progress.recv(self.client)
+
+        # Add the timings and the scheduler report of the server
+        self.profiler.add_server_spans(res.get('meta'))
+        self.profiler.set_scheduler((res.get('meta') or {}).get('scheduler'))
 
         try:
             res_type = res['type']
             sim_res = res['data']
         except KeyError as err:
-            logger.error(err)
+            raise KeyError(f"Invalid response from the server: {err}")
+
+        if res_type == 'budgetExceeded':
+            raise BudgetExceeded(sim_res)
+
+        if res_type == 'error':
+            raise KeyError(f"Server error: {sim_res}")
+
+        if res.get('id', self.req_id) != self.req_id:
+            raise KeyError(f"The response id {res['id']} doesn't match the request id "
+                           f"{self.req_id}")
 
-        if res_type != 'updateAndRun':
+        if res_type != req_type:
             raise KeyError("Simulation error!!! Check variables defaults, etc.")
 
-        results = []
+        return sim_res
 
-        # Get the fitnesses and simulation results for all individuals
-        for idx in range(len(individuals)):
-            fitness = []    # Fitnesses of one individual
-            pen = 0         # Fitness Penalty
+    def simulate_mc(self, individuals, samples, start):
+        """Simulate Monte-Carlo samples of the given individuals.
+
+        Arguments:
+            individuals (list): list of individuals to simulate.
+            samples (int): number of samples per individual.
+            start (int): number of the first sample.
+
+        Returns:
+            list: results of the samples of each individual.
+        """
+        sim_res = self.simulate(individuals, 'monteCarlo', samples=samples, start=start)
 
-            sim_res_ind = sim_res[idx]  # Simulation results of one individual
+        # The results are sorted by individual and then by sample
+        return [sim_res[idx * samples:(idx + 1) * samples] for idx in range(len(individuals))]
 
-            if self.constraints:
-                for key, val in self.constraints.items():
-                    # Try to compute the penalty (if constraint has two limits)
+    def penalty(self, sim_res_ind, constraints=None, delta=None):
+        """Compute the penalty of an individual from its simulation results.
+
+        Arguments:
+            sim_res_ind (dict): simulation results of one individual.
+            constraints (dict or None, optional): constraints to check. If None,
+                checks all the optimization constraints (default: None).
+            delta (float or None, optional): penalty of each unfulfilled
+                constraint, added to its normalized violation. If None, uses
+                the "penalty_delta" (default: None).
+
+        Raises:
+            TypeError: If the constraints limits are invalid.
+
+        Returns:
+            float: penalty (0 if all constraints are fulfilled).
+        """
+        if constraints is None:
+            constraints = self.constraints
+        if delta is None:
+            delta = self.penalty_delta
+
+        pen = 0  # Fitness Penalty
+
+        for key, val in constraints.items():
+            # The results of the individuals rejected by a cheap simulation
+            # stage only have the constraints checked up to that stage
+            if key not in sim_res_ind and self.fidelity is not None:
+                continue
+
+            # A missing measurement (extracted as "nan") violates the constraint
+            if math.isnan(sim_res_ind[key]):
+                pen += delta + 1
+                continue
+
+            # Try to compute the penalty (if constraint has two limits)
+            try:
+                # Try to convert the values to float
+                val_0 = float(val[0])
+                val_1 = float(val[1])
+
+                # Normalize the simulation result
+                if val_0 != val_1:
+                    res_norm = (sim_res_ind[key] - val_0) / (val_1 - val_0)
+                    # Check the limits
+                    if res_norm < 0:
+                        pen += delta - res_norm
+                    elif res_norm > 1:
+                        pen += delta + (res_norm - 1)
+                # If the limits are equal
+                elif val_0 == val_1 and sim_res_ind[key] != val_0:
+                    pen += delta + math.fabs(sim_res_ind[key] - val_0)
+
+            # If contraint only has one limit
+            except ValueError:
+                # True - defined, false - undefined
+                limit = [True, True]
+
+                for lim, value in enumerate(val):
                     try:
-                        # Try to convert the values to float
-                        val_0 = float(val[0])
-                        val_1 = float(val[1])
-
-                        # Normalize the simulation result
-                        if val_0 != val_1:
-                            res_norm = (sim_res_ind[key] - val_0) / (val_1 - val_0)
-                            # Check the limits
-                            if res_norm < 0:
-                                pen += self.penalty_delta - res_norm
-                            elif res_norm > 1:
-                                pen += self.penalty_delta + (res_norm - 1)
-                        # If the limits are equal
-                        elif val_0 == val_1 and sim_res_ind[key] != val_0:
-                            pen += self.penalty_delta + math.fabs(sim_res_ind[key] - val_0)
-
-                    # If contraint only has one limit
+                        # Get the constraint value and normalize it
+                        res_norm = (sim_res_ind[key] / float(value)) - 1
+                    # If can't convert to float, the limit is not defined
                     except ValueError:
-                        # True - defined, false - undefined
-                        limit = [True, True]
+                        limit[lim] = False
+
+                # If founds two limits, it should be handled in the previous 'try'
+                if limit[0] and limit[1]:
+                    raise TypeError("Both limits exist.. it shouldn't be here!!!")
+
+                # If constraint has maximum allowed value
+                if not limit[0] and res_norm > 0:
+                    pen += delta + res_norm
+
+                # If constraint has minimum allowed value
+                elif not limit[1] and res_norm < 0:
+                    pen += delta - res_norm
 
-                        for lim, value in enumerate(val):
-                            try:
-                                # Get the constraint value and normalize it
-                                res_norm = (sim_res_ind[key] / float(value)) - 1
-                            # If can't convert to float, the limit is not defined
-                            except ValueError:
-                                limit[lim] = False
+        return pen
 
-                        # If founds two limits, it should be handled in the previous 'try'
-                        if limit[0] and limit[1]:
-                            raise TypeError("Both limits exist.. it shouldn't be here!!!")
+    def violation(self, sim_res_ind):
+        """Compute the aggregated normalized constraint violation of an individual.
 
-                        # If constraint has maximum allowed value
-                        if not limit[0] and res_norm > 0:
-                            pen += self.penalty_delta + res_norm
+        Arguments:
+            sim_res_ind (dict): simulation results of one individual.
+
+        Returns:
+            float: constraint violation (0 if all constraints are fulfilled).
+        """
+        return self.penalty(sim_res_ind, delta=0)
+
+    def fitness(self, sim_res_ind, pen):
+        """Compute the fitness of an individual, penalized if it is invalid.
+
+        Arguments:
+            sim_res_ind (dict): simulation results of one individual.
+            pen (float): individual penalty.
+
+        Raises:
+            KeyError: If there's an objective missing in the simulation results.
+            ValueError: If there's an overflow computing the fitness.
+
+        Returns:
+            list: individual fitness.
+        """
+        fitness = []
+
+        for key, val in self.objectives.items():
+            try:
+                # Add the penalty weight to penalty
+                penalty = pen * self.penalty_weight
+
+                # Avoid overflow problems
+                if penalty > 500:
+                    penalty = 500
+
+                # If the fitness is to maximize, change the penalty signal
+                if val > 0:
+                    penalty = -penalty
+
+                tot_penalty = math.exp(self.penalty_weight*penalty)
+
+                # Get the simulation result
+                result = sim_res_ind[key]
+
+                # If the simulation result is negative, invert the penalty
+                if result < 0:
+                    tot_penalty = 1 / tot_penalty
+
+                fitness.append(result * tot_penalty)
+            except KeyError as err:
+                raise KeyError(
+                    f"Eval circuit: there's no key {err} in the simulation results.")
+            except OverflowError as err:
+                raise ValueError(f"Overflow error while evaluating the circuit: {err}")
+
+        return fitness
+
+    def estimate_yield(self, individuals, sim_res):
+        """Estimate the yield of the nominally feasible individuals.
+
+        The yield is stored in the simulation results of each individual. The
+        individuals that don't fulfill the nominal constraints aren't sampled
+        and have a null yield.
+
+        Arguments:
+            individuals (list): list of evaluated individuals.
+            sim_res (list): nominal simulation results of each individual.
+        """
+        feasible = [idx for idx, res in enumerate(sim_res) if self.is_feasible(res)]
+
+        for res in sim_res:
+            res[YIELD_KEY] = 0.0
+
+        if not feasible:
+            return
+
+        estimates = self.yield_estimator.estimate([individuals[idx] for idx in feasible])
+
+        for idx, (yield_, _) in zip(feasible, estimates):
+            sim_res[idx][YIELD_KEY] = yield_
+
+    def is_feasible(self, sim_res_ind):
+        """Check if the simulation results fulfill the nominal constraints.
 
-                        # If constraint has minimum allowed value
-                        elif not limit[1] and res_norm < 0:
-                            pen += self.penalty_delta - res_norm
+        Arguments:
+            sim_res_ind (dict): simulation results of one individual/sample.
 
-            for key, val in self.objectives.items():
-                try:
-                    # Add the penalty weight to penalty
-                    penalty = pen * self.penalty_weight
+        Returns:
+            bool: True if the results fulfill the constraints.
+        """
+        return self.penalty(sim_res_ind, self.nominal_constraints) == 0
 
-                    # Avoid overflow problems
-                    if penalty > 500:
-                        penalty = 500
+    def eval_circuit(self, individuals):
+        """Evaluate individuals and return the fitness and simulation results.
 
-                    # If the fitness is to maximize, change the penalty signal
-                    if val > 0:
-                        penalty = -penalty
+        This function also performs constraint handling, to penalize the
+        individuals whose simulation results are not within the specifications
+        defined in the configuration file. More info about the constraint
+        handling can be found here:
+        TODO: https://METER LINK CONSTRAINT HANDLING
+
+        If the Monte-Carlo yield estimation is enabled, the yield of the
+        nominally feasible individuals is estimated before computing the
+        fitness, so it can be used as an objective or constraint.
+
+        With the multi-fidelity evaluation, the individuals rejected by a cheap
+        stage get the worst objective values of the full simulations, which
+        are penalized by the violation of the stage constraints.
+
+        Arguments:
+            individuals (list): list of individuals to evaluate. The number of
+                individuals in the list is equal to the number of parallel
+                simulations to perform.
 
-                    tot_penalty = math.exp(self.penalty_weight*penalty)
+        Raises:
+            KeyError: If the received response type or format is invalid.
+            TypeError: If the constraints limits are invalid.
 
-                    # Get the simulation result
-                    result = sim_res_ind[key]
+        Returns:
+            tuple: individuals' fitness and simulation results.
+        """
+        if self.fidelity is not None:
+            sim_res = self.fidelity.run(individuals)
+        else:
+            sim_res = self.simulate(individuals)
+            for res in sim_res:
+                self.worst.update(res)
+
+        # Log the number of simulations needed to find a feasible individual
+        self.num_sims += len(individuals)
+        if self.first_feasible is None and any(self.is_feasible(res) for res in sim_res):
+            self.first_feasible = self.num_sims
+            logger.info("First feasible individual found after %d simulations "
+                        "(%s selection)", self.num_sims, self.selection)
+
+        if self.yield_estimator is not None:
+            with self.profiler.span('montecarlo'):
+                self.estimate_yield(individuals, sim_res)
 
-                    # If the simulation result is negative, invert the penalty
-                    if result < 0:
-                        tot_penalty = 1 / tot_penalty
+        results = []
 
-                    fitness.append(result * tot_penalty)
-                except KeyError as err:
-                    raise KeyError(
-                        f"Eval circuit: there's no key {err} in the simulation results.")
-                except OverflowError as err:
-                    raise ValueError(f"Overflow error while evaluating the circuit: {err}")
+        # Get the fitnesses and simulation results for all individuals
+        with self.profiler.span('fitness'):
+            for idx in range(len(individuals)):
+                sim_res_ind = sim_res[idx]  # Simulation results of one individual
 
-            results.append((fitness, sim_res_ind))
+                # The constrained selection handles the constraints, so the
+                # fitness is not penalized
+                pen = self.penalty(sim_res_ind) if self.selection == 'penalty' else 0
+                fitness = self.fitness(self.worst.complete(sim_res_ind), pen)
 
-            #print("FITNESS:", fitness)
-            #print("SIM RES:", sim_res_ind)
+                results.append((fitness, sim_res_ind))
 
         return results
 
+    def evaluate(self, individuals, evaluated=(), offspring=None):
+        """Evaluate individuals and store their fitness, results and violation.
+
+        If the deduplication is enabled, the individuals whose design was
+        already evaluated (or is repeated) are not simulated.
+
+        Arguments:
+            individuals (list): individuals to evaluate.
+            evaluated (list, optional): evaluated individuals that can be
+                duplicated, e.g. the current population (default: ()).
+            offspring (list or None, optional): offspring of the generation. If
+                provided and the journal is enabled, the results are recorded
+                in the journal after each batch (default: None).
+
+        Returns:
+            int: number of simulations performed.
+        """
+        duplicates = []
+        if self.deduplicator is not None:
+            individuals, duplicates = self.deduplicator.unique(individuals, evaluated)
+
+        record = self.journal is not None and offspring is not None
+        size = (self.journal.batch_size if record else None) or len(individuals)
+
+        for start in range(0, len(individuals), size):
+            batch = individuals[start:start + size]
+            results = self.toolbox.evaluate(batch)
+
+            for ind, res_ind in zip(batch, results):
+                ind.fitness.values = res_ind[0]
+                ind.result = res_ind[1]
+                ind.violation = self.violation(ind.result)
+
+            if record:
+                self.journal.record(offspring, batch)
+            if self.archive is not None:
+                self.archive.add(batch)
+
+        if duplicates:
+            self.deduplicator.copy_results(duplicates)
+            logger.info("Simulations saved by the deduplication: %d (total: %d)",
+                        len(duplicates), self.deduplicator.saved)
+
+        return len(individuals)
+
+    def refine(self, gen, population):
+        """Refine the pareto front of the population with the local search.
+
+        Arguments:
+            gen (int): generation number.
+            population (list): evaluated population, updated in place.
+        """
+        logger.info("Starting the local search at generation %d", gen)
+        try:
+            with self.profiler.span('local_search'):
+                num_sims = self.local_search.run(gen, population)
+            logger.info("Finished the local search | evaluations: %d", num_sims)
+        except BudgetExceeded as err:
+            logger.warning("Stopping the local search: %s", err)
+
+    def sort_fronts(self, individuals):
+        """Sort the individuals in pareto fronts.
+
+        With the "constrained" selection, the feasible individuals dominate the
+        infeasible ones.
+
+        Arguments:
+            individuals (list): evaluated individuals.
+
+        Returns:
+            list: individuals of each front.
+        """
+        if self.selection == 'constrained':
+            return sort_constrained_fronts(individuals)
+
+        return tools.emo.sortLogNondominated(individuals, len(individuals))
+
+    def with_archive(self, population):
+        """Join the members of the archive to a population.
+
+        Arguments:
+            population (list): evaluated population.
+
+        Returns:
+            list: population and the archive members that are not in it.
+        """
+        if self.archive is None:
+            return population
+
+        designs = {tuple(ind) for ind in population}
+        return population + [ind for ind in self.archive.members()
+                             if tuple(ind) not in designs]
+
+    def update_dashboard(self, gen, evaluated, population):
+        """Push the individuals evaluated in a generation to the live dashboard.
+
+        Arguments:
+            gen (int): generation number.
+            evaluated (list): individuals evaluated in the generation.
+            population (list): population selected in the generation.
+        """
+        front = self.sort_fronts(population)[0]
+        wvalues = [ind.fitness.wvalues for ind in front]
+
+        # The reference point is fixed in the first generation, so the
+        # hypervolume of the generations can be compared
+        if self.hv_ref is None:
+            self.hv_ref = reference_point(wvalues)
+
+        convergence = dict(
+            hv=hypervolume(wvalues, self.hv_ref),
+            front=len(front),
+            feasible=sum(1 for ind in population if self.penalty(ind.result) == 0))
+        valid = [self.penalty(ind.result) == 0 for ind in evaluated]
+
+        self.dashboard.update(gen, evaluated, valid, convergence)
+
+    def checkpoint(self, gen, population, logbook, **extra):
+        """Create a checkpoint of the evolution.
+
+        Arguments:
+            gen (int): generation number.
+            population (list or None): population.
+            logbook (Logbook): logbook of the evolution.
+            **extra: extra checkpoint data, e.g. the pending 'offspring'.
+
+        Returns:
+            dict: checkpoint.
+        """
+        cp = dict(generation=gen, population=population, logbook=logbook,
+                  rnd_state=self.rng.getstate(), **extra)
+        if self.operator_control is not None:
+            cp['operators'] = self.operator_control.state()
+
+        return cp
+
+    def restore(self, cp):
+        """Restore the state of the evolution from a checkpoint.
+
+        Arguments:
+            cp (dict): checkpoint.
+
+        Returns:
+            tuple: population and logbook of the checkpoint.
+        """
+        population = cp['population']
+        # The violation is not stored in the older checkpoints
+        for ind in population or ():
+            ind.violation = self.violation(ind.result)
+        self.rng.setstate(cp['rnd_state'])
+        # Continue with the adapted operators
+        if self.operator_control is not None and cp.get('operators'):
+            control = self.operator_control
+            control.load_state(cp['operators'])
+            self.cx_prob = control.prob[CROSSOVER]
+            self.mut_prob = control.prob[MUTATION]
+            self.register_operators(control.eta[CROSSOVER], control.eta[MUTATION])
+
+        return population, cp['logbook']
+
+    def read_checkpoint(self, fname):
+        """Read a checkpoint file.
+
+        The checkpoints saved before the per-optimizer individual classes need
+        the classes of the DEAP "creator", which are created if missing.
+
+        Arguments:
+            fname (str): checkpoint file.
+
+        Returns:
+            dict: checkpoint.
+        """
+        try:
+            return file.read_pickle(fname)
+        except AttributeError:
+            create_legacy_classes(self.individual_class.fitness_class.weights)
+            return file.read_pickle(fname)
+
+    def load_journal(self, checkpoint_load, cp):
+        """Load the journal of a generation that is not in the checkpoint.
+
+        Arguments:
+            checkpoint_load (str or None): checkpoint file to load, if provided.
+            cp (dict or None): loaded checkpoint (None if the file doesn't
+                exist, e.g. the run stopped in the initial evaluation).
+
+        Returns:
+            dict or None: journal checkpoint of the generation to continue, with
+                the evaluated offspring, or None if there's no such journal.
+        """
+        if self.journal is None or not checkpoint_load:
+            return None
+
+        loaded = Journal(journal_fname(checkpoint_load)).load()
+        if loaded is None:
+            return None
+
+        replay, done = loaded
+        if cp is not None and replay['generation'] <= cp['generation']:
+            return None
+
+        logger.info("Continuing generation %d from the journal | evaluated: %d/%d",
+                    replay['generation'], done, len(replay['offspring']))
+
+        return replay
+
+    @staticmethod
+    def statistics():
+        """Create the statistics of the evolution, stored in the logbook.
+
+        Returns:
+            MultiStatistics: statistics of the population, fitness and results.
+        """
+        stats_pop = tools.Statistics()
+        stats_fit = tools.Statistics(key=lambda ind: ind.fitness.values)
+        stats_res = tools.Statistics(key=lambda ind: ind.result)
+        stats = tools.MultiStatistics(population=stats_pop, fitness=stats_fit, result=stats_res)
+        stats.register("value", copy.deepcopy)
+
+        return stats
+
+    def start_run(self, checkpoint_load, checkpoint_fname):
+        """Create the journal and the archive of a run, and load its checkpoint.
+
+        Arguments:
+            checkpoint_load (str or None): checkpoint file to load, if provided.
+            checkpoint_fname (str): name of the checkpoint file to save.
+
+        Returns:
+            tuple: loaded checkpoint (or None) and the journal checkpoint of the
+                generation to continue (or None, see "load_journal").
+        """
+        if self.journal_cfg is not None:
+            self.journal = Journal(journal_fname(checkpoint_fname), **self.journal_cfg)
+
+        # The archive continues with the members of the loaded checkpoint archive
+        if self.archive_cfg is not None:
+            self.archive = Archive(len(self.objectives), archive_fname(checkpoint_fname),
+                                   constrained=self.selection == 'constrained',
+                                   **self.archive_cfg)
+            if checkpoint_load and self.archive.load(archive_fname(checkpoint_load)):
+                logger.info("Loaded the archive | members: %d", len(self.archive))
+            self.archive.save()
+
+        cp = None
+        if checkpoint_load and os.path.isfile(checkpoint_load):
+            cp = self.read_checkpoint(checkpoint_load)
+
+        return cp, self.load_journal(checkpoint_load, cp)
+
+    def save_checkpoint(self, checkpoint_fname, gen, population, logbook):
+        """Save a checkpoint of the evolution, and compact the archive.
+
+        Arguments:
+            checkpoint_fname (str): name of the checkpoint file.
+            gen (int): generation number.
+            population (list): population.
+            logbook (Logbook): logbook of the evolution.
+        """
+        with self.profiler.span('checkpoint'):
+            file.write_pickle(checkpoint_fname, self.checkpoint(gen, population, logbook))
+            if self.archive is not None:
+                self.archive.save()
+
+    def end_run(self):
+        """End a run: there's no generation to continue from the journal."""
+        if self.journal is not None:
+            self.journal.remove()
+
     def ga_mu_plus_lambda(self, mu, lambda_, checkpoint_load, checkpoint_fname,
                           checkpoint_freq, sel_best, verbose):
         """The (mu + lambda) evolutionary algorithm.
@@ -304,6 +961,8 @@ class OptimizerNSGA2:
             mu (float): number of individuals to select for the next generation.
             lambda_ (int): number of children to produce at each generation.
             checkpoint_load (str or None): checkpoint file to load, if provided.
+                If the journal is enabled, a generation recorded in the journal
+                of the checkpoint is continued.
             checkpoint_fname (str): name of the checkpoint file to save.
             checkpoint_freq (str): checkpoint saving frequency (relative to gen).
             sel_best (int): number of best individuals to log at each generation.
@@ -312,34 +971,40 @@ class OptimizerNSGA2:
         Returns:
             tuple: final population and the logbook of the evolution.
         """
-        # Create the statistics
-        stats_pop = tools.Statistics()
-        stats_fit = tools.Statistics(key=lambda ind: ind.fitness.values)
-        stats_res = tools.Statistics(key=lambda ind: ind.result)
-        stats = tools.MultiStatistics(population=stats_pop, fitness=stats_fit, result=stats_res)
-        stats.register("value", copy.deepcopy)
+        stats = self.statistics()
+
+        # If a checkpoint is provided, continue from the given generation. The
+        # journal of a generation after the checkpoint continues that generation.
+        cp, replay = self.start_run(checkpoint_load, checkpoint_fname)
 
-        # If a checkpoint is provided, continue from the given generation
-        if checkpoint_load:
-            # Load the dictionary from the pickled file
-            cp = file.read_pickle(checkpoint_load)
-            # Load the stored parameters
-            population = cp['population']
+        if replay is not None and replay['generation'] > 0:
+            population, logbook = self.restore(replay)
+            start_gen = replay['generation']
+
+        elif cp is not None:
+            population, logbook = self.restore(cp)
             start_gen = cp['generation'] + 1
-            logbook = cp['logbook']
-            random.setstate(cp['rnd_state'])
             logger.info("Running from a checkpoint!")
             logger.info("-- Population size: %d", len(population))
             logger.info("-- Current generation: %d\n", start_gen)
 
         else:  # Create the population
-            population = self.toolbox.population(n=self.pop_size)
+            if replay is not None:  # Continue the initial evaluation
+                _, logbook = self.restore(replay)
+                population = replay['offspring']
+                # The journal of this run starts with the applied results
+                self.journal.begin(replay)
+            else:
+                population = self.toolbox.population(n=self.pop_size)
+
+                # Create the logbook
+                logbook = tools.Logbook()
+                logbook.header = 'gen', 'evals', 'population', 'fitness', 'result'
+
+                if self.journal is not None:
+                    self.journal.begin(self.checkpoint(0, None, logbook, offspring=population))
             start_gen = 1
 
-            # Create the logbook
-            logbook = tools.Logbook()
-            logbook.header = 'gen', 'evals', 'population', 'fitness', 'result'
-
             # Get the individuals that are not evaluated
             invalid_inds = [ind for ind in population if not ind.fitness.valid]
 
@@ -353,24 +1018,27 @@ class OptimizerNSGA2:
             start_time = time.time()
 
             # Evaluate the individuals with an invalid fitness
-            results = self.toolbox.evaluate(invalid_inds)
-
-            for ind, res_ind in zip(invalid_inds, results):
-                ind.fitness.values = res_ind[0]
-                ind.result = res_ind[1]
+            num_sims = self.evaluate(invalid_inds, offspring=population)
 
             # Assign the crowding distance to the individuals (no selection is done)
-            population = self.toolbox.select(population, len(population))
+            with self.profiler.span('selection'):
+                population = self.toolbox.select(population, len(population))
 
-            record = stats.compile(population)
-            logbook.record(gen=0, evals=num_sims, **record)
+            with self.profiler.span('statistics'):
+                record = stats.compile(population)
+                logbook.record(gen=0, evals=num_sims, **record)
+
+            if self.dashboard is not None:
+                self.update_dashboard(0, invalid_inds, population)
+
+            self.profiler.end_generation(0)
 
             # Evaluation time
             total_time = time.time() - start_time
             mins, secs = divmod(total_time, 60)
             hours, mins = divmod(mins, 60)
             msg = f"Finished generation. Elapsed time: {hours:02.0f}h{mins:02.0f}m{secs:02.0f}s"
-            secs = total_time / num_sims
+            secs = total_time / max(num_sims, 1)
             mins, secs = divmod(secs, 60)
             msg += f" | avg: {mins:02.0f}m{secs:02.2f}s/ind\n"
             logger.info(msg)
@@ -378,10 +1046,23 @@ class OptimizerNSGA2:
         print("====================== Starting Optimization ======================\n")
 
         # Begin the generational process
+        loop_start = time.time()
         for gen in range(start_gen, self.max_gen + 1):
-            # Vary the population
-            offspring = algorithms.varOr(population, self.toolbox, lambda_, self.cx_prob,
-                                         self.mut_prob)
+            if replay is not None and gen == replay['generation']:
+                # Continue the generation of the journal, restarting it with
+                # the applied results so it doesn't depend on the loaded one
+                offspring = replay['offspring']
+                self.journal.begin(replay)
+            else:
+                # Vary the population
+                with self.profiler.span('variation'):
+                    offspring = var_or(population, self.toolbox, lambda_, self.cx_prob,
+                                       self.mut_prob, self.rng)
+
+                # Record the pending offspring before their evaluation
+                if self.journal is not None:
+                    self.journal.begin(self.checkpoint(gen, population, logbook,
+                                                       offspring=offspring))
 
             # Evaluate the individuals with an invalid fitness
             invalid_inds = [ind for ind in offspring if not ind.fitness.valid]
@@ -396,22 +1077,24 @@ class OptimizerNSGA2:
             # Evaluation start time
             start_time = time.time()
 
-            # Evaluate the individuals with an invalid fitness
-            results = self.toolbox.evaluate(invalid_inds)
-
-            for ind, res_ind in zip(invalid_inds, results):
-                ind.fitness.values = res_ind[0]
-                ind.result = res_ind[1]
+            # Evaluate the individuals with an invalid fitness. If the server
+            # budget is exhausted, the optimization ends with the last population
+            try:
+                num_sims = self.evaluate(
+                    invalid_inds, population + [ind for ind in offspring if ind.fitness.valid],
+                    offspring)
+            except BudgetExceeded as err:
+                logger.warning("Stopping at generation %d: %s", gen, err)
+                break
 
             # Update the statistics with the population
-            record = stats.compile(population)
-            logbook.record(gen=gen, evals=num_sims, **record)
+            with self.profiler.span('statistics'):
+                record = stats.compile(population)
+                logbook.record(gen=gen, evals=num_sims, **record)
 
             # Save a checkpoint of the evolution
             if gen % checkpoint_freq == 0:
-                cp = dict(generation=gen, population=population, logbook=logbook,
-                          rnd_state=random.getstate())
-                file.write_pickle(checkpoint_fname, cp)
+                self.save_checkpoint(checkpoint_fname, gen, population, logbook)
 
             # Evaluation time
             total_time = time.time() - start_time
@@ -419,18 +1102,28 @@ class OptimizerNSGA2:
             hours, mins = divmod(mins, 60)
             msg = f"Finished generation. "
             msg += f"Elapsed time: {hours:02.0f}h{mins:02.0f}m{secs:02.0f}s | "
-            secs = total_time / num_sims
+            secs = total_time / max(num_sims, 1)
             mins, secs = divmod(secs, 60)
-            msg += f"avg: {mins:02.0f}m{secs:02.2f}s/ind\n"
+            msg += f"avg: {mins:02.0f}m{secs:02.2f}s/ind"
             logger.info(msg)
 
+            # Estimate the remaining time of the run from the average generation
+            eta = (time.time() - loop_start) / (gen - start_gen + 1) * (self.max_gen - gen)
+            logger.info("Generations left: %d | ETA of the run: %s\n", self.max_gen - gen,
+                        time_string(eta))
+
             # Show the best individuals of each generation
             print(f"---- Best {sel_best} individuals of this generation ----")
 
-            best_inds = tools.selBest(population, sel_best)
+            # The feasible individuals come first, as the fitness isn't
+            # penalized with the "constrained" selection
+            best_inds = sorted(tools.selBest(population, len(population)),
+                               key=lambda ind: ind.violation)[:sel_best]
 
             for i, ind in enumerate(best_inds):
                 print(f"Ind #{i + 1} => ", end='')
+                if ind.violation > 0:
+                    print(f"(infeasible, violation: {ind.violation:0.2g}) ", end='')
 
                 # Circuit variables/parameters
                 formatted_params = [
@@ -456,7 +1149,32 @@ class OptimizerNSGA2:
             print("")
 
             # Select the next generation population
-            population[:] = self.toolbox.select(population + offspring, mu)
+            with self.profiler.span('selection'):
+                population[:] = self.toolbox.select(population + offspring, mu)
+
+            if self.operator_control is not None:
+                self.adapt_operators(gen, offspring, population)
+
+            # Refine the pareto front, interleaved with the generations
+            if self.local_search is not None and self.local_search.interval \
+                    and gen % self.local_search.interval == 0 and gen < self.max_gen:
+                self.refine(gen, population)
+
+            # Exchange individuals with the other islands
+            if self.migrator is not None:
+                with self.profiler.span('migration'):
+                    population[:] = self.migrator(gen, population, self.toolbox.select)
+
+            if self.dashboard is not None:
+                self.update_dashboard(gen, invalid_inds, population)
+
+            self.profiler.end_generation(gen)
+
+        # Refine the pareto front of the final population
+        if self.local_search is not None and self.local_search.final:
+            self.refine(self.max_gen, population)
+
+        self.end_run()
 
         return population, logbook
 
@@ -509,7 +1227,11 @@ class OptimizerNSGA2:
         msg = f"Optimization total time: {hours:02.0f}h{mins:02.0f}m{secs:02.0f}s\n"
         logger.info(msg)
 
-        # Get the pareto fronts from the optimization results
-        fronts = tools.emo.sortLogNondominated(result, len(result))
+        # Get the pareto fronts from the optimization results, with the
+        # non-dominated individuals lost along the optimization
+        if self.archive is not None:
+            self.archive.save()
+            logger.info("Archive members: %d", len(self.archive))
+        fronts = self.sort_fronts(self.with_archive(result))
 
         return fronts, logbook
@@ -0,0 +1,154 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Gaussian process regression with NumPy."""
+
+import math
+
+import numpy as np
+
+# Candidate lengthscales (normalized inputs), selected by marginal likelihood
+LENGTHSCALES = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5)
+
+
+def matern52(x1, x2, lengthscale):
+    """Matern 5/2 kernel, with unit variance.
+
+    Arguments:
+        x1 (ndarray): first points, one per row.
+        x2 (ndarray): second points, one per row.
+        lengthscale (float): lengthscale.
+
+    Returns:
+        ndarray: covariance between the points.
+    """
+    sq_dist = (x1 ** 2).sum(axis=1)[:, None] + (x2 ** 2).sum(axis=1)[None, :] - 2 * x1 @ x2.T
+    dist = np.sqrt(5 * np.maximum(sq_dist, 0)) / lengthscale
+
+    return (1 + dist + dist ** 2 / 3) * np.exp(-dist)
+
+
+class GaussianProcess:
+    """Gaussian process with a Matern 5/2 kernel and standardized outputs.
+
+    The lengthscale is the one of "lengthscales" with the largest marginal
+    likelihood, so no gradient-based fitting is needed.
+
+    Keyword Arguments:
+        lengthscales (tuple, optional): candidate lengthscales (default:
+            LENGTHSCALES).
+        noise (float, optional): noise variance, relative to the outputs
+            variance (default: 1e-6).
+    """
+
+    def __init__(self, lengthscales=LENGTHSCALES, noise=1e-6):
+        """Create the Gaussian process."""
+        self.lengthscales = lengthscales
+        self.noise = noise
+
+        self.x = None
+        self.mean = 0.0
+        self.std = 1.0
+        self.lengthscale = None
+        self.chol = None   # Cholesky factor of the training covariance
+        self.alpha = None  # Inverse of the training covariance times the outputs
+
+    def factorize(self, lengthscale, y):
+        """Factorize the training covariance with a lengthscale.
+
+        Arguments:
+            lengthscale (float): lengthscale.
+            y (ndarray): standardized outputs.
+
+        Returns:
+            tuple: Cholesky factor, "alpha" and the log marginal likelihood.
+        """
+        cov = matern52(self.x, self.x, lengthscale) + self.noise * np.eye(len(self.x))
+        chol = np.linalg.cholesky(cov)
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, y))
+        log_lik = -0.5 * y @ alpha - np.log(np.diag(chol)).sum() \
+            - 0.5 * len(y) * math.log(2 * math.pi)
+
+        return chol, alpha, log_lik
+
+    def fit(self, x, y):
+        """Fit the Gaussian process to the training points.
+
+        Arguments:
+            x (ndarray): inputs, normalized to [0, 1], one point per row.
+            y (ndarray): outputs.
+        """
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.mean = y.mean()
+        self.std = y.std() or 1.0
+        y = (y - self.mean) / self.std
+
+        best = None
+        for lengthscale in self.lengthscales:
+            try:
+                chol, alpha, log_lik = self.factorize(lengthscale, y)
+            except np.linalg.LinAlgError:
+                continue
+            if best is None or log_lik > best[3]:
+                best = (lengthscale, chol, alpha, log_lik)
+
+        if best is None:
+            raise ValueError("The Gaussian process covariance is singular")
+
+        self.lengthscale, self.chol, self.alpha, _ = best
+
+    def predict(self, x):
+        """Predict the outputs of new points.
+
+        Arguments:
+            x (ndarray): inputs, one point per row.
+
+        Returns:
+            tuple: mean and variance of each point.
+        """
+        cross = matern52(self.x, x, self.lengthscale)
+        mean = cross.T @ self.alpha
+        proj = np.linalg.solve(self.chol, cross)
+        var = np.maximum(1 - (proj ** 2).sum(axis=0), 0)
+
+        return self.mean + self.std * mean, self.std ** 2 * var
+
+    def sample(self, x, rng):
+        """Draw a joint sample of the outputs of new points from the posterior.
+
+        Arguments:
+            x (ndarray): inputs, one point per row.
+            rng (RandomState): NumPy random generator.
+
+        Returns:
+            ndarray: sampled output of each point.
+        """
+        cross = matern52(self.x, x, self.lengthscale)
+        mean = cross.T @ self.alpha
+        proj = np.linalg.solve(self.chol, cross)
+        cov = matern52(x, x, self.lengthscale) - proj.T @ proj
+
+        # The jitter is increased until the covariance is positive definite. If
+        # it's never, the points are sampled independently.
+        noise = rng.standard_normal(len(x))
+        for jitter in (1e-8, 1e-6, 1e-4, 1e-2):
+            try:
+                chol = np.linalg.cholesky(cov + jitter * np.eye(len(x)))
+                return self.mean + self.std * (mean + chol @ noise)
+            except np.linalg.LinAlgError:
+                continue
+
+        return self.mean + self.std * (mean + np.sqrt(np.maximum(np.diag(cov), 0)) * noise)
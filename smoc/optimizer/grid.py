@@ -0,0 +1,195 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Discretized (grid and integer) circuit variables."""
+
+import functools
+import math
+from decimal import Decimal
+
+# Types of the discretized variables
+TYPES = ('float', 'int')
+
+
+class VariableGrid:
+    """Snap the circuit variables to their grid.
+
+    A discretized variable only takes values multiple of its step, e.g. the
+    manufacturing grid of a width, or integer values, e.g. the number of
+    fingers of a transistor. The continuous variables are not changed.
+
+    Arguments:
+        names (list): names of the circuit variables.
+        bound_low (list): lower bounds of the circuit variables.
+        bound_up (list): upper bounds of the circuit variables.
+        specs (dict): grid of each discretized variable, with the 'step'
+            (default: 1 for the integer variables) and the 'type' ('float' or
+            'int', default: 'float').
+
+    Raises:
+        ValueError: If a grid is invalid or has no values within the bounds.
+    """
+
+    def __init__(self, names, bound_low, bound_up, specs):
+        """Create the grid of the circuit variables."""
+        unknown = set(specs) - set(names)
+        if unknown:
+            raise ValueError(f"Grid of unknown circuit variables: {', '.join(sorted(unknown))}")
+
+        self.steps = []
+        self.integer = []
+        self.decimals = []
+        self.low = []  # Grid values closest to the bounds
+        self.up = []
+
+        for name, low, up in zip(names, bound_low, bound_up):
+            spec = specs.get(name) or {}
+            var_type = spec.get('type', 'float')
+            if var_type not in TYPES:
+                raise ValueError(f"Invalid type '{var_type}' of the variable {name} "
+                                 f"(valid types: {TYPES})")
+
+            integer = var_type == 'int'
+            step = spec.get('step', 1 if integer else None)
+            if step is not None:
+                step = int(step) if integer else float(step)
+                if step <= 0:
+                    raise ValueError(f"The grid step of the variable {name} must be positive")
+
+            self.steps.append(step)
+            self.integer.append(integer)
+            if step is None:
+                self.decimals.append(None)
+                self.low.append(low)
+                self.up.append(up)
+                continue
+
+            # Round the grid values to the step digits, so they have a clean
+            # representation in the simulator
+            self.decimals.append(max(0, -Decimal(str(step)).normalize().as_tuple().exponent))
+            grid_low = self.round(len(self.low), math.ceil(low / step - 1e-9) * step)
+            grid_up = self.round(len(self.up), math.floor(up / step + 1e-9) * step)
+            if grid_low > grid_up:
+                raise ValueError(f"The grid of the variable {name} has no values within "
+                                 f"[{low}, {up}]")
+            self.low.append(grid_low)
+            self.up.append(grid_up)
+
+    def round(self, idx, value):
+        """Round a grid value of a variable to the digits of its step.
+
+        Arguments:
+            idx (int): variable index.
+            value (float): grid value.
+
+        Returns:
+            float or int: rounded value.
+        """
+        if self.integer[idx]:
+            return int(round(value))
+
+        return round(value, self.decimals[idx])
+
+    def snap_value(self, idx, value, ref=None):
+        """Snap a value of a variable to its grid.
+
+        If a reference (e.g. the value before the mutation) is given and the
+        value moved from it, but is snapped back to it, the value moves one
+        step in the same direction, so small variations are not lost.
+
+        Arguments:
+            idx (int): variable index.
+            value (float): value to snap.
+            ref (float or None, optional): reference value (default: None).
+
+        Returns:
+            float or int: snapped value.
+        """
+        step = self.steps[idx]
+        if step is None:
+            return value
+
+        snapped = self.round(idx, round(value / step) * step)
+        if ref is not None and value != ref and snapped == ref:
+            snapped = self.round(idx, snapped + math.copysign(step, value - ref))
+
+        return min(self.up[idx], max(self.low[idx], snapped))
+
+    def snap(self, ind, ref=None):
+        """Snap the discretized variables of an individual, in place.
+
+        Arguments:
+            ind (Individual): individual.
+            ref (list or None, optional): reference values of the variables
+                (default: None).
+
+        Returns:
+            Individual: the snapped individual.
+        """
+        for idx, step in enumerate(self.steps):
+            if step is not None:
+                ind[idx] = self.snap_value(idx, ind[idx], ref[idx] if ref is not None else None)
+
+        return ind
+
+    def values(self, ind):
+        """Get the snapped values of an individual, to send to the simulator.
+
+        Arguments:
+            ind (Individual): individual.
+
+        Returns:
+            list: variable values (the integer variables are int).
+        """
+        return [self.snap_value(idx, val) for idx, val in enumerate(ind)]
+
+    def num_values(self, idx):
+        """Number of grid values of a variable.
+
+        Arguments:
+            idx (int): variable index.
+
+        Returns:
+            int or None: number of values (None if the variable is continuous).
+        """
+        if self.steps[idx] is None:
+            return None
+
+        return int(round((self.up[idx] - self.low[idx]) / self.steps[idx])) + 1
+
+    def decorator(self, func):
+        """Decorate a toolbox operator, to snap the individuals it returns.
+
+        The values of the individuals given to the operator (the arguments with
+        a fitness) are the reference of the snap, so the offspring of the
+        mutation and crossover don't fall back to their parents.
+
+        Arguments:
+            func (callable): operator that returns an individual or a tuple of
+                individuals (e.g. "individual", "mate" or "mutate").
+
+        Returns:
+            callable: decorated operator.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            refs = [list(arg) for arg in args
+                    if hasattr(arg, 'fitness') and not isinstance(arg, type)]
+            result = func(*args, **kwargs)
+            for idx, ind in enumerate(result if isinstance(result, tuple) else (result,)):
+                self.snap(ind, refs[idx] if idx < len(refs) else None)
+            return result
+
+        return wrapper
@@ -0,0 +1,94 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Quality indicators of pareto fronts."""
+
+
+def reference_point(wvalues, margin=0.1):
+    """Get a hypervolume reference point that is dominated by all given points.
+
+    Arguments:
+        wvalues (list): weighted fitness values (to maximize) of the points.
+        margin (float, optional): relative distance of the reference point to
+            the worst point in each objective (default: 0.1).
+
+    Returns:
+        list: reference point, in the minimization space (-wvalues).
+    """
+    points = [[-val for val in wval] for wval in wvalues]
+    worst = [max(col) for col in zip(*points)]
+    best = [min(col) for col in zip(*points)]
+
+    return [w + margin * (abs(w - b) or abs(w) or 1.0) for w, b in zip(worst, best)]
+
+
+def hypervolume(wvalues, ref):
+    """Hypervolume of a set of points relative to a reference point.
+
+    Arguments:
+        wvalues (list): weighted fitness values (to maximize) of the points.
+        ref (list): reference point, in the minimization space (-wvalues).
+
+    Returns:
+        float: hypervolume (0 if no point dominates the reference point).
+    """
+    # The hypervolume is computed in the minimization space and only the points
+    # that dominate the reference point contribute
+    points = [[-val for val in wval] for wval in wvalues]
+    points = [p for p in points if all(val < r for val, r in zip(p, ref))]
+
+    if not points:
+        return 0.0
+
+    return _hypervolume(points, ref)
+
+
+def _hypervolume(points, ref):
+    """Exact hypervolume of points that dominate the reference point (minimization).
+
+    Bi-objective sets are swept in O(n log n). With more objectives, the
+    space is sliced along the last objective and each slice is computed
+    recursively, which is fast enough for the front sizes used in the
+    optimization.
+
+    Arguments:
+        points (list): points in the minimization space.
+        ref (list): reference point.
+
+    Returns:
+        float: hypervolume.
+    """
+    if len(ref) == 1:
+        return ref[0] - min(p[0] for p in points)
+
+    if len(ref) == 2:
+        volume = 0.0
+        best_y = ref[1]
+        for x, y in sorted(points):
+            if y < best_y:
+                volume += (ref[0] - x) * (best_y - y)
+                best_y = y
+        return volume
+
+    # Slice the space along the last objective
+    points = sorted(points, key=lambda p: p[-1])
+    volume = 0.0
+    for idx, point in enumerate(points):
+        upper = points[idx + 1][-1] if idx + 1 < len(points) else ref[-1]
+        if upper > point[-1]:
+            front = [p[:-1] for p in points[:idx + 1]]
+            volume += _hypervolume(front, ref[:-1]) * (upper - point[-1])
+
+    return volume
@@ -0,0 +1,133 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Individual and fitness types of the optimizers."""
+
+import array
+import copy
+import threading
+
+from deap import base, creator
+
+# Classes created for each fitness weights, shared by the optimizers
+_CLASSES = {}
+_LOCK = threading.Lock()
+
+
+class Fitness(base.Fitness):
+    """Multi-objective fitness, whose weights are set by "individual_class"."""
+
+    def __reduce__(self):
+        """Pickle the fitness with its weights, as its class is created at runtime."""
+        return make_fitness, (self.weights, self.values)
+
+
+class Individual(array.array):
+    """Circuit variables with the fitness, simulation results and violation.
+
+    The fitness class is set by "individual_class".
+    """
+
+    fitness_class = None
+
+    def __new__(cls, values=()):
+        """Create the array of circuit variables."""
+        return super().__new__(cls, 'd', values)
+
+    def __init__(self, values=()):  # pylint: disable=unused-argument
+        """Create the individual attributes."""
+        super().__init__()
+        self.fitness = self.fitness_class()
+        self.result = {}
+        self.violation = 0.0
+
+    def __deepcopy__(self, memo):
+        """Copy the individual and its attributes."""
+        clone = self.__class__(self)
+        memo[id(self)] = clone
+        clone.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return clone
+
+    def __reduce_ex__(self, protocol):
+        """Pickle the individual with its fitness weights."""
+        return make_individual, (self.fitness_class.weights, list(self)), self.__dict__
+
+
+def individual_class(weights):
+    """Get the individual class of the given fitness weights.
+
+    Unlike the DEAP "creator", that stores the classes in its module, the
+    classes are created once per weights and never replaced, so optimizers with
+    different objectives can run in the same process.
+
+    Arguments:
+        weights (tuple): fitness weights.
+
+    Returns:
+        type: individual class.
+    """
+    weights = tuple(float(weight) for weight in weights)
+    with _LOCK:
+        cls = _CLASSES.get(weights)
+        if cls is None:
+            fitness = type('FitnessMulti', (Fitness,), dict(weights=weights))
+            cls = type('Individual', (Individual,), dict(fitness_class=fitness))
+            _CLASSES[weights] = cls
+
+    return cls
+
+
+def make_individual(weights, values):
+    """Create an individual, e.g. when unpickled.
+
+    Arguments:
+        weights (tuple): fitness weights.
+        values (list): circuit variables.
+
+    Returns:
+        Individual: individual.
+    """
+    return individual_class(weights)(values)
+
+
+def make_fitness(weights, values):
+    """Create a fitness, e.g. when unpickled.
+
+    Arguments:
+        weights (tuple): fitness weights.
+        values (tuple): fitness values (empty if not evaluated).
+
+    Returns:
+        Fitness: fitness.
+    """
+    return individual_class(weights).fitness_class(values)
+
+
+def create_legacy_classes(weights):
+    """Create the DEAP "creator" classes of the older checkpoints.
+
+    The checkpoints saved before the per-optimizer classes reference the
+    "creator.FitnessMulti" and "creator.Individual" classes, which only exist
+    if created before unpickling. Existing classes are not replaced.
+
+    Arguments:
+        weights (tuple): fitness weights.
+    """
+    with _LOCK:
+        if not hasattr(creator, 'FitnessMulti'):
+            creator.create("FitnessMulti", base.Fitness, weights=tuple(weights))
+        if not hasattr(creator, 'Individual'):
+            creator.create("Individual", array.array, typecode='d',
+                           fitness=creator.FitnessMulti, result=dict, violation=float)
@@ -0,0 +1,228 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Island model, with asynchronous migration between sub-populations."""
+
+import logging
+import multiprocessing
+import queue
+import re
+
+logger = logging.getLogger('smoc.island')
+
+TOPOLOGIES = ('ring', 'fully_connected', 'star')
+
+
+def neighbours(idx, num_islands, topology):
+    """Get the islands that receive the migrants of an island.
+
+    Arguments:
+        idx (int): island index.
+        num_islands (int): number of islands.
+        topology (str): migration topology ('ring', 'fully_connected' or
+            'star', where the island 0 is the hub).
+
+    Raises:
+        ValueError: if the topology is invalid.
+
+    Returns:
+        list: indexes of the neighbour islands.
+    """
+    if topology == 'ring':
+        return [(idx + 1) % num_islands] if num_islands > 1 else []
+    if topology == 'fully_connected':
+        return [i for i in range(num_islands) if i != idx]
+    if topology == 'star':
+        return [i for i in range(1, num_islands)] if idx == 0 else [0]
+
+    raise ValueError(f"Invalid topology '{topology}' (valid topologies: {TOPOLOGIES})")
+
+
+def island_fname(fname, idx):
+    """Get the file name of an island from a run file name.
+
+    An existing island suffix is replaced, so the checkpoint of any island
+    can be used to continue the optimization of all islands.
+
+    Arguments:
+        fname (str): file name, e.g. "cp_20180909_10-00.pickle".
+        idx (int): island index.
+
+    Returns:
+        str: island file name, e.g. "cp_20180909_10-00_i1.pickle".
+    """
+    base, dot, ext = fname.rpartition('.')
+    if not dot:
+        base, ext = fname, ''
+    base = re.sub(r'_i\d+$', '', base)
+
+    return f"{base}_i{idx}{dot}{ext}"
+
+
+class Migrator:
+    """Asynchronous migration of non-dominated individuals between islands.
+
+    Every "interval" generations, the island sends its best "size" individuals
+    (selected with the selection operator of the island) to its neighbours and integrates the
+    migrants that arrived in its inbox meanwhile. The inbox is read without
+    blocking, so the islands never wait for each other.
+
+    Arguments:
+        idx (int): island index.
+        inboxes (list): inbox queue of each island.
+        topology (str): migration topology.
+        interval (int): generations between migrations.
+        size (int): number of migrants sent to each neighbour.
+    """
+
+    def __init__(self, idx, inboxes, topology, interval, size):
+        """Create the migrator."""
+        self.idx = idx
+        self.inboxes = inboxes
+        self.neighbours = neighbours(idx, len(inboxes), topology)
+        self.interval = interval
+        self.size = size
+
+    def __call__(self, gen, population, select):
+        """Migrate individuals, if it is a migration generation.
+
+        Arguments:
+            gen (int): generation number.
+            population (list): island population.
+            select (callable): selection operator of the island.
+
+        Returns:
+            list: population after the migration.
+        """
+        if gen % self.interval:
+            return population
+
+        emigrants = select(population, min(self.size, len(population)))
+
+        for neighbour in self.neighbours:
+            self.inboxes[neighbour].put(emigrants)
+
+        immigrants = []
+        while True:
+            try:
+                immigrants += self.inboxes[self.idx].get_nowait()
+            except queue.Empty:
+                break
+
+        if not immigrants:
+            return population
+
+        logger.info("Island %d: %d immigrants at generation %d", self.idx, len(immigrants), gen)
+
+        return select(population + immigrants, len(population))
+
+    def close(self):
+        """Don't wait for the migrants to be received when the island ends.
+
+        The neighbours may have already finished, so the migrants sent in the
+        last migrations are discarded instead of blocking the island process.
+        """
+        for inbox in self.inboxes:
+            inbox.cancel_join_thread()
+
+
+class IslandModel:
+    """Run several islands in parallel processes.
+
+    Each island runs "worker(idx, migrator, results, *args)" in its own
+    process, which must put a tuple "(idx, population, logbook)" in the
+    results queue when it finishes (or "(idx, None, error message)" if it
+    fails), and close the migrator.
+
+    Arguments:
+        worker (callable): island function.
+        num_islands (int): number of islands.
+        topology (str, optional): migration topology (default: 'ring').
+        interval (int, optional): generations between migrations (default: 5).
+        size (int, optional): number of migrants (default: 5).
+
+    Raises:
+        ValueError: If the topology, the interval or the size is invalid.
+    """
+
+    def __init__(self, worker, num_islands, topology='ring', interval=5, size=5):
+        """Create the island model."""
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Invalid topology '{topology}' (valid topologies: {TOPOLOGIES})")
+        if not isinstance(interval, int) or interval < 1:
+            raise ValueError(f"Invalid migration interval '{interval}' (must be an integer >= 1)")
+        if not isinstance(size, int) or size < 1:
+            raise ValueError(f"Invalid migration size '{size}' (must be an integer >= 1)")
+
+        self.worker = worker
+        self.num_islands = num_islands
+        self.topology = topology
+        self.interval = interval
+        self.size = size
+
+    def run(self, *args):
+        """Run the islands and wait for all of them to finish.
+
+        Arguments:
+            *args: extra arguments of the worker.
+
+        Returns:
+            tuple: final population of each island (None if failed) and the
+                logbook (or error message) of each island.
+        """
+        inboxes = [multiprocessing.Queue() for _ in range(self.num_islands)]
+        results = multiprocessing.Queue()
+
+        processes = []
+        for idx in range(self.num_islands):
+            migrator = Migrator(idx, inboxes, self.topology, self.interval, self.size)
+            proc = multiprocessing.Process(target=self.worker, args=(idx, migrator, results) + args,
+                                           name=f"island-{idx}")
+            proc.start()
+            processes.append(proc)
+
+        populations = [None] * self.num_islands
+        logbooks = [None] * self.num_islands
+        pending = set(range(self.num_islands))
+
+        while pending:
+            try:
+                idx, population, logbook = results.get(timeout=5)
+                populations[idx] = population
+                logbooks[idx] = logbook
+                pending.discard(idx)
+            except queue.Empty:
+                # An island that died without a result will never send it
+                for idx in list(pending):
+                    if not processes[idx].is_alive() and processes[idx].exitcode != 0:
+                        logbooks[idx] = f"process exited with code {processes[idx].exitcode}"
+                        pending.discard(idx)
+
+        # Discard the migrants that weren't received, so no process is blocked
+        for inbox in inboxes:
+            while True:
+                try:
+                    inbox.get_nowait()
+                except queue.Empty:
+                    break
+
+        for proc in processes:
+            proc.join()
+
+        for idx, (population, logbook) in enumerate(zip(populations, logbooks)):
+            if population is None:
+                logger.error("Island %d failed: %s", idx, logbook)
+
+        return populations, logbooks
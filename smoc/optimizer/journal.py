@@ -0,0 +1,135 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Write-ahead journal of the evaluations of a generation."""
+
+import os
+import pickle
+
+
+def journal_fname(checkpoint_fname):
+    """Get the journal file name of a checkpoint file name.
+
+    Arguments:
+        checkpoint_fname (str): checkpoint file name, e.g. "cp_20180909.pickle".
+
+    Returns:
+        str: journal file name, e.g. "cp_20180909.journal".
+    """
+    base, dot, ext = checkpoint_fname.rpartition('.')
+    if not dot or '/' in ext:
+        base = checkpoint_fname
+
+    return base + '.journal'
+
+
+class Journal:
+    """Record the evaluations of a generation as they complete.
+
+    Before the offspring of a generation are simulated, the journal is
+    restarted with a checkpoint of the previous generation and the pending
+    offspring (with the random state after the variation). The results of each
+    evaluated batch are then appended, so a run that stops during a generation
+    can continue it, only simulating the offspring without results.
+
+    Arguments:
+        fname (str): journal file path.
+
+    Keyword Arguments:
+        batch_size (int or None, optional): max offspring per simulation
+            request, so the results are recorded in smaller batches. If None,
+            all the offspring are sent in one request (default: None).
+    """
+
+    def __init__(self, fname, batch_size=None):
+        """Create the journal."""
+        self.fname = fname
+        self.batch_size = batch_size
+
+    def begin(self, checkpoint):
+        """Restart the journal with the checkpoint of a new generation.
+
+        The file is replaced atomically, so a crash keeps the previous journal.
+
+        Arguments:
+            checkpoint (dict): checkpoint with the 'generation' being evaluated,
+                the 'population' of the previous generation (None in the
+                initial evaluation), the pending 'offspring', the 'logbook' and
+                the 'rnd_state' (and the adapted 'operators', if enabled).
+        """
+        tmp_fname = self.fname + '.tmp'
+        with open(tmp_fname, 'wb') as f:
+            pickle.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fname, self.fname)
+
+    def record(self, offspring, individuals):
+        """Append the results of evaluated offspring.
+
+        Arguments:
+            offspring (list): offspring of the generation, in the journal order.
+            individuals (list): evaluated individuals of the offspring.
+        """
+        index = {id(ind): idx for idx, ind in enumerate(offspring)}
+        entries = [(index[id(ind)], list(ind), ind.fitness.values, ind.result, ind.violation)
+                   for ind in individuals]
+
+        with open(self.fname, 'ab') as f:
+            pickle.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self):
+        """Load the journal, applying the recorded results to the offspring.
+
+        A truncated last record (e.g. a crash while writing) is ignored.
+
+        Returns:
+            tuple or None: checkpoint of the generation, with the evaluated
+                offspring updated, and the number of evaluated offspring; or
+                None if there's no journal.
+        """
+        if not os.path.isfile(self.fname):
+            return None
+
+        with open(self.fname, 'rb') as f:
+            checkpoint = pickle.load(f)
+            offspring = checkpoint['offspring']
+
+            done = 0
+            while True:
+                try:
+                    entries = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+
+                for idx, values, fitness, result, violation in entries:
+                    # The values may differ from the pending ones, e.g. if the
+                    # deduplication regenerated the individual
+                    ind = offspring[idx]
+                    for pos, val in enumerate(values):
+                        ind[pos] = val
+                    ind.fitness.values = fitness
+                    ind.result = result
+                    ind.violation = violation
+                done += len(entries)
+
+        return checkpoint, done
+
+    def remove(self):
+        """Remove the journal, e.g. when the run ends."""
+        if os.path.isfile(self.fname):
+            os.remove(self.fname)
@@ -0,0 +1,180 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Batched pattern search to refine the pareto front."""
+
+import logging
+import random
+
+logger = logging.getLogger('smoc.local_search')
+
+
+def dominates(ind1, ind2):
+    """Check if an individual constraint-dominates another.
+
+    Arguments:
+        ind1 (Individual): individual with the "violation" attribute.
+        ind2 (Individual): individual with the "violation" attribute.
+
+    Returns:
+        bool: True if "ind1" dominates "ind2".
+    """
+    if ind1.violation != ind2.violation:
+        return ind1.violation < ind2.violation
+
+    return ind1.fitness.dominates(ind2.fitness)
+
+
+class LocalSearch:
+    """Compass pattern search around the members of the pareto front.
+
+    In each iteration, every front member is probed along each circuit
+    variable axis (in both directions), with a step relative to the variable
+    range. The probes of all members are simulated in a single batch, so the
+    parallel simulations of the simulator are kept busy. A member moves to a
+    probe that dominates it, otherwise its step is halved. The probes enter
+    the population through the selection operator, so the non-dominated ones
+    are also kept.
+
+    Arguments:
+        evaluate (callable): evaluates a list of individuals, given the
+            evaluated population (assigns the fitness, results and violation),
+            and returns the number of simulations.
+        toolbox (Toolbox): toolbox with the "select" and "clone" operators.
+        sort_fronts (callable): sorts individuals in pareto fronts.
+        bound_low (list): lower bounds of the circuit variables.
+        bound_up (list): upper bounds of the circuit variables.
+
+    Keyword Arguments:
+        interval (int, optional): generations between local searches. If 0,
+            there's no local search during the optimization (default: 0).
+        final (bool, optional): refine the final population (default: True).
+        iterations (int, optional): max iterations of each search (default: 5).
+        step (float, optional): initial step, relative to the variables range
+            (default: 0.05).
+        min_step (float, optional): a member stops being refined when its step
+            is smaller than this value (default: 0.001).
+        max_members (int, optional): max number of front members refined
+            (default: 10).
+        max_probes (int or None, optional): max probes per member in each
+            iteration, randomly chosen from the axis directions. If None, all
+            directions are probed (default: None).
+        grid (VariableGrid or None, optional): grid of the discretized
+            variables. The probes are snapped to the grid, and move at least
+            one grid step (default: None).
+        rng (Random or None, optional): random generator of the optimizer. If
+            None, the "random" module is used (default: None).
+    """
+
+    def __init__(self, evaluate, toolbox, sort_fronts, bound_low, bound_up, interval=0,
+                 final=True, iterations=5, step=0.05, min_step=0.001, max_members=10,
+                 max_probes=None, grid=None, rng=None):
+        """Create the local search."""
+        self.evaluate = evaluate
+        self.toolbox = toolbox
+        self.sort_fronts = sort_fronts
+        self.bound_low = bound_low
+        self.bound_up = bound_up
+        self.interval = interval
+        self.final = final
+        self.iterations = iterations
+        self.step = step
+        self.min_step = min_step
+        self.max_members = max_members
+        self.max_probes = max_probes
+        self.grid = grid
+        self.rng = rng if rng is not None else random
+
+    def probe(self, member, step):
+        """Create the probes around a member.
+
+        Arguments:
+            member (Individual): front member.
+            step (float): step, relative to the variables range.
+
+        Returns:
+            list: probes.
+        """
+        directions = [(idx, sign) for idx in range(len(member)) for sign in (-1, 1)]
+        if self.max_probes is not None and self.max_probes < len(directions):
+            directions = self.rng.sample(directions, self.max_probes)
+
+        probes = []
+        for idx, sign in directions:
+            low, up = self.bound_low[idx], self.bound_up[idx]
+            delta = step * (up - low)
+            if self.grid is not None and self.grid.steps[idx] is not None:
+                delta = max(delta, self.grid.steps[idx])
+                value = self.grid.snap_value(idx, member[idx] + sign * delta)
+            else:
+                value = min(up, max(low, member[idx] + sign * delta))
+            if value == member[idx]:  # The member is at the bound
+                continue
+
+            probe = self.toolbox.clone(member)
+            probe[idx] = value
+            del probe.fitness.values
+            probes.append(probe)
+
+        return probes
+
+    def run(self, gen, population):
+        """Refine the front members of the population.
+
+        The population is updated in place after each iteration, so it stays
+        consistent if the evaluation fails.
+
+        Arguments:
+            gen (int): generation number.
+            population (list): evaluated population.
+
+        Returns:
+            int: number of simulations performed.
+        """
+        front = self.sort_fronts(population)[0]
+        if len(front) > self.max_members:
+            front = self.toolbox.select(front, self.max_members)
+        members = [[member, self.step] for member in front]
+
+        num_sims = 0
+        for iteration in range(1, self.iterations + 1):
+            members = [member for member in members if member[1] >= self.min_step]
+            if not members:
+                break
+
+            # The probes of all members are simulated in one batch
+            probes = [self.probe(member, step) for member, step in members]
+            batch = [probe for member_probes in probes for probe in member_probes]
+            if not batch:
+                break
+
+            num_sims += self.evaluate(batch, population)
+
+            improved = 0
+            for member, member_probes in zip(members, probes):
+                better = [probe for probe in member_probes if dominates(probe, member[0])]
+                if better:
+                    member[0] = self.rng.choice(better)
+                    improved += 1
+                else:
+                    member[1] /= 2
+
+            population[:] = self.toolbox.select(population + batch, len(population))
+
+            logger.info("Generation %d local search iteration %d | probes: %d | "
+                        "improved members: %d/%d", gen, iteration, len(batch), improved,
+                        len(members))
+
+        return num_sims
@@ -0,0 +1,343 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""MOEA/D: multi-objective optimization by decomposition."""
+
+import logging
+import time
+
+import numpy as np
+from deap import tools
+
+from ..util.text_format import time_string
+from .ga import BudgetExceeded, OptimizerNSGA2
+from .nsga3 import das_dennis, default_divisions
+
+logger = logging.getLogger('smoc.moead')
+
+# Scalarizing functions of the subproblems
+DECOMPOSITIONS = ('tchebycheff', 'pbi')
+
+
+def scalarize(points, weights, ideal, decomposition='tchebycheff', theta=5.0):
+    """Scalarize normalized points with each weight vector.
+
+    Arguments:
+        points (ndarray): normalized objectives to minimize, one row per point.
+        weights (ndarray): weight vectors, one row per subproblem.
+        ideal (ndarray): ideal point (normalized).
+        decomposition (str, optional): 'tchebycheff' or 'pbi' (penalty-based
+            boundary intersection) (default: 'tchebycheff').
+        theta (float, optional): penalty of the distance to the weight
+            direction, in 'pbi' (default: 5.0).
+
+    Returns:
+        ndarray: scalarized value of each point (rows) in each subproblem
+            (columns), to minimize.
+    """
+    diff = points[:, None, :] - ideal  # (points, 1, objectives)
+
+    if decomposition == 'pbi':
+        directions = weights / np.linalg.norm(weights, axis=1, keepdims=True)
+        dist_along = (diff * directions).sum(axis=2)
+        dist_perp = np.linalg.norm(diff - dist_along[:, :, None] * directions, axis=2)
+        return dist_along + theta * dist_perp
+
+    # The null weights are replaced by a small value, so all objectives count
+    return (np.maximum(weights, 1e-6) * np.abs(diff)).max(axis=2)
+
+
+class OptimizerMOEAD(OptimizerNSGA2):
+    """A simulation-based circuit optimizer based on MOEA/D (Zhang and Li, 2007).
+
+    The problem is decomposed in scalar subproblems, one per weight vector,
+    each with one individual of the population. At each generation, every
+    subproblem creates one offspring from parents of its neighbourhood (the
+    subproblems with the closest weights), and all the offspring are simulated
+    in one request. Each offspring then replaces the individuals of its
+    neighbourhood whose subproblem it solves better, up to "max_replace".
+    The objectives are normalized by the ideal and nadir points of the
+    population, as the circuit objectives have different scales.
+
+    The evaluation, constraint handling, checkpoints and plots are the ones of
+    the "OptimizerNSGA2". With the "constrained" selection, an offspring with
+    a smaller violation is always better. The population size is the number
+    of weight vectors. The island migration, local search and adaptive
+    operators of the evolutionary loop aren't supported.
+
+    Arguments:
+        *args: arguments of the "OptimizerNSGA2".
+        weight_vectors (list or None, optional): weight vectors, one per
+            subproblem. If None, the Das-Dennis weights with "ref_divisions"
+            are used (default: None).
+        ref_divisions (int or None, optional): divisions of each objective axis
+            of the Das-Dennis weights. If None, the number of weights is close
+            to the population size (default: None).
+        decomposition (str, optional): scalarizing function, 'tchebycheff' or
+            'pbi' (default: 'tchebycheff').
+        pbi_theta (float, optional): penalty of the 'pbi' decomposition
+            (default: 5.0).
+        neighbours (int, optional): size of the neighbourhoods (default: 20).
+        mating_prob (float, optional): probability of selecting the parents
+            from the neighbourhood instead of the whole population
+            (default: 0.9).
+        max_replace (int, optional): max individuals replaced by an offspring
+            (default: 2).
+        **kwargs: keyword arguments of the "OptimizerNSGA2".
+
+    Raises:
+        ValueError: If the decomposition or the weight vectors are invalid.
+    """
+
+    loop_options = False
+
+    def __init__(self, *args, weight_vectors=None, ref_divisions=None,
+                 decomposition='tchebycheff', pbi_theta=5.0, neighbours=20, mating_prob=0.9,
+                 max_replace=2, **kwargs):
+        """Create the MOEA/D Optimizer."""
+        super().__init__(*args, **kwargs)
+
+        if decomposition not in DECOMPOSITIONS:
+            raise ValueError(f"Invalid decomposition '{decomposition}' (valid decompositions: "
+                             f"{DECOMPOSITIONS})")
+
+        num_obj = len(self.objectives)
+        if weight_vectors is not None:
+            weights = np.array(weight_vectors, dtype=float)
+            if weights.ndim != 2 or weights.shape[1] != num_obj or (weights < 0).any():
+                raise ValueError(f"The weight vectors must have {num_obj} non-negative values")
+        else:
+            if ref_divisions is None:
+                ref_divisions = default_divisions(num_obj, self.pop_size)
+            weights = das_dennis(num_obj, ref_divisions)
+
+        self.weights = weights
+        self.decomposition = decomposition
+        self.pbi_theta = pbi_theta
+        self.mating_prob = mating_prob
+        self.max_replace = max_replace
+
+        # Neighbourhood of each subproblem: the closest weights (itself included)
+        size = min(neighbours, len(weights))
+        dist = np.linalg.norm(weights[:, None, :] - weights[None, :, :], axis=2)
+        self.neighbourhoods = np.argsort(dist, axis=1)[:, :size]
+
+        if len(weights) != self.pop_size:
+            logger.info("MOEA/D population size: %d (number of weight vectors)", len(weights))
+        self.pop_size = len(weights)
+        logger.info("MOEA/D with %d subproblems | decomposition: %s | neighbourhood: %d",
+                    len(weights), decomposition, size)
+
+    def objectives_matrix(self, individuals):
+        """Get the objectives to minimize and the violation of individuals.
+
+        Arguments:
+            individuals (list): evaluated individuals.
+
+        Returns:
+            tuple: objectives (one row per individual) and violations.
+        """
+        points = -np.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+        if self.selection == 'constrained':
+            violations = np.array([ind.violation for ind in individuals], dtype=float)
+        else:
+            violations = np.zeros(len(individuals))
+
+        return points, violations
+
+    def vary(self, population):
+        """Create one offspring per subproblem, from parents of its neighbourhood.
+
+        Arguments:
+            population (list): population, one individual per subproblem.
+
+        Returns:
+            list: offspring, one per subproblem.
+        """
+        offspring = []
+        for idx in range(len(population)):
+            if self.rng.random() < self.mating_prob:
+                pool = self.neighbourhoods[idx].tolist()
+            else:
+                pool = list(range(len(population)))
+
+            parent1, parent2 = self.rng.sample(pool, 2) if len(pool) > 1 else (idx, idx)
+            child, other = [self.toolbox.clone(population[p]) for p in (parent1, parent2)]
+            if self.rng.random() < self.cx_prob:
+                child, _ = self.toolbox.mate(child, other)
+            child, = self.toolbox.mutate(child)
+            del child.fitness.values
+            offspring.append(child)
+
+        return offspring
+
+    def replace(self, population, offspring):
+        """Replace the individuals of the neighbourhoods with better offspring.
+
+        The scalarized values of all offspring in all subproblems are computed
+        at once, with the ideal and nadir points of the population and the
+        offspring.
+
+        Arguments:
+            population (list): population, updated in place.
+            offspring (list): evaluated offspring, one per subproblem.
+
+        Returns:
+            int: number of replacements.
+        """
+        pop_points, pop_violations = self.objectives_matrix(population)
+        off_points, off_violations = self.objectives_matrix(offspring)
+
+        # A failed simulation can have non-finite objectives, so the ideal and
+        # nadir points only use the finite rows
+        all_points = np.vstack([pop_points, off_points])
+        finite = all_points[np.isfinite(all_points).all(axis=1)]
+        if len(finite) == 0:
+            finite = np.zeros((1, all_points.shape[1]))
+        ideal = finite.min(axis=0)
+        scale = finite.max(axis=0) - ideal
+        scale = np.where(scale > 0, scale, 1)
+
+        # The non-finite scalarized values are the worst ones
+        zero = np.zeros(len(ideal))
+        current = scalarize((pop_points - ideal) / scale, self.weights, zero,
+                            self.decomposition, self.pbi_theta)
+        current = current[np.arange(len(population)), np.arange(len(population))]
+        current = np.where(np.isfinite(current), current, np.inf)
+        candidates = scalarize((off_points - ideal) / scale, self.weights, zero,
+                               self.decomposition, self.pbi_theta)
+        candidates = np.where(np.isfinite(candidates), candidates, np.inf)
+
+        replaced = 0
+        for idx in self.rng.sample(range(len(offspring)), len(offspring)):
+            hood = self.neighbourhoods[idx]
+            better = (off_violations[idx] < pop_violations[hood]) \
+                | ((off_violations[idx] == pop_violations[hood])
+                   & (candidates[idx, hood] < current[hood]))
+            slots = hood[better][:self.max_replace]
+            for slot in slots:
+                population[slot] = offspring[idx]
+            current[slots] = candidates[idx, slots]
+            pop_violations[slots] = off_violations[idx]
+            replaced += len(slots)
+
+        return replaced
+
+    def ga_mu_plus_lambda(self, mu, lambda_, checkpoint_load, checkpoint_fname,
+                          checkpoint_freq, sel_best, verbose):
+        """The MOEA/D loop.
+
+        Replaces the evolutionary algorithm of the "OptimizerNSGA2": at each
+        generation, the offspring of all subproblems are simulated in one
+        request and replace the worse individuals of their neighbourhoods.
+
+        Arguments:
+            mu (int): not used (one individual per subproblem).
+            lambda_ (int): not used (one offspring per subproblem).
+            checkpoint_load (str or None): checkpoint file to load, if provided.
+                If the journal is enabled, a generation recorded in the journal
+                of the checkpoint is continued.
+            checkpoint_fname (str): name of the checkpoint file to save.
+            checkpoint_freq (str): checkpoint saving frequency (relative to gen).
+            sel_best (int): not used.
+            verbose (bool): not used.
+
+        Returns:
+            tuple: final population and the logbook of the evolution.
+        """
+        stats = self.statistics()
+        cp, replay = self.start_run(checkpoint_load, checkpoint_fname)
+
+        if replay is not None and replay['generation'] > 0:
+            population, logbook = self.restore(replay)
+            start_gen = replay['generation']
+
+        elif cp is not None:
+            population, logbook = self.restore(cp)
+            start_gen = cp['generation'] + 1
+            logger.info("Running from a checkpoint | generation: %d", start_gen)
+
+        else:  # Create the population
+            if replay is not None:
+                _, logbook = self.restore(replay)
+                population = replay['offspring']
+                self.journal.begin(replay)
+            else:
+                population = self.toolbox.population(n=self.pop_size)
+                logbook = tools.Logbook()
+                logbook.header = 'gen', 'evals', 'population', 'fitness', 'result'
+                if self.journal is not None:
+                    self.journal.begin(self.checkpoint(0, None, logbook, offspring=population))
+            start_gen = 1
+
+            invalid_inds = [ind for ind in population if not ind.fitness.valid]
+            logger.info("Starting the initial evaluation | evaluations: %d", len(invalid_inds))
+            start_time = time.time()
+            num_sims = self.evaluate(invalid_inds, offspring=population)
+
+            with self.profiler.span('statistics'):
+                logbook.record(gen=0, evals=num_sims, **stats.compile(population))
+            if self.dashboard is not None:
+                self.update_dashboard(0, invalid_inds, population)
+            self.profiler.end_generation(0)
+            logger.info("Finished generation. Elapsed time: %s\n",
+                        time_string(time.time() - start_time))
+
+        if len(population) != len(self.weights):
+            raise ValueError(f"The population has {len(population)} individuals, but there "
+                             f"are {len(self.weights)} weight vectors")
+
+        for gen in range(start_gen, self.max_gen + 1):
+            if replay is not None and gen == replay['generation']:
+                offspring = replay['offspring']
+                self.journal.begin(replay)
+            else:
+                with self.profiler.span('variation'):
+                    offspring = self.vary(population)
+                if self.journal is not None:
+                    self.journal.begin(self.checkpoint(gen, population, logbook,
+                                                       offspring=offspring))
+
+            invalid_inds = [ind for ind in offspring if not ind.fitness.valid]
+            logger.info("Starting generation %d/%d | evaluations: %d", gen, self.max_gen,
+                        len(invalid_inds))
+            start_time = time.time()
+
+            try:
+                num_sims = self.evaluate(invalid_inds, population, offspring)
+            except BudgetExceeded as err:
+                logger.warning("Stopping at generation %d: %s", gen, err)
+                break
+
+            with self.profiler.span('selection'):
+                replaced = self.replace(population, offspring)
+
+            with self.profiler.span('statistics'):
+                logbook.record(gen=gen, evals=num_sims, **stats.compile(population))
+
+            if gen % checkpoint_freq == 0:
+                self.save_checkpoint(checkpoint_fname, gen, population, logbook)
+
+            logger.info("Finished generation. Elapsed time: %s | replacements: %d\n",
+                        time_string(time.time() - start_time), replaced)
+
+            if self.dashboard is not None:
+                self.update_dashboard(gen, invalid_inds, population)
+
+            self.profiler.end_generation(gen)
+
+        self.end_run()
+
+        return population, logbook
@@ -0,0 +1,180 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Monte-Carlo yield estimation with sequential sampling."""
+
+import logging
+import math
+
+logger = logging.getLogger('smoc.montecarlo')
+
+# Name of the simulation result (objective or constraint) that holds the yield
+YIELD_KEY = 'YIELD'
+
+
+def z_score(confidence):
+    """Get the two-sided standard normal quantile for a confidence level.
+
+    The quantile is found by bisection of the error function, so it doesn't
+    require scipy.
+
+    Arguments:
+        confidence (float): confidence level, in ]0, 1[.
+
+    Raises:
+        ValueError: if the confidence level is not in ]0, 1[.
+
+    Returns:
+        float: z score.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError(f"The confidence level should be in ]0, 1[, not {confidence}")
+
+    low, up = 0.0, 10.0
+    for _ in range(100):
+        mid = (low + up) / 2
+        if math.erf(mid / math.sqrt(2)) < confidence:
+            low = mid
+        else:
+            up = mid
+
+    return (low + up) / 2
+
+
+def wilson_interval(passed, n_samples, z):
+    """Wilson score interval of a binomial proportion.
+
+    Contrary to the normal approximation, the Wilson interval behaves well
+    for small sample counts and for proportions close to 0 or 1, which is the
+    usual case of the yield.
+
+    Arguments:
+        passed (int): number of samples that fulfill all the constraints.
+        n_samples (int): total number of samples.
+        z (float): z score of the confidence level.
+
+    Returns:
+        tuple: lower and upper limits of the interval.
+    """
+    if not n_samples:
+        return 0.0, 1.0
+
+    p = passed / n_samples
+    z2 = z * z
+    denom = 1 + z2 / n_samples
+    centre = (p + z2 / (2 * n_samples)) / denom
+    half = z * math.sqrt(p * (1 - p) / n_samples + z2 / (4 * n_samples**2)) / denom
+
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+class YieldEstimator:
+    """Sequential Monte-Carlo yield estimator.
+
+    The Monte-Carlo samples are simulated in rounds of "batch_samples" per
+    design. After each round, the designs whose yield confidence interval is
+    already decided, i.e. it doesn't contain the yield target or it is
+    narrower than "2 * tolerance", stop being sampled. All the undecided
+    designs of a round are packed in the same simulation request, so the
+    simulator parallelism is kept.
+
+    Arguments:
+        simulate (callable): function that receives a list of individuals,
+            the number of samples per individual and the number of the first
+            sample, and returns the samples results of each individual.
+        is_pass (callable): function that receives the results of a sample and
+            returns True if it fulfills all the constraints.
+
+    Keyword Arguments:
+        target (float, optional): yield target (default: 0.9).
+        confidence (float, optional): confidence level of the yield interval
+            (default: 0.95).
+        batch_samples (int, optional): samples per design and round
+            (default: 16).
+        max_samples (int, optional): max samples per design (default: 256).
+        tolerance (float, optional): half-width of the yield interval that is
+            considered decided, even if it contains the target (default: 0.02).
+    """
+
+    def __init__(self, simulate, is_pass, target=0.9, confidence=0.95, batch_samples=16,
+                 max_samples=256, tolerance=0.02):
+        """Create the estimator."""
+        if batch_samples < 1 or max_samples < batch_samples:
+            raise ValueError("Monte-Carlo samples should verify 1 <= batch_samples <= max_samples")
+
+        self.simulate = simulate
+        self.is_pass = is_pass
+        self.target = target
+        self.z = z_score(confidence)
+        self.batch_samples = batch_samples
+        self.max_samples = max_samples
+        self.tolerance = tolerance
+
+        # Number of Monte-Carlo samples simulated during the run
+        self.total_samples = 0
+
+    def is_decided(self, passed, n_samples):
+        """Check if the yield estimate of a design is decided.
+
+        Arguments:
+            passed (int): number of samples that fulfill all the constraints.
+            n_samples (int): total number of samples.
+
+        Returns:
+            bool: True if the design doesn't need more samples.
+        """
+        if n_samples >= self.max_samples:
+            return True
+
+        low, up = wilson_interval(passed, n_samples, self.z)
+
+        return low >= self.target or up < self.target or (up - low) <= 2 * self.tolerance
+
+    def estimate(self, individuals):
+        """Estimate the yield of the given individuals.
+
+        Arguments:
+            individuals (list): nominally feasible individuals.
+
+        Returns:
+            list: yield estimate and number of samples of each individual.
+        """
+        passed = [0] * len(individuals)
+        n_samples = [0] * len(individuals)
+        pending = list(range(len(individuals)))
+        start = 1
+
+        while pending:
+            # Only simulate the samples that fit in the max samples
+            samples = min(self.batch_samples, self.max_samples - start + 1)
+            results = self.simulate([individuals[idx] for idx in pending], samples, start)
+
+            for idx, res_ind in zip(pending, results):
+                passed[idx] += sum(1 for sample in res_ind if self.is_pass(sample))
+                n_samples[idx] += len(res_ind)
+
+            self.total_samples += samples * len(pending)
+            start += samples
+
+            # Stop when the max samples are reached, even if some simulations failed
+            if start > self.max_samples:
+                break
+
+            pending = [idx for idx in pending if not self.is_decided(passed[idx], n_samples[idx])]
+
+        logger.info("Monte-Carlo yield estimation | designs: %d | samples: %d",
+                    len(individuals), sum(n_samples))
+
+        return [(pas / num if num else 0.0, num) for pas, num in zip(passed, n_samples)]
@@ -0,0 +1,227 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Reference-point based NSGA-III, for many-objective optimization."""
+
+import itertools
+import logging
+import random
+from math import factorial
+
+import numpy as np
+
+from .ga import OptimizerNSGA2
+from .selection import constrained_domination, sort_fronts
+
+logger = logging.getLogger('smoc.nsga3')
+
+
+def num_ref_points(num_obj, divisions):
+    """Number of Das-Dennis reference points.
+
+    Arguments:
+        num_obj (int): number of objectives.
+        divisions (int): number of divisions of each objective axis.
+
+    Returns:
+        int: number of reference points.
+    """
+    return factorial(num_obj + divisions - 1) // (factorial(divisions) * factorial(num_obj - 1))
+
+
+def das_dennis(num_obj, divisions):
+    """Generate uniformly distributed reference points in the unit simplex.
+
+    Each point has coordinates multiple of 1/divisions that sum to 1 (Das and
+    Dennis, 1998).
+
+    Arguments:
+        num_obj (int): number of objectives.
+        divisions (int): number of divisions of each objective axis.
+
+    Returns:
+        ndarray: reference points, one per row.
+    """
+    # Each combination of "num_obj - 1" bars in "divisions + num_obj - 1"
+    # positions splits the divisions among the objectives
+    bars = np.array(list(itertools.combinations(range(divisions + num_obj - 1), num_obj - 1)),
+                    dtype=int).reshape(-1, num_obj - 1)
+    bounds = np.hstack([np.full((len(bars), 1), -1), bars,
+                        np.full((len(bars), 1), divisions + num_obj - 1)])
+
+    return (np.diff(bounds, axis=1) - 1) / divisions
+
+
+def default_divisions(num_obj, pop_size):
+    """Get the number of divisions with as many reference points as the population.
+
+    Arguments:
+        num_obj (int): number of objectives.
+        pop_size (int): population size.
+
+    Returns:
+        int: number of divisions (at least 1).
+    """
+    divisions = 1
+    while num_ref_points(num_obj, divisions + 1) <= pop_size:
+        divisions += 1
+
+    return divisions
+
+
+def normalize(points):
+    """Normalize the points with the ideal point and the hyperplane intercepts.
+
+    The extreme point of each objective is the point that minimizes the
+    achievement scalarizing function along its axis. If the hyperplane of the
+    extreme points is degenerate, the worst value of each objective is used.
+
+    Arguments:
+        points (ndarray): objective values to minimize, one row per point.
+
+    Returns:
+        ndarray: normalized points.
+    """
+    num_obj = points.shape[1]
+    translated = points - points.min(axis=0)
+
+    weights = np.full((num_obj, num_obj), 1e-6)
+    np.fill_diagonal(weights, 1.0)
+    asf = (translated[None, :, :] / weights[:, None, :]).max(axis=2)
+    extremes = translated[asf.argmin(axis=1)]
+
+    try:
+        intercepts = 1 / np.linalg.solve(extremes, np.ones(num_obj))
+        if not np.all(np.isfinite(intercepts)) or np.any(intercepts <= 1e-6):
+            raise np.linalg.LinAlgError
+    except np.linalg.LinAlgError:
+        intercepts = translated.max(axis=0)
+
+    intercepts[intercepts <= 1e-6] = 1.0
+
+    return translated / intercepts
+
+
+def associate(points, ref_points):
+    """Associate each point with the closest reference line.
+
+    Arguments:
+        points (ndarray): normalized points.
+        ref_points (ndarray): reference points.
+
+    Returns:
+        tuple: index of the reference point and perpendicular distance to its
+            line, for each point.
+    """
+    directions = ref_points / np.linalg.norm(ref_points, axis=1, keepdims=True)
+    proj = points @ directions.T
+    dist = np.linalg.norm(points[:, None, :] - proj[:, :, None] * directions[None, :, :], axis=2)
+    niche = dist.argmin(axis=1)
+
+    return niche, dist[np.arange(len(points)), niche]
+
+
+def sel_nsga3(individuals, k, ref_points, constrained=False, rng=random):
+    """Select the best individuals with the NSGA-III selection (Deb and Jain, 2014).
+
+    The last front is filled by niching: the reference points with fewer
+    associated individuals are preferred, so the selected individuals are
+    spread along the reference directions.
+
+    Arguments:
+        individuals (list): individuals to select from.
+        k (int): number of individuals to select.
+        ref_points (ndarray): reference points.
+        constrained (bool, optional): sort the fronts with the
+            constraint-domination, using the "violation" attribute of the
+            individuals (default: False).
+        rng (Random, optional): random generator of the niching (default: the
+            "random" module).
+
+    Returns:
+        list: selected individuals.
+    """
+    wvalues = np.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+    if constrained:
+        violations = np.array([ind.violation for ind in individuals], dtype=float)
+    else:
+        violations = np.zeros(len(individuals))
+
+    fronts = sort_fronts(constrained_domination(wvalues, violations), k)
+
+    chosen = np.concatenate(fronts[:-1]).astype(int) if len(fronts) > 1 else np.array([], int)
+    last = fronts[-1]
+    if len(chosen) + len(last) <= k:
+        return [individuals[idx] for idx in np.concatenate([chosen, last])]
+
+    # Normalize the objectives (to minimize) of all sorted individuals
+    members = np.concatenate([chosen, last])
+    niche, dist = associate(normalize(-wvalues[members]), ref_points)
+
+    niche_count = np.bincount(niche[:len(chosen)], minlength=len(ref_points))
+    last_niche = niche[len(chosen):]
+    last_dist = dist[len(chosen):]
+
+    available = np.ones(len(last), dtype=bool)
+    selected = []
+    while len(chosen) + len(selected) < k:
+        # Reference points with candidates in the last front
+        candidates = np.unique(last_niche[available])
+        counts = niche_count[candidates]
+        ref = rng.choice(list(candidates[counts == counts.min()]))
+
+        members_ref = np.flatnonzero(available & (last_niche == ref))
+        if niche_count[ref] == 0:
+            pick = members_ref[last_dist[members_ref].argmin()]
+        else:
+            pick = rng.choice(list(members_ref))
+
+        selected.append(pick)
+        available[pick] = False
+        niche_count[ref] += 1
+
+    return [individuals[idx] for idx in np.concatenate([chosen, last[selected]])]
+
+
+class OptimizerNSGA3(OptimizerNSGA2):
+    """A simulation-based circuit optimizer based on the NSGA-III algorithm.
+
+    The evaluation, constraint handling, checkpoints and plots are the ones of
+    the "OptimizerNSGA2", only the selection is replaced by the reference-point
+    based NSGA-III selection, which keeps the diversity with many objectives.
+
+    Arguments:
+        *args: arguments of the "OptimizerNSGA2".
+        ref_divisions (int or None, optional): number of divisions of each
+            objective axis of the Das-Dennis reference points. If None, the
+            number of reference points is close to the population size
+            (default: None).
+        **kwargs: keyword arguments of the "OptimizerNSGA2".
+    """
+
+    def __init__(self, *args, ref_divisions=None, **kwargs):
+        """Create the NSGA-III Optimizer."""
+        super().__init__(*args, **kwargs)
+
+        num_obj = len(self.objectives)
+        if ref_divisions is None:
+            ref_divisions = default_divisions(num_obj, self.pop_size)
+
+        self.ref_points = das_dennis(num_obj, ref_divisions)
+        logger.info("NSGA-III with %d reference points (%d divisions)", len(self.ref_points),
+                    ref_divisions)
+
+        self.toolbox.register("select", sel_nsga3, ref_points=self.ref_points,
+                              constrained=self.selection == 'constrained', rng=self.rng)
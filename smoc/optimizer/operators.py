@@ -0,0 +1,106 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Bounded variation operators with the random generator of the optimizer."""
+
+
+def cx_simulated_binary_bounded(ind1, ind2, eta, low, up, rng):
+    """Simulated binary crossover (SBX), modifying the individuals in place.
+
+    Same as the "deap.tools.cxSimulatedBinaryBounded", but the random numbers
+    are drawn from the given generator instead of the global "random" module,
+    so each optimizer has its own random sequence.
+
+    Arguments:
+        ind1 (Individual): first individual.
+        ind2 (Individual): second individual.
+        eta (float): crowding degree of the crossover.
+        low (list): lower bounds of the variables.
+        up (list): upper bounds of the variables.
+        rng (Random): random generator.
+
+    Returns:
+        tuple: the two individuals.
+    """
+    for i, (xl, xu) in enumerate(zip(low, up)):
+        if rng.random() > 0.5 or abs(ind1[i] - ind2[i]) <= 1e-14:
+            continue
+
+        x1 = min(ind1[i], ind2[i])
+        x2 = max(ind1[i], ind2[i])
+        rand = rng.random()
+
+        beta = 1.0 + (2.0 * (x1 - xl) / (x2 - x1))
+        alpha = 2.0 - beta ** -(eta + 1)
+        if rand <= 1.0 / alpha:
+            beta_q = (rand * alpha) ** (1.0 / (eta + 1))
+        else:
+            beta_q = (1.0 / (2.0 - rand * alpha)) ** (1.0 / (eta + 1))
+        c1 = 0.5 * (x1 + x2 - beta_q * (x2 - x1))
+
+        beta = 1.0 + (2.0 * (xu - x2) / (x2 - x1))
+        alpha = 2.0 - beta ** -(eta + 1)
+        if rand <= 1.0 / alpha:
+            beta_q = (rand * alpha) ** (1.0 / (eta + 1))
+        else:
+            beta_q = (1.0 / (2.0 - rand * alpha)) ** (1.0 / (eta + 1))
+        c2 = 0.5 * (x1 + x2 + beta_q * (x2 - x1))
+
+        c1 = min(max(c1, xl), xu)
+        c2 = min(max(c2, xl), xu)
+        if rng.random() <= 0.5:
+            ind1[i], ind2[i] = c2, c1
+        else:
+            ind1[i], ind2[i] = c1, c2
+
+    return ind1, ind2
+
+
+def mut_polynomial_bounded(ind, eta, low, up, indpb, rng):
+    """Polynomial mutation, modifying the individual in place.
+
+    Same as the "deap.tools.mutPolynomialBounded", but the random numbers are
+    drawn from the given generator.
+
+    Arguments:
+        ind (Individual): individual.
+        eta (float): crowding degree of the mutation.
+        low (list): lower bounds of the variables.
+        up (list): upper bounds of the variables.
+        indpb (float): independent probability of mutation of each variable.
+        rng (Random): random generator.
+
+    Returns:
+        tuple: the individual.
+    """
+    mut_pow = 1.0 / (eta + 1.0)
+    for i, (xl, xu) in enumerate(zip(low, up)):
+        if rng.random() > indpb:
+            continue
+
+        x = ind[i]
+        rand = rng.random()
+        if rand < 0.5:
+            xy = 1.0 - (x - xl) / (xu - xl)
+            val = 2.0 * rand + (1.0 - 2.0 * rand) * xy ** (eta + 1)
+            delta_q = val ** mut_pow - 1.0
+        else:
+            xy = 1.0 - (xu - x) / (xu - xl)
+            val = 2.0 * (1.0 - rand) + 2.0 * (rand - 0.5) * xy ** (eta + 1)
+            delta_q = 1.0 - val ** mut_pow
+
+        ind[i] = min(max(x + delta_q * (xu - xl), xl), xu)
+
+    return ind,
@@ -0,0 +1,293 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Client that answers the simulation requests from recorded simulations."""
+
+import logging
+import math
+import pickle
+
+import numpy as np
+from deap import tools
+
+from .individual import create_legacy_classes
+
+logger = logging.getLogger('smoc.replay')
+
+# Handling of the designs far from all the recorded simulations
+EXTRAPOLATIONS = ('flag', 'fail')
+
+
+def read_objects(fname, weights=()):
+    """Read the objects pickled in a file, one after the other.
+
+    A truncated last object (e.g. a crash while writing) is ignored.
+
+    Arguments:
+        fname (str): file path.
+        weights (tuple, optional): fitness weights, to create the classes of
+            the older files (default: ()).
+
+    Returns:
+        list: objects.
+    """
+    try:
+        return _read_objects(fname)
+    except AttributeError:
+        # Saved with the DEAP "creator" classes
+        create_legacy_classes(weights)
+        return _read_objects(fname)
+
+
+def _read_objects(fname):
+    """Read the objects pickled in a file (see "read_objects")."""
+    objects = []
+    with open(fname, 'rb') as f:
+        while True:
+            try:
+                objects.append(pickle.load(f))
+            except (EOFError, pickle.UnpicklingError):
+                break
+
+    return objects
+
+
+def extract_records(obj):
+    """Get the simulated designs of an object saved by the optimizer.
+
+    Arguments:
+        obj (object): logbook (populations of all generations), checkpoint or
+            journal checkpoint (population and offspring), list of individuals
+            (archive) or list of journal entries.
+
+    Returns:
+        list: (variables, results) of each simulated design.
+    """
+    if isinstance(obj, tools.Logbook):
+        individuals = [ind for record in obj.chapters.get('population', [])
+                       for ind in record.get('value') or ()]
+    elif isinstance(obj, dict):
+        individuals = list(obj.get('population') or ()) + list(obj.get('offspring') or ())
+    elif isinstance(obj, list):
+        individuals = obj
+    else:
+        return []
+
+    records = []
+    for ind in individuals:
+        if isinstance(ind, tuple):  # Journal entry
+            _, values, _, result, _ = ind
+        else:
+            values, result = ind, getattr(ind, 'result', None)
+        if result:
+            records.append((list(values), result))
+
+    return records
+
+
+class ReplayClient:
+    """A client that answers the requests from an archive of past simulations.
+
+    The results of a design are the ones of the nearest recorded design, or
+    interpolated from its nearest neighbours (inverse distance weighting). The
+    distances are measured with the variables normalized to their bounds. A
+    design farther than "max_distance" from all recorded designs is an
+    extrapolation: it's counted, its variables are stored in "flagged" and, if
+    "extrapolation" is 'fail', it's answered as a failed simulation (all
+    results "nan").
+
+    It has the same interface as the "socad.Client", so it can replace the
+    connection to the server, e.g. to tune the optimizer parameters offline.
+
+    Arguments:
+        variables (list): circuit variables of each recorded design, in the
+            order of "circuit_vars".
+        results (list): simulation results (dict) of each recorded design.
+        circuit_vars (dict): bounds (low, up) of each circuit variable.
+
+    Keyword Arguments:
+        neighbours (int, optional): recorded designs used by the interpolation.
+            If 1, the results of the nearest design are used (default: 1).
+        max_distance (float, optional): max normalized distance (relative to
+            the diagonal of the design space) to the nearest recorded design
+            (default: 0.05).
+        extrapolation (str, optional): 'flag' or 'fail' (default: 'flag').
+        budget (int or None, optional): max simulations answered. If None,
+            there's no limit (default: None).
+
+    Raises:
+        ValueError: if there are no recorded designs or the extrapolation is
+            invalid.
+    """
+
+    def __init__(self, variables, results, circuit_vars, neighbours=1, max_distance=0.05,
+                 extrapolation='flag', budget=None):
+        """Create the client."""
+        if not results:
+            raise ValueError("There are no recorded simulations to replay")
+        if extrapolation not in EXTRAPOLATIONS:
+            raise ValueError(f"Invalid extrapolation '{extrapolation}' (valid: "
+                             f"{EXTRAPOLATIONS})")
+
+        self.names = list(circuit_vars.keys())
+        bounds = np.array([circuit_vars[key] for key in self.names], dtype=float)
+        self.low = bounds[:, 0]
+        self.span = np.where(bounds[:, 1] > bounds[:, 0], bounds[:, 1] - bounds[:, 0], 1.0)
+
+        self.variables = np.asarray(variables, dtype=float)
+        self.points = self.normalize(self.variables)
+        self.results = results
+        self.neighbours = min(neighbours, len(results))
+        self.max_distance = max_distance
+        self.extrapolation = extrapolation
+        self.budget = budget
+
+        self.sims = 0          # Simulations answered
+        self.extrapolated = 0  # Designs far from the recorded ones
+        self.flagged = set()   # Variables of the extrapolated designs
+        self.last_req = None
+
+    @classmethod
+    def from_files(cls, fnames, circuit_vars, weights=(), **kwargs):
+        """Create the client from the files saved by the optimizer.
+
+        The designs repeated in several files (e.g. the logbook and the
+        checkpoint of a run) are only used once.
+
+        Arguments:
+            fnames (list): logbook, checkpoint, journal or archive files.
+            circuit_vars (dict): bounds (low, up) of each circuit variable.
+            weights (tuple, optional): fitness weights, to load the older
+                files (default: ()).
+            **kwargs: keyword arguments of the "ReplayClient".
+
+        Returns:
+            ReplayClient: client.
+        """
+        designs = {}
+        for fname in fnames:
+            for obj in read_objects(fname, weights):
+                for values, result in extract_records(obj):
+                    designs.setdefault(tuple(values), result)
+
+        logger.info("Loaded %d recorded simulations from %d files", len(designs), len(fnames))
+
+        return cls([list(values) for values in designs], list(designs.values()), circuit_vars,
+                   **kwargs)
+
+    def normalize(self, variables):
+        """Normalize the variables to their bounds.
+
+        Arguments:
+            variables (ndarray): variables, one design per row.
+
+        Returns:
+            ndarray: normalized variables.
+        """
+        return (variables - self.low) / self.span
+
+    def replay(self, design):
+        """Get the results of a design from the recorded simulations.
+
+        Arguments:
+            design (dict): circuit variables.
+
+        Returns:
+            dict: simulation results.
+        """
+        point = self.normalize(np.array([design[key] for key in self.names], dtype=float))
+        dist = np.sqrt(((self.points - point) ** 2).sum(axis=1) / len(self.names))
+
+        if self.neighbours > 1:
+            nearest = np.argpartition(dist, self.neighbours - 1)[:self.neighbours]
+            nearest = nearest[np.argsort(dist[nearest])]
+        else:
+            nearest = [int(dist.argmin())]
+
+        closest = self.results[nearest[0]]
+        if dist[nearest[0]] > self.max_distance:
+            self.extrapolated += 1
+            self.flagged.add(tuple(design[key] for key in self.names))
+            if self.extrapolation == 'fail':
+                return {key: math.nan for key in closest}
+
+        if self.neighbours == 1 or dist[nearest[0]] == 0:
+            return dict(closest)
+
+        weights = 1 / dist[nearest]
+        results = {}
+        for key in closest:
+            values = np.array([self.results[idx].get(key, math.nan) for idx in nearest],
+                              dtype=float)
+            valid = ~np.isnan(values)
+            results[key] = float(np.average(values[valid], weights=weights[valid])) \
+                if valid.any() else math.nan
+
+        return results
+
+    def answer(self, req):
+        """Answer a request of the optimizer.
+
+        Arguments:
+            req (dict): request.
+
+        Returns:
+            dict: response.
+        """
+        req_type, data, req_id = req.get('type'), req.get('data'), req.get('id')
+
+        if req_type == 'loadSimulator':
+            return dict(type=req_type, data={key: 0 for key in self.names})
+
+        if req_type != 'updateAndRun':
+            return dict(type='error', data=f"Request '{req_type}' can't be replayed", id=req_id)
+
+        # The requests with extra parameters (e.g. a fidelity stage) have the
+        # circuit variables in 'variables'
+        designs = data['variables'] if isinstance(data, dict) else data
+        if self.budget is not None and self.sims + len(designs) > self.budget:
+            return dict(type='budgetExceeded',
+                        data=f"Replay budget of {self.budget} simulations exhausted",
+                        id=req_id)
+
+        self.sims += len(designs)
+        return dict(type=req_type, data=[self.replay(design) for design in designs], id=req_id)
+
+    def run(self, host, port):  # pylint: disable=unused-argument
+        """Connect to the "server" (nothing to connect).
+
+        Returns:
+            list: remote socket name.
+        """
+        return ['replay', 0]
+
+    def send_data(self, obj):
+        """Send a request, answered when the response is received.
+
+        Arguments:
+            obj (dict): request.
+        """
+        self.last_req = obj
+
+    def recv_data(self):
+        """Receive the response of the last request.
+
+        Returns:
+            dict: response.
+        """
+        return self.answer(self.last_req)
+
+    def close(self):
+        """Close the "connection" (nothing to close)."""
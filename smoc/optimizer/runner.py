@@ -0,0 +1,113 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Run several optimizations concurrently in the same process."""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('smoc.runner')
+
+
+def check_jobs(jobs):
+    """Check that the optimizations don't share their client or checkpoint.
+
+    Arguments:
+        jobs (list): (optimizer, run_cfg) of each optimization.
+
+    Raises:
+        ValueError: if two optimizations have the same client or checkpoint
+            file.
+    """
+    clients = set()
+    checkpoints = set()
+    for optimizer, run_cfg in jobs:
+        client = getattr(optimizer, 'client', None)
+        if client is not None:
+            if id(client) in clients:
+                raise ValueError("The concurrent optimizations must have their own client")
+            clients.add(id(client))
+
+        fname = run_cfg['checkpoint_fname']
+        if fname in checkpoints:
+            raise ValueError(f"The checkpoint file '{fname}' is used by two optimizations")
+        checkpoints.add(fname)
+
+
+def run_concurrent(jobs, max_workers=None):
+    """Run several optimizations concurrently, each in its own thread.
+
+    Each optimizer has its own individual classes and random generator, and
+    must have its own client (e.g. connected to a server of a shared pool) and
+    checkpoint file. The optimizations mostly wait for the simulations, so the
+    threads don't compete for the interpreter.
+
+    Arguments:
+        jobs (list): (optimizer, run_cfg) of each optimization, where "run_cfg"
+            (dict) has the arguments of "run_ga" (at least 'checkpoint_fname').
+        max_workers (int or None, optional): max optimizations running at the
+            same time. If None, all the optimizations run at once
+            (default: None).
+
+    Raises:
+        ValueError: if two optimizations have the same client or checkpoint
+            file.
+
+    Returns:
+        list: result of each optimization, in the order of the jobs: the
+            pareto fronts and the logbook, or the exception raised by the
+            optimization.
+    """
+    jobs = list(jobs)
+    check_jobs(jobs)
+    if not jobs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as executor:
+        futures = [executor.submit(optimizer.run_ga, **run_cfg) for optimizer, run_cfg in jobs]
+
+        results = []
+        for idx, future in enumerate(futures):
+            err = future.exception()
+            if err is not None:
+                logger.error("Optimization %d failed: %s - %s", idx, type(err).__name__, err)
+                results.append(err)
+            else:
+                results.append(future.result())
+
+    return results
+
+
+async def run_async(optimizer, executor=None, **run_cfg):
+    """Run an optimization in an asyncio task, without blocking the event loop.
+
+    The optimization runs in a thread of the executor, so several tasks (with
+    their own client and checkpoint file) can be awaited concurrently, e.g.
+    with "asyncio.gather".
+
+    Arguments:
+        optimizer (OptimizerNSGA2): optimizer.
+        executor (Executor or None, optional): executor that runs the
+            optimization. If None, the default executor of the event loop is
+            used (default: None).
+        **run_cfg: arguments of "run_ga".
+
+    Returns:
+        tuple: pareto fronts and the logbook of the evolution.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, functools.partial(optimizer.run_ga, **run_cfg))
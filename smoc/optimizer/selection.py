@@ -0,0 +1,155 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Constrained NSGA-II selection, vectorized over the population."""
+
+import numpy as np
+
+
+def constrained_domination(wvalues, violations):
+    """Get the constraint-domination matrix of a set of points.
+
+    A point constraint-dominates another if (Deb, 2000):
+        - it is feasible and the other is not;
+        - both are infeasible and it has a smaller violation;
+        - both are feasible and it Pareto-dominates the other.
+
+    Arguments:
+        wvalues (ndarray): weighted fitness values (to maximize), one row per point.
+        violations (ndarray): aggregated constraint violation of each point.
+
+    Returns:
+        ndarray: boolean matrix, where [i, j] is True if i dominates j.
+    """
+    better_equal = (wvalues[:, None, :] >= wvalues[None, :, :]).all(axis=2)
+    better = (wvalues[:, None, :] > wvalues[None, :, :]).any(axis=2)
+
+    feasible = violations == 0
+    both_feasible = feasible[:, None] & feasible[None, :]
+    both_infeasible = ~feasible[:, None] & ~feasible[None, :]
+
+    return ((feasible[:, None] & ~feasible[None, :])
+            | (both_infeasible & (violations[:, None] < violations[None, :]))
+            | (both_feasible & better_equal & better))
+
+
+def sort_fronts(dominates, k):
+    """Sort points in non-dominated fronts, until at least k points are sorted.
+
+    Arguments:
+        dominates (ndarray): domination matrix.
+        k (int): number of points to sort.
+
+    Returns:
+        list: indexes of the points of each front.
+    """
+    # Number of points that dominate each point
+    dom_count = dominates.sum(axis=0)
+    remaining = np.ones(len(dom_count), dtype=bool)
+
+    fronts = []
+    sorted_count = 0
+    while sorted_count < k and remaining.any():
+        front = np.flatnonzero(remaining & (dom_count == 0))
+        fronts.append(front)
+        sorted_count += len(front)
+        remaining[front] = False
+        dom_count -= dominates[front].sum(axis=0)
+
+    return fronts
+
+
+def crowding_distance(wvalues):
+    """Crowding distance of the points of a front.
+
+    Arguments:
+        wvalues (ndarray): weighted fitness values of the front points.
+
+    Returns:
+        ndarray: crowding distance of each point.
+    """
+    num_points, num_obj = wvalues.shape
+    distances = np.zeros(num_points)
+    if num_points < 3:
+        distances[:] = np.inf
+        return distances
+
+    order = np.argsort(wvalues, axis=0, kind='mergesort')
+    sorted_vals = wvalues[order, np.arange(num_obj)]
+    span = sorted_vals[-1] - sorted_vals[0]
+    span[span == 0] = 1.0
+
+    # The extreme points are always kept
+    gaps = np.empty((num_points, num_obj))
+    gaps[0] = gaps[-1] = np.inf
+    gaps[1:-1] = (sorted_vals[2:] - sorted_vals[:-2]) / span
+
+    for obj in range(num_obj):
+        distances[order[:, obj]] += gaps[:, obj]
+
+    return distances
+
+
+def sort_constrained_fronts(individuals):
+    """Sort individuals in non-dominated fronts, with the constraint-domination.
+
+    Arguments:
+        individuals (list): individuals with the "violation" attribute.
+
+    Returns:
+        list: individuals of each front.
+    """
+    wvalues = np.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+    violations = np.array([ind.violation for ind in individuals], dtype=float)
+
+    fronts = sort_fronts(constrained_domination(wvalues, violations), len(individuals))
+
+    return [[individuals[idx] for idx in front] for front in fronts]
+
+
+def sel_constrained_nsga2(individuals, k):
+    """Select the best individuals with the constraint-domination NSGA-II.
+
+    The individuals must have a "violation" attribute, with the aggregated
+    normalized constraint violation (0 if feasible). The crowding distance
+    is assigned to the individuals of the sorted fronts, as in the
+    "deap.tools.selNSGA2".
+
+    Arguments:
+        individuals (list): individuals to select from.
+        k (int): number of individuals to select.
+
+    Returns:
+        list: selected individuals.
+    """
+    wvalues = np.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+    violations = np.array([ind.violation for ind in individuals], dtype=float)
+
+    fronts = sort_fronts(constrained_domination(wvalues, violations), k)
+
+    chosen = []
+    for front in fronts:
+        distances = crowding_distance(wvalues[front])
+        for idx, dist in zip(front, distances):
+            individuals[idx].fitness.crowding_dist = dist
+
+        if len(chosen) + len(front) <= k:
+            chosen.extend(front)
+        else:
+            # Keep the most isolated individuals of the last front
+            order = np.argsort(-distances, kind='mergesort')
+            chosen.extend(front[order[:k - len(chosen)]])
+
+    return [individuals[idx] for idx in chosen]
@@ -20,12 +20,66 @@ import os
 import time
 
 from socad import Client
-from .optimizer.ga import OptimizerNSGA2
+from .optimizer.bayes import OptimizerBayes
+from .optimizer.ga import BudgetExceeded, OptimizerNSGA2
+from .optimizer.island import IslandModel, island_fname
+from .optimizer.moead import OptimizerMOEAD
+from .optimizer.nsga3 import OptimizerNSGA3
+from .optimizer.montecarlo import YIELD_KEY
 from .util import file
 from .util import plot as plt
+from .util.connection import ReconnectingClient
+from .util.dashboard import Dashboard
+from .util.profiling import Profiler
 
+# Optimization algorithms, selected with the "algorithm" key of the optimizer config
+ALGORITHMS = {
+    'nsga2': OptimizerNSGA2,
+    'nsga3': OptimizerNSGA3,
+    'bayes': OptimizerBayes,
+    'moead': OptimizerMOEAD,
+}
 
-def load_simulator(client, pop_size):
+
+def create_client(server_cfg):
+    """Create the client that communicates with the server.
+
+    Arguments:
+        server_cfg (dict): server configuration. If it has 'reconnect'
+            parameters, passed to "ReconnectingClient", the client resumes its
+            session after a connection loss.
+
+    Returns:
+        Client or ReconnectingClient: client.
+    """
+    if server_cfg.get('reconnect') is not None:
+        return ReconnectingClient(**server_cfg['reconnect'])
+
+    return Client()
+
+
+def get_measurements(objectives, constraints):
+    """Get the simulation results consumed by the optimizer.
+
+    The yield is computed by the optimizer from the Monte-Carlo samples, so it
+    isn't a simulation result.
+
+    Arguments:
+        objectives (dict): optimization objectives.
+        constraints (dict): optimization constraints.
+
+    Returns:
+        list: names of the measurements, without repetitions.
+    """
+    measurements = []
+    for key in list(objectives) + list(constraints):
+        if key != YIELD_KEY and key not in measurements:
+            measurements.append(key)
+
+    return measurements
+
+
+def load_simulator(client, pop_size, measurements=None):
     """Load the Cadence simulator before starting the optimization.
 
     This task is performed once per run (contrary to the Cadence ADE) that
@@ -35,6 +89,9 @@ def load_simulator(client, pop_size):
     Arguments:
         client (handler): client that communicates with the simulator.
         pop_size (int): population size.
+        measurements (list or None, optional): simulation results consumed by
+            the optimizer, extracted by the server after each simulation. If
+            None, the extraction of the server run file is used (default: None).
 
     Raises:
         KeyError: if the response format is invalid.
@@ -43,7 +100,10 @@ def load_simulator(client, pop_size):
     Returns:
         dict: circuit design variables.
     """
-    req = dict(type='loadSimulator', data=pop_size)
+    if measurements is None:
+        req = dict(type='loadSimulator', data=pop_size)
+    else:
+        req = dict(type='loadSimulator', data=dict(pop_size=pop_size, measurements=measurements))
     client.send_data(req)
     res = client.recv_data()
 
@@ -53,12 +113,186 @@ def load_simulator(client, pop_size):
     except KeyError as err:  # if the key does not exist
         raise KeyError(err)
 
+    if res_type == 'error':
+        raise TypeError(f"The server couldn't load the simulator: {data}")
+
     if res_type != 'loadSimulator':
         raise TypeError('The response type should be "loadSimulator"!!!')
 
     return data
 
 
+def add_yield_spec(montecarlo_cfg, objectives, constraints):
+    """Add the yield to the optimization objectives or constraints.
+
+    Arguments:
+        montecarlo_cfg (dict): Monte-Carlo configuration parameters. The "mode"
+            key is removed from the dictionary.
+        objectives (dict): optimization objectives w/ units.
+        constraints (dict): optimization constraints w/ units.
+
+    Raises:
+        ValueError: if the yield mode is invalid.
+    """
+    mode = montecarlo_cfg.pop('mode', 'constraint')
+
+    if mode == 'objective':
+        objectives[YIELD_KEY] = [1.0, '']  # Maximize the yield
+    elif mode == 'constraint':
+        constraints[YIELD_KEY] = [[montecarlo_cfg.get('target', 0.9), 'None'], '']
+    else:
+        raise ValueError(f"Invalid Monte-Carlo mode '{mode}' (objective or constraint)")
+
+
+def check_circuit_vars(circuit_vars, res_vars):
+    """Check if the circuit variables exist in the simulator.
+
+    Arguments:
+        circuit_vars (dict): circuit design variables of the configuration file.
+        res_vars (dict): circuit design variables returned by the simulator.
+
+    Raises:
+        ValueError: if the circuit variables don't match with the variables
+                    provided in the configuration file.
+    """
+    diff = set(circuit_vars.keys()) - set(res_vars.keys())
+
+    if diff:  # If it's not empty (i.e. bool(diff) is True)
+        err = "The circuit variables don't match with the variables provided in the file"
+        raise ValueError(err)
+
+
+def make_dirs(*dirs):
+    """Create the given directories, if they do not exist.
+
+    Arguments:
+        *dirs (str): directories paths.
+    """
+    for directory in dirs:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+
+def create_optimizer(smoc_cfg, client, debug, **kwargs):
+    """Create the optimizer from the SMOC configuration.
+
+    Arguments:
+        smoc_cfg (dict): SMOC configuration.
+        client (handler or None): client that communicates with the simulator.
+        debug (bool): running mode (debug mode if True).
+        **kwargs: extra arguments of the optimizer.
+
+    Raises:
+        ValueError: if the algorithm, an option not supported by the algorithm
+            or a variable grid is invalid.
+
+    Returns:
+        OptimizerNSGA2: optimizer.
+    """
+    optimizer_cfg = smoc_cfg['optimizer_cfg']
+
+    algorithm = optimizer_cfg.get('algorithm', 'nsga2')
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Invalid algorithm '{algorithm}' (valid algorithms: "
+                         f"{', '.join(ALGORITHMS)})")
+    engine = ALGORITHMS[algorithm]
+    if smoc_cfg.get('island_cfg') and not engine.loop_options:
+        raise ValueError(f"The algorithm '{algorithm}' doesn't support the island model")
+    if algorithm == 'nsga3':
+        kwargs['ref_divisions'] = optimizer_cfg.get('ref_divisions')
+    elif algorithm == 'bayes':
+        kwargs['init_size'] = optimizer_cfg.get('init_size')
+        kwargs['candidates'] = optimizer_cfg.get('candidates', 500)
+    elif algorithm == 'moead':
+        for key in ('weight_vectors', 'ref_divisions', 'decomposition', 'pbi_theta',
+                    'neighbours', 'mating_prob', 'max_replace'):
+            if key in optimizer_cfg:
+                kwargs[key] = optimizer_cfg[key]
+
+    # Remove the units from the "circuit_vars", "objectives" and "constraints"
+    circuit_vars_tmp = {key: val[0] for key, val in smoc_cfg['circuit_vars'].items()}
+    # The optional third element of a circuit variable is its grid
+    var_grids = {key: val[2] for key, val in smoc_cfg['circuit_vars'].items() if len(val) > 2}
+    objectives_tmp = {key: val[0] for key, val in smoc_cfg['objectives'].items()}
+    constraints_tmp = {key: val[0] for key, val in smoc_cfg['constraints'].items()}
+
+    return engine(objectives_tmp, constraints_tmp, circuit_vars_tmp,
+                  optimizer_cfg['pop_size'], optimizer_cfg['max_gen'], client,
+                  optimizer_cfg['mut_prob'], optimizer_cfg['cx_prob'],
+                  optimizer_cfg['mut_eta'], optimizer_cfg['cx_eta'],
+                  optimizer_cfg['penalty_delta'], optimizer_cfg['penalty_weight'],
+                  debug, smoc_cfg.get('montecarlo_cfg'),
+                  selection=optimizer_cfg.get('selection'),
+                  mut_indpb=optimizer_cfg.get('mut_indpb'),
+                  adaptive=optimizer_cfg.get('adaptive', False),
+                  local_search_cfg=smoc_cfg.get('local_search_cfg'),
+                  dedup_cfg=smoc_cfg.get('dedup_cfg'), var_grids=var_grids,
+                  fidelity_cfg=smoc_cfg.get('fidelity_cfg'),
+                  progress_cfg=smoc_cfg.get('progress_cfg'),
+                  journal_cfg=smoc_cfg.get('journal_cfg'),
+                  archive_cfg=smoc_cfg.get('archive_cfg'), **kwargs)
+
+
+def run_island(idx, migrator, results, smoc_cfg, checkpoint_fname, checkpoint_load, debug):
+    """Run the optimization of one island, against its own server.
+
+    This function runs in the island process. The final population and the
+    logbook are put in the results queue.
+
+    Arguments:
+        idx (int): island index.
+        migrator (Migrator): island migration.
+        results (Queue): results queue.
+        smoc_cfg (dict): SMOC configuration.
+        checkpoint_fname (str): name of the checkpoint file to save (the
+            island suffix is added).
+        checkpoint_load (str or None): checkpoint file to load, if provided
+            (the island suffix is replaced).
+        debug (bool): running mode (debug mode if True).
+    """
+    logger = logging.getLogger('smoc')
+    optimizer_cfg = smoc_cfg['optimizer_cfg']
+    server_cfg = smoc_cfg['island_cfg']['servers'][idx]
+
+    client = None
+    try:
+        client = create_client(server_cfg)
+        addr = client.run(server_cfg['host'], server_cfg['port'])
+        logger.info("Island %d: connected to server with the address %s:%s", idx, addr[0],
+                    addr[1])
+
+        res_vars = load_simulator(client, optimizer_cfg['pop_size'],
+                                  get_measurements(smoc_cfg['objectives'],
+                                                   smoc_cfg['constraints']))
+        check_circuit_vars(smoc_cfg['circuit_vars'], res_vars)
+
+        # Each island must have its own random sequence
+        smoc_ga = create_optimizer(smoc_cfg, client, debug, migrator=migrator)
+        smoc_ga.rng.seed(16384 + idx if debug else None)
+
+        population, logbook = smoc_ga.ga_mu_plus_lambda(
+            mu=optimizer_cfg['mu'],
+            lambda_=optimizer_cfg['lambda'],
+            checkpoint_load=island_fname(checkpoint_load, idx) if checkpoint_load else None,
+            checkpoint_fname=island_fname(checkpoint_fname, idx),
+            checkpoint_freq=optimizer_cfg['checkpoint_freq'],
+            sel_best=optimizer_cfg['sel_best'],
+            verbose=smoc_cfg['project_cfg']['verbose'])
+
+        # End the connection with the server ('shutdown' also stops a daemon server)
+        client.send_data(dict(type='info',
+                              data='shutdown' if server_cfg.get('shutdown') else 'exit'))
+
+        # The final fronts include the archive of the island
+        results.put((idx, smoc_ga.with_archive(population), logbook))
+    except (OSError, TypeError, ValueError, KeyError, BudgetExceeded) as err:
+        results.put((idx, None, f"{type(err).__name__} - {err}"))
+    finally:
+        if client is not None:
+            client.close()
+        migrator.close()
+
+
 def print_summary(log_file, current_time, project_cfg, optimizer_cfg, server_cfg,
                   objectives, constraints, circuit_vars, checkpoint_load, debug):
     """Print a summary with the project, circuit, and optimizer configurations.
@@ -88,6 +322,7 @@ def print_summary(log_file, current_time, project_cfg, optimizer_cfg, server_cfg
 * Running mode (normal/debug): {running_mode}        
 * Running from checkpoint: {checkpoint_fname}        
 ***************************** Optimizer parameters *****************************
+* Algorithm: {optimizer_cfg.get('algorithm', 'nsga2')}
 * Population size: {optimizer_cfg['pop_size']}
 * # of individuals to select: {optimizer_cfg['mu']}
 * # of children to produce: {optimizer_cfg['lambda']}
@@ -96,8 +331,11 @@ def print_summary(log_file, current_time, project_cfg, optimizer_cfg, server_cfg
 * Crossover probability: {optimizer_cfg['cx_prob']}
 * Mutation crowding degree: {optimizer_cfg['mut_eta']}
 * Crossover crowding degree: {optimizer_cfg['cx_eta']}
+* Mutation probability per variable: {optimizer_cfg.get('mut_indpb', optimizer_cfg['mut_prob'])}
+* Adaptive operators: {optimizer_cfg.get('adaptive', False)}
 * Fitness penalty delta: {optimizer_cfg['penalty_delta']}
 * Fitness penalty weight: {optimizer_cfg['penalty_weight']}
+* Constraint handling (selection): {optimizer_cfg.get('selection', 'penalty')}
 **************************** Optimization objectives ***************************\n"""
     for key, val in objectives.items():
         summary += f"* {key}: {val[0]} [{val[1]}]\n"
@@ -106,7 +344,10 @@ def print_summary(log_file, current_time, project_cfg, optimizer_cfg, server_cfg
         summary += f"* {key}: min = {val[0][0]}, max = {val[0][1]} [{val[1]}]\n"
     summary += "*************************** Circuit design variables ***************************\n"
     for key, val in circuit_vars.items():
-        summary += f"* {key}: min = {val[0][0]}, max = {val[0][1]} [{val[1]}]\n"
+        summary += f"* {key}: min = {val[0][0]}, max = {val[0][1]} [{val[1]}]"
+        if len(val) > 2:  # Discretized variable
+            summary += ''.join(f", {opt} = {opt_val}" for opt, opt_val in val[2].items())
+        summary += "\n"
     summary += "******************************* Server parameters ******************************\n"
     summary += f"* Host: {server_cfg['host']}\n"
     summary += f"* Port: {server_cfg['port']}\n"
@@ -168,6 +409,81 @@ def create_logger(verbose, fname):
     return logger
 
 
+def run_islands(smoc_cfg, checkpoint_load, debug, log_file, current_time, fnames):
+    """Run the island model, where each island runs in its own process and server.
+
+    Arguments:
+        smoc_cfg (dict): SMOC configuration.
+        checkpoint_load (str or None): checkpoint file to load, if provided.
+        debug (boolean): running mode (debug mode if True).
+        log_file (str): file where the logs are printed.
+        current_time (str): start date and time.
+        fnames (tuple): project directory and checkpoint, logbook and plot
+            file names.
+
+    Returns:
+        int: exit code.
+    """
+    logger = logging.getLogger('smoc')
+
+    project_cfg = smoc_cfg['project_cfg']
+    optimizer_cfg = smoc_cfg['optimizer_cfg']
+    objectives = smoc_cfg['objectives']
+    constraints = smoc_cfg['constraints']
+    circuit_vars = smoc_cfg['circuit_vars']
+    island_cfg = smoc_cfg['island_cfg']
+    servers = island_cfg['servers']
+    project_dir, checkpoint_fname, logbook_fname, plot_fname = fnames
+
+    optimizer_cfg.setdefault('mu', optimizer_cfg['pop_size'])
+    optimizer_cfg.setdefault('lambda', optimizer_cfg['pop_size'])
+
+    if smoc_cfg.get('montecarlo_cfg'):
+        add_yield_spec(smoc_cfg['montecarlo_cfg'], objectives, constraints)
+
+    make_dirs(project_dir, *[os.path.dirname(fname) for fname in fnames[1:]])
+
+    # The summary shows the servers of all islands
+    server_cfg = dict(host=', '.join(str(srv['host']) for srv in servers),
+                      port=', '.join(str(srv['port']) for srv in servers))
+    print_summary(log_file, current_time, project_cfg, optimizer_cfg, server_cfg,
+                  objectives, constraints, circuit_vars, checkpoint_load, debug)
+
+    try:
+        model = IslandModel(run_island, len(servers),
+                            topology=island_cfg.get('topology', 'ring'),
+                            interval=island_cfg.get('migration_interval', 5),
+                            size=island_cfg.get('migration_size', 5))
+
+        # Optimizer without client, to sort the fronts of the islands
+        smoc_ga = create_optimizer(smoc_cfg, None, debug)
+    except ValueError as err:
+        logger.error("TYPE/VALUE ERROR - %s", err)
+        return 4
+
+    logger.info("Starting %d islands...", len(servers))
+    populations, logbooks = model.run(smoc_cfg, checkpoint_fname, checkpoint_load, debug)
+
+    population = [ind for pop in populations if pop is not None for ind in pop]
+    if not population:
+        logger.error("All islands failed")
+        return 3
+
+    # Save the logbook of each island
+    for idx, logbook in enumerate(logbooks):
+        if populations[idx] is not None:
+            file.write_pickle(island_fname(logbook_fname, idx), logbook)
+
+    # The final fronts are taken from the union of the islands
+    fronts = smoc_ga.sort_fronts(population)
+
+    logger.info("Plotting the pareto fronts...")
+    plt.plot_pareto_fronts(fronts, circuit_vars, objectives, constraints, plot_fname=plot_fname)
+
+    logger.info("Exiting program... Bye!")
+    return 0 if all(pop is not None for pop in populations) else 3
+
+
 def run_smoc(config_file, checkpoint_load, debug):
     """Run SMOC.
 
@@ -181,7 +497,9 @@ def run_smoc(config_file, checkpoint_load, debug):
                     provided in the configuration file.
 
     Returns:
-        int: exit code.
+        int: exit code (0: success, 1: invalid config file, 2: socket error,
+            3: connection error, 4: type/value error, 5: key error, 6: budget
+            exceeded, 7: stalled simulation).
     """
     # Read config file and load the configurations into variables
     smoc_cfg = file.read_yaml(config_file)
@@ -197,6 +515,8 @@ def run_smoc(config_file, checkpoint_load, debug):
     objectives = smoc_cfg['objectives']
     constraints = smoc_cfg['constraints']
     server_cfg = smoc_cfg['server_cfg']
+    # Optional configs
+    montecarlo_cfg = smoc_cfg.get('montecarlo_cfg')
 
     # Get current date and time
     current_time = time.strftime("%Y%m%d_%H-%M", time.localtime())
@@ -209,6 +529,9 @@ def run_smoc(config_file, checkpoint_load, debug):
     logbook_fname = logbook_dir + f"/lb_{current_time}.pickle"
     plot_dir = project_dir + f"/{project_cfg['plot_path']}"
     plot_fname = plot_dir + f"/plt_{current_time}.html"
+    # The metrics are optional
+    metrics_dir = project_dir + f"/{project_cfg.get('metrics_path', 'metrics')}"
+    metrics_fname = metrics_dir + f"/mt_{current_time}.jsonl"
 
     # Get the verbosity
     verbose = project_cfg['verbose']
@@ -218,9 +541,14 @@ def run_smoc(config_file, checkpoint_load, debug):
 
     logger = create_logger(verbose, log_file)
 
+    # Run several islands, each one with its own server
+    if smoc_cfg.get('island_cfg'):
+        return run_islands(smoc_cfg, checkpoint_load, debug, log_file, current_time,
+                           (project_dir, checkpoint_fname, logbook_fname, plot_fname))
+
     try:
         logger.info("Starting client...")
-        client = Client()
+        client = create_client(server_cfg)
     except OSError as err:
         logger.error("SOCKET - %s", err)
         print("\n**** Ending program... Bye! ****")
@@ -245,41 +573,39 @@ def run_smoc(config_file, checkpoint_load, debug):
 
         # Load the simulator
         logger.info("Loading simulator...")
-        res_vars = load_simulator(client, pop_size)
+        res_vars = load_simulator(client, pop_size, get_measurements(objectives, constraints))
 
         circuit_vars = smoc_cfg['circuit_vars']
-        diff = set(circuit_vars.keys()) - set(res_vars.keys())
+        check_circuit_vars(circuit_vars, res_vars)
 
-        if diff:  # If it's not empty (i.e. bool(diff) is True)
-            err = "The circuit variables don't match with the variables provided in the file"
-            raise ValueError(err)
+        # Use the yield as an objective or constraint
+        if montecarlo_cfg:
+            add_yield_spec(montecarlo_cfg, objectives, constraints)
 
         # Create the required directories, if they do not exist
-        if not os.path.exists(project_dir):
-            os.makedirs(project_dir)
-        if not os.path.exists(checkpoint_dir):
-            os.makedirs(checkpoint_dir)
-        if not os.path.exists(logbook_dir):
-            os.makedirs(logbook_dir)
-        if not os.path.exists(plot_dir):
-            os.makedirs(plot_dir)
+        make_dirs(project_dir, checkpoint_dir, logbook_dir, plot_dir)
+        if 'metrics_path' in project_cfg:
+            make_dirs(metrics_dir)
+
+        # Start the live dashboard
+        dashboard = None
+        if project_cfg.get('dashboard_port'):
+            dashboard = Dashboard(circuit_vars, objectives, constraints, optimizer_cfg['max_gen'],
+                                  port=project_cfg['dashboard_port'])
+            dashboard.start()
+
+        # Create the profiler of the optimization loop
+        profiler = Profiler(metrics_fname if 'metrics_path' in project_cfg else None)
+        if project_cfg.get('metrics_port'):
+            profiler.start_http_server(project_cfg['metrics_port'])
 
         # Print the configurations summary
         print_summary(log_file, current_time, project_cfg, optimizer_cfg, server_cfg,
                       objectives, constraints, circuit_vars, checkpoint_load, debug)
 
-        # Remove the units from the "circuit_vars", "objectives" and "constraints"
-        circuit_vars_tmp = {key: val[0] for key, val in circuit_vars.items()}
-        objectives_tmp = {key: val[0] for key, val in objectives.items()}
-        constraints_tmp = {key: val[0] for key, val in constraints.items()}
-
         # Load the optimizer
-        smoc_ga = OptimizerNSGA2(objectives_tmp, constraints_tmp, circuit_vars_tmp,
-                                 pop_size, optimizer_cfg['max_gen'], client,
-                                 optimizer_cfg['mut_prob'], optimizer_cfg['cx_prob'],
-                                 optimizer_cfg['mut_eta'], optimizer_cfg['cx_eta'],
-                                 optimizer_cfg['penalty_delta'], optimizer_cfg['penalty_weight'],
-                                 debug)
+        smoc_ga = create_optimizer(smoc_cfg, client, debug, profiler=profiler,
+                                   dashboard=dashboard)
 
         # Run the GA
         fronts, logbook = smoc_ga.run_ga(checkpoint_fname,
@@ -292,13 +618,16 @@ def run_smoc(config_file, checkpoint_load, debug):
 
         # End the connection with the server
         logger.info("Ending connection with the server...")
-        req = dict(type='info', data='exit')
+        # The 'shutdown' also stops a daemon server
+        req = dict(type='info', data='shutdown' if server_cfg.get('shutdown') else 'exit')
         client.send_data(req)
         client.close()  # Close the client socket
 
         # Save logbook pickled to file
         file.write_pickle(logbook_fname, logbook)
 
+        profiler.close()
+
         # Print statistics
         logger.info("Plotting the pareto fronts...")
         plt.plot_pareto_fronts(fronts, circuit_vars, objectives, constraints, plot_fname=plot_fname)
@@ -312,6 +641,12 @@ def run_smoc(config_file, checkpoint_load, debug):
     except KeyError as err:
         logger.error("KEY ERROR - %s", err)
         return_code = 5
+    except BudgetExceeded as err:
+        logger.error("BUDGET EXCEEDED - %s", err)
+        return_code = 6
+    except TimeoutError as err:  # The simulator stalled (see "stall_timeout")
+        logger.error("STALLED SIMULATION - %s", err)
+        return_code = 7
 
     # If there was an exception (return_code != 0) it's necessary to close the socket
     if return_code:
@@ -0,0 +1,235 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Tuning of the optimizer parameters against recorded simulations."""
+
+import contextlib
+import copy
+import io
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+
+from .optimizer.indicators import hypervolume, reference_point
+from .optimizer.replay import ReplayClient
+from .smoc import create_optimizer
+from .util import file
+
+logger = logging.getLogger('smoc.tuning')
+
+# Configurations that need a real simulator, ignored in the trials
+UNSUPPORTED_CFGS = ('montecarlo_cfg', 'fidelity_cfg', 'island_cfg', 'journal_cfg')
+
+# Replay client of a worker process, created once by "init_worker"
+_REPLAY = {}
+
+
+def configurations(grid):
+    """Get all the combinations of the tuned parameters.
+
+    Arguments:
+        grid (dict): values of each optimizer parameter.
+
+    Returns:
+        list: parameters (dict) of each configuration.
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+def init_worker(variables, results, replay_cfg):
+    """Store the recorded simulations in a worker process.
+
+    The records are sent once to each worker, instead of once per trial.
+
+    Arguments:
+        variables (list): circuit variables of each recorded design.
+        results (list): simulation results of each recorded design.
+        replay_cfg (dict): keyword arguments of the "ReplayClient".
+    """
+    _REPLAY.update(variables=variables, results=results, replay_cfg=replay_cfg)
+    # Only the warnings of the optimizers are logged
+    logging.getLogger('smoc').setLevel(logging.WARNING)
+
+
+def run_trial(smoc_cfg, params, seed):
+    """Run an optimization with the given parameters against the replay client.
+
+    Arguments:
+        smoc_cfg (dict): SMOC configuration.
+        params (dict): optimizer parameters of the trial.
+        seed (int): seed of the optimizer.
+
+    Returns:
+        dict: trial 'params', 'seed', 'sims', 'extrapolated' simulations, the
+            objectives of the feasible designs of the first front, weighted to
+            be maximized, in 'points', the number of those points from
+            extrapolated designs in 'flagged', and the number of designs
+            dropped for non-finite objectives in 'invalid'.
+    """
+    smoc_cfg = copy.deepcopy(smoc_cfg)
+    for key in UNSUPPORTED_CFGS:
+        smoc_cfg.pop(key, None)
+
+    optimizer_cfg = smoc_cfg['optimizer_cfg']
+    optimizer_cfg.update(params)
+    # "mu" and "lambda" follow the tuned population size
+    for key in ('mu', 'lambda'):
+        if key not in params and (key not in optimizer_cfg or 'pop_size' in params):
+            optimizer_cfg[key] = optimizer_cfg['pop_size']
+
+    circuit_vars = {key: val[0] for key, val in smoc_cfg['circuit_vars'].items()}
+    client = ReplayClient(_REPLAY['variables'], _REPLAY['results'], circuit_vars,
+                          **_REPLAY['replay_cfg'])
+    optimizer = create_optimizer(smoc_cfg, client, False, seed=seed)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(io.StringIO()):
+        fronts, _ = optimizer.run_ga(os.path.join(tmp_dir, 'cp.pickle'),
+                                     optimizer_cfg['mu'], optimizer_cfg['lambda'],
+                                     checkpoint_freq=optimizer_cfg['max_gen'] + 1,
+                                     sel_best=0, verbose=False)
+
+    # The penalized fitness depends on the tuned parameters, so the trials are
+    # compared by the simulation results of the feasible designs
+    weights = [val[0] for val in smoc_cfg['objectives'].values()]
+    points, flagged, invalid = [], 0, 0
+    for ind in fronts[0]:
+        if optimizer.violation(ind.result) != 0:
+            continue
+        point = [weight * ind.result[key] for weight, key in zip(weights, smoc_cfg['objectives'])]
+        # A failed (or 'fail' extrapolated) simulation has no place in the
+        # hypervolume
+        if not all(math.isfinite(val) for val in point):
+            invalid += 1
+            continue
+        values = optimizer.grid.values(ind) if optimizer.grid is not None else ind
+        flagged += tuple(values) in client.flagged
+        points.append(point)
+
+    return dict(params=params, seed=seed, sims=client.sims, extrapolated=client.extrapolated,
+                points=points, flagged=flagged, invalid=invalid)
+
+
+def rank_trials(trials):
+    """Rank the configurations by their hypervolume per simulation.
+
+    The hypervolume of all trials is measured with the same reference point.
+    The trials of each configuration (one per seed) are averaged.
+
+    Arguments:
+        trials (list): results of "run_trial".
+
+    Returns:
+        list: 'params', number of 'trials', and mean 'hypervolume', 'sims',
+            'extrapolated', 'flagged', 'invalid' and 'hv_per_sim' of each
+            configuration, from the best to the worst.
+    """
+    all_points = [point for trial in trials for point in trial['points']]
+    ref = reference_point(all_points) if all_points else None
+
+    ranking = {}
+    for trial in trials:
+        hv = hypervolume(trial['points'], ref) if trial['points'] else 0.0
+        entry = ranking.setdefault(repr(sorted(trial['params'].items())), dict(
+            params=trial['params'], hypervolume=0.0, sims=0, extrapolated=0, flagged=0,
+            invalid=0, hv_per_sim=0.0, trials=0))
+        entry['hypervolume'] += hv
+        entry['sims'] += trial['sims']
+        entry['extrapolated'] += trial['extrapolated']
+        entry['flagged'] += trial.get('flagged', 0)
+        entry['invalid'] += trial.get('invalid', 0)
+        entry['hv_per_sim'] += hv / max(trial['sims'], 1)
+        entry['trials'] += 1
+
+    for entry in ranking.values():
+        for key in ('hypervolume', 'sims', 'extrapolated', 'flagged', 'invalid', 'hv_per_sim'):
+            entry[key] /= entry['trials']
+
+    return sorted(ranking.values(), key=lambda entry: entry['hv_per_sim'], reverse=True)
+
+
+def tune(smoc_cfg, client, grid, seeds=(0,), processes=None):
+    """Run the configurations of the grid in parallel worker processes.
+
+    Arguments:
+        smoc_cfg (dict): SMOC configuration.
+        client (ReplayClient): replay client with the recorded simulations.
+            Each trial has its own client with the same records and options.
+        grid (dict): values of each tuned optimizer parameter.
+        seeds (list, optional): seeds of the trials of each configuration
+            (default: (0,)).
+        processes (int or None, optional): number of worker processes. If
+            None, the number of CPUs is used (default: None).
+
+    Returns:
+        list: ranking of the configurations (see "rank_trials").
+    """
+    replay_cfg = dict(neighbours=client.neighbours, max_distance=client.max_distance,
+                      extrapolation=client.extrapolation, budget=client.budget)
+    jobs = [(smoc_cfg, params, seed) for params in configurations(grid) for seed in seeds]
+
+    logger.info("Running %d trials (%d configurations)...", len(jobs), len(jobs) // len(seeds))
+    with multiprocessing.Pool(processes, init_worker,
+                              (client.variables, client.results, replay_cfg)) as pool:
+        trials = pool.starmap(run_trial, jobs)
+
+    return rank_trials(trials)
+
+
+def run_tuning(config_file, tuning_file):
+    """Tune the optimizer parameters with the recorded simulations of past runs.
+
+    The tuning file has the recorded files in 'records' (logbooks,
+    checkpoints, journals or archives), the values of each tuned parameter in
+    'grid', and optionally the 'seeds', the worker 'processes' and the
+    'replay_cfg' of the "ReplayClient".
+
+    Arguments:
+        config_file (str): SMOC configuration file.
+        tuning_file (str): tuning configuration file.
+
+    Returns:
+        int: exit code.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    smoc_cfg = file.read_yaml(config_file)
+    tuning_cfg = file.read_yaml(tuning_file)
+    if not smoc_cfg or not tuning_cfg:
+        logger.error("Invalid config file...")
+        return 1
+
+    try:
+        circuit_vars = {key: val[0] for key, val in smoc_cfg['circuit_vars'].items()}
+        weights = tuple(val[0] for val in smoc_cfg['objectives'].values())
+        client = ReplayClient.from_files(tuning_cfg['records'], circuit_vars, weights,
+                                         **(tuning_cfg.get('replay_cfg') or {}))
+        ranking = tune(smoc_cfg, client, tuning_cfg['grid'], tuning_cfg.get('seeds', [0]),
+                       tuning_cfg.get('processes'))
+    except (OSError, ValueError, KeyError) as err:
+        logger.error("TUNING - %s: %s", type(err).__name__, err)
+        return 4
+
+    logger.info("Ranking by hypervolume per simulation:")
+    for idx, entry in enumerate(ranking):
+        params = ' | '.join(f"{key}: {val}" for key, val in entry['params'].items())
+        logger.info("#%d %s => HV/sim: %.4g | HV: %.4g | sims: %.0f | extrapolated: %.0f "
+                    "(%.1f in the front) | invalid: %.1f", idx + 1, params, entry['hv_per_sim'],
+                    entry['hypervolume'], entry['sims'], entry['extrapolated'], entry['flagged'],
+                    entry['invalid'])
+
+    return 0
@@ -0,0 +1,147 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Client that resumes its server session after a connection loss."""
+
+import logging
+import time
+
+from socad import Client
+
+logger = logging.getLogger('smoc.connection')
+
+
+class ReconnectingClient:
+    """A client that reconnects to the server and resumes its session.
+
+    After connecting, the client opens a session on the server, which buffers
+    the responses of its last requests. If the connection is lost, the client
+    reconnects with exponential backoff, reopens the session and sends the
+    last request again (with the same id), so a simulation that finished while
+    the client was disconnected is not repeated.
+
+    It has the same interface as the "socad.Client".
+
+    Keyword Arguments:
+        retries (int, optional): max reconnection attempts after a connection
+            loss (default: 5).
+        backoff (float, optional): wait before the first attempt, in seconds,
+            doubled after each failed attempt (default: 1).
+        max_backoff (float, optional): max wait between attempts, in seconds
+            (default: 60).
+    """
+
+    def __init__(self, retries=5, backoff=1.0, max_backoff=60.0):
+        """Create the client."""
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.client = None
+        self.address = None   # Server host and port
+        self.session = None   # Session id, given by the server
+        self.last_req = None  # Last request sent, resent after a reconnection
+
+    def run(self, host, port):
+        """Connect to the server and open a session.
+
+        Arguments:
+            host (str): server IP address.
+            port (int): server port.
+
+        Raises:
+            ConnectionError: if the connection or the session fails.
+
+        Returns:
+            list: remote socket name.
+        """
+        self.address = (host, port)
+        self.client = Client()
+        addr = self.client.run(host, port)
+
+        self.client.send_data(dict(type='session', data=self.session))
+        res = self.client.recv_data()
+        if res.get('type') != 'session':
+            raise ConnectionError(f"The server didn't open the session: {res}")
+        self.session = res['data']
+
+        return addr
+
+    def reconnect(self, err):
+        """Reconnect to the server and resume the session.
+
+        Arguments:
+            err (Exception): error of the lost connection.
+
+        Raises:
+            ConnectionError: if all the reconnection attempts fail.
+        """
+        logger.warning("Connection with the server lost: %s", err)
+        self.close()
+
+        for attempt in range(self.retries):
+            wait = min(self.backoff * 2 ** attempt, self.max_backoff)
+            logger.info("Reconnecting to the server in %.1f s (attempt %d/%d)", wait,
+                        attempt + 1, self.retries)
+            time.sleep(wait)
+
+            try:
+                self.run(*self.address)
+                if self.last_req is not None:
+                    self.client.send_data(self.last_req)
+            except OSError as error:
+                logger.warning("Reconnection failed: %s", error)
+                self.close()
+                continue
+
+            logger.info("Resumed the session %s", self.session)
+            return
+
+        raise ConnectionError(f"Couldn't reconnect to the server after {self.retries} "
+                              f"attempts: {err}")
+
+    def send_data(self, obj):
+        """Send an object to the server, reconnecting if the connection is lost.
+
+        Arguments:
+            obj (dict): object to send.
+        """
+        self.last_req = obj
+        try:
+            self.client.send_data(obj)
+        except OSError as err:
+            # The request is sent again after the reconnection
+            self.reconnect(err)
+
+    def recv_data(self):
+        """Receive an object from the server, reconnecting if the connection is lost.
+
+        Returns:
+            dict: received object.
+        """
+        while True:
+            try:
+                return self.client.recv_data()
+            except OSError as err:
+                self.reconnect(err)
+
+    def close(self):
+        """Close the connection with the server."""
+        if self.client is not None:
+            try:
+                self.client.close()
+            except OSError:
+                pass
+            self.client = None
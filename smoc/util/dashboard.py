@@ -0,0 +1,181 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Live dashboard of the optimization, served by a Bokeh server."""
+
+import asyncio
+import logging
+import threading
+
+from bokeh.application import Application
+from bokeh.application.handlers.function import FunctionHandler
+from bokeh.layouts import column
+from bokeh.models import (ColumnDataSource, DataRange1d, HoverTool, LinearAxis,
+                          PrintfTickFormatter)
+from bokeh.palettes import Viridis256
+from bokeh.plotting import figure
+from bokeh.server.server import Server
+from bokeh.transform import linear_cmap
+from tornado.ioloop import IOLoop
+
+logger = logging.getLogger('smoc.dashboard')
+
+
+class Dashboard:
+    """Live dashboard with the evaluated designs and the convergence curves.
+
+    The optimizer pushes the designs evaluated in each generation, that are
+    stored as columnar batches. Each browser session keeps a cursor over the
+    batches and streams only the new ones to its "ColumnDataSource", so the
+    points already plotted are never sent again. The designs are rendered with
+    WebGL and the tooltips are formatted by the browser, so there's no per
+    point formatting in Python.
+
+    Arguments:
+        circuit_vars (dict): circuit design variables w/ units.
+        objectives (dict): circuit optimization objectives w/ units.
+        constraints (dict): circuit optimization constraints w/ units.
+        max_gen (int): max generations, used to scale the generation colors.
+
+    Keyword Arguments:
+        port (int, optional): server port (default: 5006).
+        refresh (int, optional): browser update period, in ms (default: 1000).
+    """
+
+    def __init__(self, circuit_vars, objectives, constraints, max_gen, port=5006, refresh=1000):
+        """Create the dashboard."""
+        self.vars_names = list(circuit_vars.keys())
+        self.vars_units = [var[1] for var in circuit_vars.values()]
+        self.fit_names = list(objectives.keys())
+        self.fit_units = [fit[1] for fit in objectives.values()]
+        sim_res = {**objectives, **constraints}
+        self.res_names = list(sim_res.keys())
+        self.res_units = [res[1] for res in sim_res.values()]
+        self.port = port
+        self.refresh = refresh
+
+        # Columnar batches of evaluated designs and convergence records
+        self.batches = []
+        self.convergence = []
+        self.lock = threading.Lock()
+        self.max_gen = max_gen
+
+    def make_document(self, doc):
+        """Create the document of a browser session.
+
+        Arguments:
+            doc (Document): Bokeh document.
+        """
+        columns = ['x', 'y', 'gen', 'valid'] + self.res_names + self.vars_names
+        source = ColumnDataSource(data={col: [] for col in columns})
+        conv_source = ColumnDataSource(data=dict(gen=[], hv=[], front=[], feasible=[]))
+
+        # Evaluated designs, colored by generation
+        tooltips = [('gen', '@gen'), ('valid', '@valid')]
+        tooltips += [(f"{name} [{unit}]", f"@{{{name}}}{{%0.3g}}")
+                     for name, unit in zip(self.res_names, self.res_units)]
+        tooltips += [(f"{name} [{unit}]", f"@{{{name}}}{{%0.3g}}")
+                     for name, unit in zip(self.vars_names, self.vars_units)]
+        formatters = {name: 'printf' for name in self.res_names + self.vars_names}
+
+        designs = figure(plot_width=800, plot_height=600, output_backend='webgl',
+                         title="Evaluated designs", active_scroll='wheel_zoom')
+        designs.add_tools(HoverTool(tooltips=tooltips, formatters=formatters))
+        designs.circle('x', 'y', source=source, size=6, alpha=0.6,
+                       color=linear_cmap('gen', Viridis256, 0, self.max_gen))
+        designs.xaxis.axis_label = f"{self.fit_names[0]} [{self.fit_units[0]}]"
+        designs.yaxis.axis_label = f"{self.fit_names[1]} [{self.fit_units[1]}]"
+        designs.xaxis.formatter = PrintfTickFormatter(format='%.2e')
+
+        # Convergence curves
+        conv = figure(plot_width=800, plot_height=300, title="Convergence")
+        hv_line = conv.line('gen', 'hv', source=conv_source, legend="hypervolume",
+                            line_width=2)
+        conv.y_range.renderers = [hv_line]
+        # The counts of individuals have their own axis
+        conv.extra_y_ranges = {'count': DataRange1d()}
+        conv.add_layout(LinearAxis(y_range_name='count', axis_label="individuals"), 'right')
+        count_lines = [
+            conv.line('gen', 'front', source=conv_source, legend="non-dominated",
+                      color='orange', y_range_name='count'),
+            conv.line('gen', 'feasible', source=conv_source, legend="feasible",
+                      color='green', y_range_name='count')
+        ]
+        conv.extra_y_ranges['count'].renderers = count_lines
+        conv.xaxis.axis_label = "generation"
+        conv.yaxis[0].axis_label = "hypervolume"
+        conv.legend.location = "top_left"
+
+        # Cursor of the batches already streamed to this session
+        cursor = dict(batches=0, convergence=0)
+
+        def update():
+            """Stream the new designs and convergence records."""
+            with self.lock:
+                new_batches = self.batches[cursor['batches']:]
+                new_conv = self.convergence[cursor['convergence']:]
+                cursor['batches'] = len(self.batches)
+                cursor['convergence'] = len(self.convergence)
+
+            for batch in new_batches:
+                source.stream(batch)
+            for record in new_conv:
+                conv_source.stream({key: [val] for key, val in record.items()})
+
+        update()
+        doc.add_periodic_callback(update, self.refresh)
+        doc.add_root(column(designs, conv))
+        doc.title = "SMOC dashboard"
+
+    def update(self, gen, evaluated, valid, convergence):
+        """Push the designs evaluated in a generation.
+
+        Arguments:
+            gen (int): generation number.
+            evaluated (list): evaluated individuals.
+            valid (list): True for each individual that fulfills the constraints.
+            convergence (dict): convergence indicators of the generation
+                (hypervolume 'hv', # of non-dominated 'front' and feasible
+                'feasible' individuals).
+        """
+        fits = [ind.fitness.values for ind in evaluated]
+        batch = dict(x=[fit[0] for fit in fits], y=[fit[1] for fit in fits],
+                     gen=[gen] * len(evaluated), valid=valid)
+        for name in self.res_names:
+            batch[name] = [ind.result.get(name, float('nan')) for ind in evaluated]
+        for idx, name in enumerate(self.vars_names):
+            batch[name] = [ind[idx] for ind in evaluated]
+
+        with self.lock:
+            self.batches.append(batch)
+            self.convergence.append(dict(gen=gen, **convergence))
+
+    def start(self):
+        """Start the Bokeh server in a daemon thread."""
+        thread = threading.Thread(target=self._serve, daemon=True)
+        thread.start()
+        logger.info("Serving the dashboard at http://localhost:%d/", self.port)
+
+    def _serve(self):
+        """Run the Bokeh server (blocking)."""
+        # Tornado runs on asyncio, which requires an event loop in this thread
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        io_loop = IOLoop()
+
+        server = Server({'/': Application(FunctionHandler(self.make_document))},
+                        io_loop=io_loop, port=self.port, address='localhost',
+                        allow_websocket_origin=[f"localhost:{self.port}"])
+        server.start()
+        io_loop.start()
@@ -15,16 +15,159 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 """Helpers to plot graphics."""
 
+import numpy as np
+from bokeh.layouts import column, gridplot
 from bokeh.models import PrintfTickFormatter
 from bokeh.palettes import viridis
 from bokeh.plotting import ColumnDataSource, figure, output_file, show
 
-from .text_format import eng_string
+from .text_format import eng_strings
+
+# The aggregation of the points uses datashader, which is optional. If it isn't
+# installed, the points are aggregated in a 2-D histogram.
+try:
+    import datashader as ds
+    import datashader.transfer_functions as tf
+    import pandas as pd
+except ImportError:
+    ds = None
+
+# Number of points above which the points are aggregated instead of drawn
+AGGREGATION_THRESHOLD = 50000
+
+
+def front_columns(front, vars_names, fit_names, res_names):
+    """Get the fitnesses, simulation results, variables and violations of a front as arrays.
+
+    Arguments:
+        front (list): individuals of the front.
+        vars_names (list): circuit variables names.
+        fit_names (list): objectives names.
+        res_names (list): simulation results names.
+
+    Returns:
+        tuple: fitnesses, simulation results and variables arrays, with one row
+            per individual, and the constraint violation of each individual.
+    """
+    fits = np.array([ind.fitness.values for ind in front], dtype=float)
+    results = np.array([[ind.result.get(name, np.nan) for name in res_names] for ind in front],
+                       dtype=float)
+    variables = np.array([list(ind) for ind in front], dtype=float)
+    violations = np.array([ind.violation for ind in front], dtype=float)
+
+    return (fits.reshape(len(front), len(fit_names)),
+            results.reshape(len(front), len(res_names)),
+            variables.reshape(len(front), len(vars_names)),
+            violations)
+
+
+def make_source(fits, results, variables, violations, names, units):
+    """Create the data source of a front, with the values formatted for the tooltips.
+
+    Arguments:
+        fits (numpy.ndarray): fitnesses of the front.
+        results (numpy.ndarray): simulation results of the front.
+        variables (numpy.ndarray): circuit variables of the front.
+        violations (numpy.ndarray): constraint violation of each individual.
+        names (dict): names of the 'fit', 'res' and 'vars' columns.
+        units (dict): units of the 'res' and 'vars' columns.
+
+    Returns:
+        ColumnDataSource: data source.
+    """
+    source = {f"fit{idx}": fits[:, idx] for idx in range(fits.shape[1])}
+
+    # Add the fitnesses, simulation results and variables to the tooltips
+    for idx, name in enumerate(names['fit']):
+        source[name] = eng_strings(fits[:, idx]).tolist()
+    for idx, (name, unit) in enumerate(zip(names['res'], units['res'])):
+        source[name] = (eng_strings(results[:, idx]) + unit).tolist()
+    for idx, (name, unit) in enumerate(zip(names['vars'], units['vars'])):
+        source[name] = (eng_strings(variables[:, idx]) + unit).tolist()
+
+    # An individual is valid if all the constraints are fulfilled. The fitness
+    # isn't penalized with the "constrained" selection, so the violation is used
+    source['valid'] = np.where(violations > 0, 'red', 'black').tolist()
+
+    return ColumnDataSource(data=source)
+
+
+def aggregate(p, x, y):
+    """Draw the density of a large number of points.
+
+    Arguments:
+        p (figure): figure where to draw.
+        x (numpy.ndarray): x coordinates.
+        y (numpy.ndarray): y coordinates.
+    """
+    x_range = (x.min(), x.max())
+    y_range = (y.min(), y.max())
+    width = (x_range[1] - x_range[0]) or 1
+    height = (y_range[1] - y_range[0]) or 1
+
+    if ds is None:
+        counts, _, _ = np.histogram2d(x, y, bins=(p.plot_width // 4, p.plot_height // 4),
+                                      range=(x_range, (y_range[0], y_range[0] + height)))
+        # Log scale, so the sparse regions are visible
+        p.image(image=[np.log1p(counts.T)], x=x_range[0], y=y_range[0], dw=width, dh=height,
+                palette='Viridis256')
+        return
+
+    canvas = ds.Canvas(plot_width=p.plot_width, plot_height=p.plot_height,
+                       x_range=x_range, y_range=y_range)
+    agg = canvas.points(pd.DataFrame(dict(x=x, y=y)), 'x', 'y')
+    img = tf.shade(agg, cmap=viridis(256), how='eq_hist')
+
+    p.image_rgba(image=[img.data], x=x_range[0], y=y_range[0], dw=width, dh=height)
+
+
+def parallel_coordinates(fronts, columns, names, colors, aggregated):
+    """Create a parallel coordinates view of the objectives.
+
+    Each objective is normalized to [0, 1] over all the fronts. If the points
+    are aggregated, only the first front is drawn.
+
+    Arguments:
+        fronts (list): pareto fronts.
+        columns (list): fitnesses, results and variables arrays of each front.
+        names (dict): names of the 'fit', 'res' and 'vars' columns.
+        colors (list): color of each front.
+        aggregated (bool): True if the points are aggregated.
+
+    Returns:
+        figure: parallel coordinates figure.
+    """
+    all_fits = np.concatenate([cols[0] for cols in columns])
+    low = all_fits.min(axis=0)
+    span = all_fits.max(axis=0) - low
+    span[span == 0] = 1
+
+    p = figure(plot_width=800, plot_height=400, x_range=names['fit'],
+               title="Parallel coordinates (normalized objectives)")
+
+    num_fronts = 1 if aggregated else len(fronts)
+    for idx, cols in enumerate(columns[:num_fronts]):
+        norm = (cols[0] - low) / span
+        xs = [names['fit']] * len(norm)
+        p.multi_line(xs, norm.tolist(), color=colors[idx], alpha=0.3,
+                     legend=f"Pareto {idx+1} (ind={len(fronts[idx])})")
+
+    p.legend.click_policy = "hide"
+    p.legend.label_text_font_size = '8pt'
+
+    return p
 
 
 def plot_pareto_fronts(fronts, circuit_vars, objectives, constraints, plot_fname):
     """Plot the pareto fronts given by the optimizer.
 
+    The fronts are converted to columnar arrays, and the tooltips values are
+    formatted with the vectorized "eng_strings". With two objectives the
+    fronts are plotted in a scatter plot, and with three or more objectives
+    in a scatter matrix and a parallel coordinates plot. The points are drawn
+    with WebGL, and above "AGGREGATION_THRESHOLD" points they are aggregated
+    in a density image (without tooltips).
+
     Arguments:
         fronts (list): pareto fronts.
         circuit_vars (dict): circuit design variables w/ units.
@@ -32,18 +175,20 @@ def plot_pareto_fronts(fronts, circuit_vars, objectives, constraints, plot_fname
         constraints (dict): circuit optimization constraints.
         plot_fname (str): path of the plot file.
     """
-    vars_names = list(circuit_vars.keys())
-    vars_units = [var[1] for var in circuit_vars.values()]
-
-    fit_names_raw = list(objectives.keys())
-    fit_names = [f"{name}_fit" for name in fit_names_raw]
-    fit_units = [fit[1] for fit in objectives.values()]
-
     # All simulation results (constraints and objectives)
     sim_res = {**objectives, **constraints}
 
-    sim_res_names = list(sim_res.keys())
-    sim_res_units = [res[1] for res in sim_res.values()]
+    fit_names_raw = list(objectives.keys())
+    names = dict(
+        vars=list(circuit_vars.keys()),
+        fit=[f"{name}_fit" for name in fit_names_raw],
+        res=list(sim_res.keys()))
+    units = dict(
+        vars=[var[1] for var in circuit_vars.values()],
+        fit=[fit[1] for fit in objectives.values()],
+        res=[res[1] for res in sim_res.values()])
+
+    num_obj = len(fit_names_raw)
 
     # Define the colors to use in the graphic, according to the number of pareto fronts
     # each front = one color
@@ -53,6 +198,10 @@ def plot_pareto_fronts(fronts, circuit_vars, objectives, constraints, plot_fname
     except KeyError as err:
         raise KeyError(f"The colors vector doesn't support {err} colors.")
 
+    columns = [front_columns(front, names['vars'], names['fit'], names['res'])
+               for front in fronts]
+    aggregated = sum(len(front) for front in fronts) > AGGREGATION_THRESHOLD
+
     # Configure the tooltips
     tooltips = """
         <style>
@@ -62,102 +211,80 @@ def plot_pareto_fronts(fronts, circuit_vars, objectives, constraints, plot_fname
     """
 
     # Add the fitnesses to the tooltips
-    #tooltips += '<div style="font-weight: bold; font-size: 1.1rem;">Fitness</div>'
-    #for fit_raw, fit in zip(fit_names_raw, fit_names):
-    #    tooltips += f"<i>{fit_raw}:</i> @{fit}<br>\n"
-    tooltips += f"x: @{fit_names[0]}, y: @{fit_names[1]}"
+    tooltips += '<div style="font-weight: bold; font-size: 1rem;">Fitness</div>'
+    for fit_raw, fit in zip(fit_names_raw, names['fit']):
+        tooltips += f"<i>{fit_raw}:</i> @{fit}<br>\n"
 
     # Add the simulation results to the tooltips
     tooltips += '<div style="font-weight: bold; font-size: 1rem;">Results</div>'
-    for res in sim_res_names:
+    for res in names['res']:
         tooltips += f"<i>{res}:</i> @{res}<br>\n"
 
     # Add the variables to the tooltips
     tooltips += '<div style="font-weight: bold; font-size: 1rem;">Variables</div>'
-    for var in vars_names:
+    for var in names['vars']:
         tooltips += f"<i>{var}:</i> @{var}<br>\n"
 
-    # Create the figure
     date_time = plot_fname.split('/')[-1].split('.')[0]
     title = f"Plotting {len(fronts)} pareto fronts - {date_time.replace('-', ':')}"
-    p = figure(plot_width=800, plot_height=800, tooltips=tooltips, title=title,
-               active_scroll='wheel_zoom')
-
-    for idx, front in enumerate(fronts):
-        # Get the fitness values from the pareto front
-        fits = list(map(lambda ind: ind.fitness.values, front))
-
-        # Get the simulation results from the pareto front
-        sim_res = list(map(lambda ind: ind.result, front))
-
-        # The '*' separates the various fitnesses, otherwise it will try to zip
-        # all the fitnesses at the same time and put them in x,y, which will give
-        # an error if we have more than two fitness (and even with 2 the result
-        # won't be the expected)
-        (x, y) = zip(*fits)  # Unpack the fitnesses
-
-        # Scale the power to uW
-        #x = [val*1e6 for val in x]
-        # or x = list(map(lambda x: x*1e6, x))
-        # List comprehension is more pythonic and it's usually faster
-        # if we need to use lambdas in map
-
-        # Values to plot on the graphic
-        source = dict(x=x, y=y)
-
-        # Add the fitnesses to the tooltips
-        for j, fit in enumerate(fit_names_raw):
-            source.update({f"{fit}_fit": [f"{eng_string(f[j])}" for f in fits]})
-
-        # Add the simulation results to the tooltips
-        for j, res in enumerate(sim_res_names):
-            source.update({res: [f"{eng_string(r[res])}{sim_res_units[j]}" for r in sim_res]})
-
-        # Add the circuit variables to the tooltips
-        # ind[j] é a variável 'j' do individuo
-        for j, var in enumerate(vars_names):
-            source.update({var: [f"{eng_string(ind[j])}{vars_units[j]}" for ind in front]})
-
-        valid = ['black'] * len(front)
-
-        # Check if an individual is valid (if all the constraints are fulfilled)
-        for ind in range(len(front)):
-            for pos, val in enumerate(fit_names_raw):
-                fit = fits[ind]
-                res = sim_res[ind]
-                if fit[pos] != res[val]:
-                    valid[ind] = 'red'
-
-        source.update({'valid': [val for val in valid]})
-
-        # Plot the graphic
-        p.circle(
-            'x',
-            'y',
-            source=ColumnDataSource(data=source),
-            size=10,
-            color=colors[idx],
-            muted_color=colors[idx],
-            muted_alpha=0.1,
-            legend=f"Pareto {idx+1} (ind={len(front)})")
-
-    # Format the title
-    p.title.text_font_size = '16pt'
-    p.title.align = 'center'
-    # Format the axis labels
-    p.xaxis.axis_label = f"{fit_names[0]} [{fit_units[0]}]"
-    p.xaxis.formatter = PrintfTickFormatter(format='%.2e')
-    p.yaxis.axis_label = f"{fit_names[1]} [{fit_units[1]}]"
-    p.axis.axis_label_text_font_style = 'bold'
-    p.axis.axis_label_text_font_size = '11pt'
-    # Format the legend
-    p.legend.location = "bottom_right"
-    p.legend.click_policy = "mute"
-    p.legend.label_text_font_size = '8pt'
+
+    # The data sources are shared by all the views, so the selections are linked
+    if not aggregated:
+        sources = [make_source(*cols, names, units) for cols in columns]
+
+    def scatter(i, j, size, first_row):
+        """Create a scatter view of the objectives "i" (x) and "j" (y)."""
+        p = figure(plot_width=size, plot_height=size, output_backend='webgl',
+                   title=title if first_row else '', active_scroll='wheel_zoom',
+                   tools='pan,wheel_zoom,box_select,reset,save',
+                   tooltips=None if aggregated else tooltips)
+
+        if aggregated:
+            x = np.concatenate([cols[0][:, i] for cols in columns])
+            y = np.concatenate([cols[0][:, j] for cols in columns])
+            aggregate(p, x, y)
+        else:
+            for idx, (front, source) in enumerate(zip(fronts, sources)):
+                p.circle(
+                    f"fit{i}",
+                    f"fit{j}",
+                    source=source,
+                    size=10 if num_obj == 2 else 6,
+                    color=colors[idx],
+                    muted_color=colors[idx],
+                    muted_alpha=0.1,
+                    legend=f"Pareto {idx+1} (ind={len(front)})")
+            # Format the legend
+            p.legend.location = "bottom_right"
+            p.legend.click_policy = "mute"
+            p.legend.label_text_font_size = '8pt'
+            p.legend.visible = first_row
+
+        # Format the axis labels
+        p.xaxis.axis_label = f"{names['fit'][i]} [{units['fit'][i]}]"
+        p.xaxis.formatter = PrintfTickFormatter(format='%.2e')
+        p.yaxis.axis_label = f"{names['fit'][j]} [{units['fit'][j]}]"
+        p.axis.axis_label_text_font_style = 'bold'
+        p.axis.axis_label_text_font_size = '11pt'
+        # Format the title
+        p.title.text_font_size = '16pt'
+        p.title.align = 'center'
+
+        return p
+
+    if num_obj == 2:
+        layout = scatter(0, 1, 800, True)
+    else:
+        # Scatter matrix (lower triangle) of the objectives pairs
+        size = max(250, 800 // (num_obj - 1))
+        grid = [[scatter(i, j, size, j == 1 and i == 0) if i < j else None
+                 for i in range(num_obj - 1)] for j in range(1, num_obj)]
+        layout = column(gridplot(grid), parallel_coordinates(fronts, columns, names, colors,
+                                                            aggregated))
 
     output_file(plot_fname)
 
-    show(p)
+    show(layout)
 
 
 # # PODE SER UTIL
@@ -0,0 +1,260 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Timing instrumentation of the optimization loop."""
+
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+logger = logging.getLogger('smoc.profiling')
+
+# Upper limits of the histogram buckets, in seconds
+BUCKETS = (0.001, 0.01, 0.1, 1, 10, 60, 300, 1800, 3600, float('inf'))
+
+# Prefix of the spans measured by the server
+SERVER_PREFIX = 'server.'
+
+
+class Histogram:
+    """Histogram of the durations of a span.
+
+    Arguments:
+        buckets (tuple, optional): upper limits of the buckets (default: BUCKETS).
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        """Create an empty histogram."""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        """Add a duration to the histogram.
+
+        Arguments:
+            duration (float): duration in seconds.
+        """
+        self.counts[bisect.bisect_left(self.buckets, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def merge(self, other):
+        """Add the durations of another histogram to this one.
+
+        Arguments:
+            other (Histogram): histogram with the same buckets.
+        """
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def to_dict(self):
+        """Get the histogram as a JSON-serializable dictionary.
+
+        Returns:
+            dict: histogram.
+        """
+        return dict(count=self.count, total=self.total, max=self.max,
+                    buckets=dict(zip([str(b) for b in self.buckets], self.counts)))
+
+
+class Profiler:
+    """Collect named timing spans and aggregate them per generation.
+
+    The spans of the current generation are aggregated in histograms, that are
+    written to the metrics file (one JSON object per line) when the generation
+    ends. The histograms of the whole run can be exposed in the Prometheus text
+    format through an HTTP endpoint on localhost.
+
+    Arguments:
+        fname (str or None, optional): metrics file path. If None, the metrics
+            are not written (default: None).
+    """
+
+    def __init__(self, fname=None):
+        """Create the profiler."""
+        self.fname = fname
+        self.generation = 0
+        self.current = {}   # Histograms of the current generation
+        self.run = {}       # Histograms of the whole run
+        self.lock = threading.Lock()
+        self.http_server = None
+        self.scheduler = None   # Last scheduler report of the server
+
+    @contextmanager
+    def span(self, name):
+        """Measure the duration of a code block.
+
+        Arguments:
+            name (str): span name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, duration):
+        """Add a measured duration to a span.
+
+        Arguments:
+            name (str): span name.
+            duration (float): duration in seconds.
+        """
+        with self.lock:
+            if name not in self.current:
+                self.current[name] = Histogram()
+            self.current[name].add(duration)
+
+    def add_server_spans(self, meta):
+        """Add the spans measured by the server, returned in the response metadata.
+
+        Arguments:
+            meta (dict or None): response metadata.
+        """
+        if not meta:
+            return
+
+        for name, duration in meta.get('spans', {}).items():
+            self.add(SERVER_PREFIX + name, duration)
+
+    def set_scheduler(self, report):
+        """Store the scheduler report of the server, returned in the response metadata.
+
+        Arguments:
+            report (dict or None): queue and job slots utilization.
+        """
+        if report:
+            self.scheduler = report
+
+    def end_generation(self, gen):
+        """Close the spans of a generation, log a summary and write the metrics.
+
+        Arguments:
+            gen (int): generation number.
+
+        Returns:
+            dict: total time of each span in the generation.
+        """
+        with self.lock:
+            current, self.current = self.current, {}
+            self.generation = gen
+            for name, hist in current.items():
+                if name not in self.run:
+                    self.run[name] = Histogram()
+                self.run[name].merge(hist)
+
+        totals = {name: hist.total for name, hist in current.items()}
+
+        # The simulator time is measured by the server, so the remaining time
+        # waiting for the server is overhead (network, serialization, ...).
+        # If the SKILL code doesn't report the simulation time, use the time
+        # of the whole SKILL evaluation.
+        sim_time = totals.get(SERVER_PREFIX + 'skill.simulate',
+                              totals.get(SERVER_PREFIX + 'skill', 0.0))
+        wait_time = totals.get('simulate.wait', 0.0)
+        logger.info("Generation %d timings | simulator: %.2fs | server wait overhead: %.2fs | "
+                    "optimizer: %s", gen, sim_time, max(0.0, wait_time - sim_time),
+                    ', '.join(f"{name}={total:.2f}s" for name, total in sorted(totals.items())
+                              if not name.startswith(SERVER_PREFIX)))
+
+        if self.scheduler:
+            utilization = self.scheduler.get('utilization')
+            logger.info("Generation %d scheduler | jobs: %s | batches: %s | slot utilization: %s | "
+                        "simulations: %s/%s", gen, self.scheduler.get('jobs'),
+                        self.scheduler.get('batches'),
+                        'n/a' if utilization is None else f"{utilization:.0%}",
+                        self.scheduler.get('used'), self.scheduler.get('budget') or 'unlimited')
+
+        if self.fname:
+            record = dict(gen=gen, time=time.time(), scheduler=self.scheduler,
+                          spans={name: hist.to_dict() for name, hist in current.items()})
+            with open(self.fname, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+        return totals
+
+    def prometheus_text(self):
+        """Get the histograms of the whole run in the Prometheus text format.
+
+        Returns:
+            str: metrics.
+        """
+        lines = ["# TYPE smoc_generation gauge", f"smoc_generation {self.generation}"]
+
+        if self.scheduler:
+            for key in ('jobs', 'utilization', 'used', 'budget'):
+                if self.scheduler.get(key) is not None:
+                    lines += [f"# TYPE smoc_scheduler_{key} gauge",
+                              f"smoc_scheduler_{key} {self.scheduler[key]}"]
+
+        lines.append("# TYPE smoc_span_seconds histogram")
+        with self.lock:
+            for name, hist in sorted(self.run.items()):
+                cumulative = 0
+                for bucket, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    le = '+Inf' if bucket == float('inf') else str(bucket)
+                    lines.append(f'smoc_span_seconds_bucket{{span="{name}",le="{le}"}} '
+                                 f'{cumulative}')
+                lines.append(f'smoc_span_seconds_sum{{span="{name}"}} {hist.total}')
+                lines.append(f'smoc_span_seconds_count{{span="{name}"}} {hist.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def start_http_server(self, port, host='localhost'):
+        """Expose the metrics in an HTTP endpoint, served by a daemon thread.
+
+        Arguments:
+            port (int): server port.
+            host (str, optional): server address (default: 'localhost').
+        """
+        profiler = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            """Answer every GET request with the metrics."""
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Send the metrics."""
+                body = profiler.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                """Don't log the requests."""
+
+        self.http_server = HTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+        thread.start()
+        logger.info("Serving metrics at http://%s:%d/metrics", host, port)
+
+    def close(self):
+        """Stop the HTTP endpoint, if running."""
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.http_server = None
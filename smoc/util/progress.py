@@ -0,0 +1,175 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Progress of the simulations reported by the server."""
+
+import logging
+import queue
+import threading
+
+from .text_format import time_string
+
+logger = logging.getLogger('smoc.progress')
+
+
+class ProgressMonitor:
+    """Log the progress messages of the server and detect stalled simulations.
+
+    While a request is simulated, the server sends "progress" messages before
+    the response: after each batch, when the run file reports a step, and as
+    a heartbeat while Cadence is busy. Each message has the simulations done,
+    failed and total of the request, its elapsed time, and the time since the
+    last progress of Cadence ("idle").
+
+    The "stall_timeout" is checked against the "idle" time of the heartbeats,
+    and it's also the max time to wait for any message of the server, so a
+    hung server (or one without heartbeats) is detected as well. The run
+    files only report the progress before and after the "ocnxlRun", not the
+    completion of each test, so without heartbeats the timeout must be longer
+    than the simulation of a batch.
+
+    Keyword Arguments:
+        stall_timeout (float or None, optional): max time without progress of
+            Cadence, or without messages of the server, in seconds. If
+            exceeded, the request is considered hung (default: None, i.e. no
+            limit).
+        log_heartbeats (bool, optional): log the heartbeats, that are only
+            logged in debug otherwise (default: False).
+    """
+
+    def __init__(self, stall_timeout=None, log_heartbeats=False):
+        """Create the progress monitor."""
+        self.stall_timeout = stall_timeout
+        self.log_heartbeats = log_heartbeats
+        self.last = None  # Last progress data
+
+    def update(self, data):
+        """Process a progress message of the server.
+
+        Arguments:
+            data (dict): progress data.
+
+        Raises:
+            TimeoutError: if Cadence didn't progress for "stall_timeout".
+        """
+        self.last = data
+        event = data.get('event')
+        done, total = data.get('done', 0), data.get('total', 0)
+
+        if event == 'skill':
+            logger.info("Server: %s", data.get('message'))
+        elif event == 'batch':
+            logger.info("Simulated %d/%d | failed: %d | batch time: %s | ETA: %s", done, total,
+                        data.get('failed', 0), time_string(data.get('batch_time', 0)),
+                        self.eta_string(data))
+        else:
+            logger.log(logging.INFO if self.log_heartbeats else logging.DEBUG,
+                       "Simulating %d/%d | elapsed: %s | idle: %s", done, total,
+                       time_string(data.get('elapsed', 0)), time_string(data.get('idle', 0)))
+
+        if self.stall_timeout is not None and data.get('idle', 0) > self.stall_timeout:
+            raise TimeoutError(f"The simulator didn't progress for "
+                               f"{time_string(data['idle'])} (done: {done}/{total})")
+
+    @staticmethod
+    def eta(data):
+        """Estimate the remaining time of a request, from its simulation rate.
+
+        Arguments:
+            data (dict): progress data.
+
+        Returns:
+            float or None: remaining time, in seconds, or None if no simulation
+                is done.
+        """
+        done = data.get('done', 0)
+        if not done:
+            return None
+
+        return data.get('elapsed', 0) / done * (data.get('total', 0) - done)
+
+    def eta_string(self, data):
+        """Format the estimated remaining time of a request.
+
+        Arguments:
+            data (dict): progress data.
+
+        Returns:
+            str: formatted remaining time, or '-' if unknown.
+        """
+        eta = self.eta(data)
+        return time_string(eta) if eta is not None else '-'
+
+    def recv(self, client):
+        """Receive the response of a request, processing its progress messages.
+
+        Arguments:
+            client (Client or ReconnectingClient): client connected to the
+                server.
+
+        Raises:
+            TimeoutError: if Cadence didn't progress, or the server didn't send
+                any message, for "stall_timeout".
+
+        Returns:
+            dict: response object.
+        """
+        res = self.recv_message(client)
+        while res.get('type') == 'progress':
+            self.update(res.get('data') or {})
+            res = self.recv_message(client)
+
+        return res
+
+    def recv_message(self, client):
+        """Receive a message of the server, waiting at most "stall_timeout".
+
+        The message is received in a separate thread, as the client has no
+        timeout. If the server doesn't answer, the client is closed, which
+        also ends the receiving thread.
+
+        Arguments:
+            client (Client or ReconnectingClient): client connected to the
+                server.
+
+        Raises:
+            TimeoutError: if no message is received for "stall_timeout".
+
+        Returns:
+            dict: received object.
+        """
+        if self.stall_timeout is None:
+            return client.recv_data()
+
+        received = queue.Queue()
+
+        def receive():
+            """Receive the message, or the error of the client."""
+            try:
+                received.put((client.recv_data(), None))
+            except Exception as err:  # pylint: disable=broad-except
+                received.put((None, err))
+
+        threading.Thread(target=receive, name='smoc-recv', daemon=True).start()
+        try:
+            res, err = received.get(timeout=self.stall_timeout)
+        except queue.Empty:
+            client.close()
+            raise TimeoutError(f"The server didn't send any message for "
+                               f"{time_string(self.stall_timeout)}") from None
+
+        if err is not None:
+            raise err
+        return res
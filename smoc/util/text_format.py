@@ -17,6 +17,11 @@
 
 import math
 
+import numpy as np
+
+# SI prefixes of the exponents in [-24, 24], indexed by "exponent // 3 + 8"
+SI_PREFIXES = 'yzafpnum kMGTPEZY'
+
 
 def eng_string(x, sig_figs=3, si=True):
     """Returns the input value formatted in a simplified engineering
@@ -54,10 +59,104 @@ def eng_string(x, sig_figs=3, si=True):
             x_3 = int(x_3)
 
     if si and exp3 >= -24 and exp3 <= 24 and exp3 != 0:
-        exp3_text = 'yzafpnum kMGTPEZY'[exp3 // 3 + 8]
+        exp3_text = SI_PREFIXES[exp3 // 3 + 8]
     elif exp3 == 0:
         exp3_text = ''
     else:
         exp3_text = 'e%s' % exp3
 
     return ('%s%s%s') % (sign, x_3, exp3_text)
+
+
+def eng_strings(values, sig_figs=3, si=True):
+    """Vectorized version of "eng_string", to format columns of values.
+
+    The exponents, mantissas and rounding are computed with NumPy over the
+    whole column. The mantissas are rounded in groups of equal decimal places
+    (there are at most three, since the mantissas are in [1, 1000[), and only
+    the values that are near a rounding tie are rounded by Python, so the
+    output is the same as calling "eng_string" for each value. The values
+    that "eng_string" doesn't support (nan and inf) are formatted by NumPy.
+
+    Arguments:
+        values (array_like): values to format.
+
+    Keyword Arguments:
+        sig_figs (int, optional): number of significant digits (default: 3).
+        si (boolean, optional): use SI suffix for exponent, e.g. k instead of
+            e3, n instead of e-9 etc. (default: True).
+
+    Returns:
+        numpy.ndarray: the formatted values.
+    """
+    x = np.asarray(values, dtype=float).ravel()
+    out = np.empty(x.shape, dtype=object)
+
+    finite = np.isfinite(x)
+    out[~finite] = x[~finite].astype(str)
+
+    x = x[finite]
+    sign = np.where(x < 0, '-', '')
+    x = np.abs(x)
+
+    # Exponent (multiple of 3) and mantissa of the non-null values
+    nonzero = x != 0
+    exp3 = np.zeros(x.shape, dtype=np.int64)
+    mant = np.zeros(x.shape)
+    with np.errstate(divide='ignore'):
+        exp = np.floor(np.log10(x[nonzero])).astype(np.int64)
+    exp3[nonzero] = exp - (exp % 3)
+    mant[nonzero] = x[nonzero] / 10.0**exp3[nonzero]
+
+    # Round the mantissas to the significant digits. Each number of decimal
+    # places is rounded at once.
+    decimals = np.zeros(x.shape, dtype=np.int64)
+    decimals[nonzero] = sig_figs - 1 - np.floor(np.log10(mant[nonzero])).astype(np.int64)
+    rounded = mant.copy()
+    for dec in np.unique(decimals[nonzero]):
+        mask = nonzero & (decimals == dec)
+        rounded[mask] = np.round(mant[mask], dec)
+
+        # NumPy rounds the scaled value, which can differ from the (exact)
+        # Python rounding when the value is near a tie
+        scaled = mant[mask] * 10.0**dec
+        ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        if ties.any():
+            idx = np.flatnonzero(mask)[ties]
+            rounded[idx] = [round(float(val), int(dec)) for val in mant[idx]]
+
+    # Integer mantissas are displayed without ".0"
+    integer = rounded == np.floor(rounded)
+    mant_text = np.empty(x.shape, dtype=object)
+    mant_text[integer] = rounded[integer].astype(np.int64).astype(str)
+    mant_text[~integer] = rounded[~integer].astype(str)
+
+    # Exponent text, computed once per distinct exponent
+    exp_text = np.empty(x.shape, dtype=object)
+    for exp in np.unique(exp3):
+        if si and -24 <= exp <= 24 and exp != 0:
+            text = SI_PREFIXES[exp // 3 + 8]
+        elif exp == 0:
+            text = ''
+        else:
+            text = 'e%s' % exp
+        exp_text[exp3 == exp] = text
+
+    out[finite] = sign.astype(object) + mant_text + exp_text
+
+    return out.reshape(np.shape(values))
+
+
+def time_string(secs):
+    """Returns a duration formatted in hours, minutes and seconds.
+
+    Arguments:
+        secs (float): duration, in seconds.
+
+    Returns:
+        str: the formatted duration, e.g. "01h02m03s".
+    """
+    mins, secs = divmod(secs, 60)
+    hours, mins = divmod(mins, 60)
+
+    return f"{hours:02.0f}h{mins:02.0f}m{secs:02.0f}s"
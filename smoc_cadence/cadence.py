@@ -15,18 +15,24 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 """This module handles the communication between Cadence and the server."""
 
+import json
 import os
 import sys
+import time
 
 import util
+from progress import Progress, recv_skill
+from scheduler import Scheduler
+from session import Sessions
 
-# Try to import 'Server' from the global package 'socad'
+# Try to import 'Server' from interface.server, which can serve several clients
+# in a row (daemon mode)
 try:
-    from socad import Server
+    from interface.server import Server
 except ImportError as err:
-    # If can't import from the global package
-    try:  # Try to import from interface.server
-        from interface.server import Server
+    # If can't import from interface.server
+    try:  # Try to import from the global package 'socad'
+        from socad import Server
     except ImportError as err:
         # If can't import the package, quit the program
         print("[ERROR] {0}. Exiting...".format(err))
@@ -37,15 +43,51 @@ SIM_FILE = os.environ.get('SMOC_LOAD_FILE')
 SET_SIM_FILE = os.environ.get('SMOC_SET_SIM_FILE')
 TEMPLATE_FILE = os.environ.get('SMOC_TEMPLATE_FILE')
 RUN_FILE = os.environ.get('SMOC_RUN_FILE')
+MC_RUN_FILE = os.environ.get('SMOC_MC_RUN_FILE')
+EXTRACT_FILE = os.environ.get('SMOC_EXTRACT_FILE')
 VAR_FILE = os.environ.get('SMOC_VARS_FILE')
 ROOT_DIR = os.environ.get('SMOC_ROOT_DIR')
 OUT_FILE = os.environ.get('SMOC_RESULTS_FILE')
+# Run files of the cheap simulation stages, by stage name
+STAGE_FILES = json.loads(os.environ.get('SMOC_STAGE_FILES') or '{}')
 # Client config
 HOST = os.environ.get('SMOC_CLIENT_ADDR')
 PORT = int(os.environ.get('SMOC_CLIENT_PORT'))
+# Scheduler config
+SCHEDULER_CFG = json.loads(os.environ.get('SMOC_SCHEDULER_CFG') or '{}')
+# In daemon mode, the server waits for a new client after the current one leaves
+DAEMON = os.environ.get('SMOC_DAEMON') == '1'
+# In multi-client mode, the server time-shares the Cadence session between clients
+MULTI_CLIENT = os.environ.get('SMOC_MULTI_CLIENT') == '1'
+# Time to wait for a client with a session to reconnect after a connection loss
+RESUME_TIMEOUT = float(os.environ.get('SMOC_RESUME_TIMEOUT') or 300)
+# Time between the heartbeats sent to the clients while Cadence is busy (0: none)
+HEARTBEAT = float(os.environ.get('SMOC_HEARTBEAT') or 0)
 
 
-def process_skill_request(req):
+def get_num_simulations(req):
+    """Get the number of simulations of a request from the optimizer.
+
+    Arguments:
+        req (dict): request object.
+
+    Raises:
+        KeyError: if the input request format is invalid.
+
+    Returns:
+        int: number of simulations.
+    """
+    if req['type'] == 'updateAndRun':
+        if isinstance(req['data'], dict):  # Simulation stage
+            return len(req['data']['variables'])
+        return len(req['data'])
+    if req['type'] == 'monteCarlo':
+        return len(req['data']['variables']) * req['data']['samples']
+
+    return 0
+
+
+def process_skill_request(req, max_jobs=0):
     """Process a skill request from the optimizer.
 
     Based on the given request object, returns the skill expression to be
@@ -53,6 +95,8 @@ def process_skill_request(req):
 
     Arguments:
         req (dict): request object.
+        max_jobs (int, optional): number of parallel jobs of the simulations.
+            If 0, the current number of jobs is kept (default: 0).
 
     Raises:
         KeyError: if the input request format is invalid.
@@ -67,19 +111,41 @@ def process_skill_request(req):
     except KeyError as err:  # if the key does not exist
         raise KeyError(err)
 
-    if type_ == 'info' and data.lower() == 'exit':
-        res = 'exit'
+    if type_ == 'info' and data.lower() in ('exit', 'shutdown'):
+        res = data.lower()
 
     elif type_ == 'loadSimulator':
-        pop_size = data
-        util.generate_simulations_file(TEMPLATE_FILE, SET_SIM_FILE, pop_size)
-        res = 'loadSimulator("{0}" "{1}" "{2}")'.format(ROOT_DIR, SIM_FILE, pop_size)
+        # The tests are created by Cadence from the master test, when needed
+        util.generate_simulations_file(TEMPLATE_FILE, SET_SIM_FILE)
+        res = 'loadSimulator("{0}" "{1}")'.format(ROOT_DIR, SIM_FILE)
 
     elif type_ == 'updateAndRun':
+        # The simulations of a cheap stage use the run file of the stage, which
+        # only extracts the measurements of the stage constraints, and run
+        # without the analyses disabled by the stage
+        stage_args = ''
+        if isinstance(data, dict):
+            if data.get('stage') not in STAGE_FILES:
+                raise TypeError("The run file of the stage '{0}' is not defined in the server "
+                                "config.".format(data.get('stage')))
+            run_file = STAGE_FILES[data['stage']]
+            stage_args = ' {0} {1}'.format(util.skill_list(data.get('measurements') or []),
+                                           util.skill_list(data.get('disable') or []))
+            data = data['variables']
+        else:
+            run_file = RUN_FILE
         # Store circuit variables in file
         util.store_vars_in_file(data, VAR_FILE)
-        res = 'updateAndRun("{0}" "{1}" "SMOC_RESULTS_FILE={2}" {3})'.format(
-            RUN_FILE, VAR_FILE, OUT_FILE, len(data))
+        res = 'updateAndRun("{0}" "{1}" "SMOC_RESULTS_FILE={2}" {3} {4}{5})'.format(
+            run_file, VAR_FILE, OUT_FILE, len(data), max_jobs, stage_args)
+    elif type_ == 'monteCarlo':
+        if not MC_RUN_FILE:
+            raise TypeError("The Monte-Carlo run file is not defined in the server config.")
+        # Store circuit variables in file
+        util.store_vars_in_file(data['variables'], VAR_FILE)
+        res = 'runMonteCarlo("{0}" "{1}" "SMOC_RESULTS_FILE={2}" {3} {4} {5})'.format(
+            MC_RUN_FILE, VAR_FILE, OUT_FILE, len(data['variables']), data['samples'],
+            data['start'])
     else:
         raise TypeError("Invalid object received from the client.")
 
@@ -110,12 +176,495 @@ def process_skill_response(msg):
         # Get the results from file
         obj = util.get_results_from_file(OUT_FILE)
 
+    elif "runMonteCarlo_OK" in msg:
+        type_ = 'monteCarlo'
+        # Get the results of all samples from file
+        obj = util.get_results_from_file(OUT_FILE)
+
     else:
         raise TypeError("Invalid message received from Cadence.")
 
     return type_, obj
 
 
+def run_batches(server, scheduler, req, spans, progress=None):
+    """Run the simulations of an "updateAndRun" request in batches.
+
+    The scheduler sets the size and the number of parallel jobs of each batch,
+    and the results of all batches are sent together to the client. The
+    batches of a simulation stage keep the stage of the request.
+
+    Arguments:
+        server (Server): server that communicates with Cadence.
+        scheduler (Scheduler): simulations scheduler.
+        req (dict): request object.
+        spans (dict): measured spans, in seconds.
+        progress (Progress or None, optional): progress of the request,
+            reported after each batch (default: None).
+
+    Raises:
+        KeyError: if the input request format is invalid.
+        TypeError: if the Cadence response is invalid.
+
+    Returns:
+        tuple: response type (type_) and response object (obj).
+    """
+    type_ = req['type']
+    stage = isinstance(req['data'], dict)
+    queue = req['data']['variables'] if stage else req['data']
+    obj = []
+
+    while queue:
+        jobs, size = scheduler.next_batch(len(queue))
+        batch, queue = queue[:size], queue[size:]
+        if stage:
+            batch_data = dict(req['data'], variables=batch)
+        else:
+            batch_data = batch
+
+        with util.span(spans, 'request'):
+            expr = process_skill_request(dict(type=req['type'], data=batch_data), jobs)
+
+        start = time.time()
+        with util.span(spans, 'skill'):
+            server.send_skill(expr)
+            res = wait_skill(server, progress)
+        run_time = time.time() - start
+
+        with util.span(spans, 'response'):
+            type_, results = process_skill_response(res)
+
+        if progress is not None:
+            progress.add_batch(results, run_time)
+
+        timings = util.get_skill_timings(res)
+        for name, value in timings.items():
+            spans[name] = spans.get(name, 0.0) + value
+
+        scheduler.record(len(batch), jobs, timings.get('skill.run', run_time))
+        obj.extend(results)
+
+    return type_, obj
+
+
+def wait_skill(server, progress=None):
+    """Wait for the response of Cadence, sending heartbeats to the client.
+
+    Arguments:
+        server (Server): server that communicates with Cadence.
+        progress (Progress or None, optional): progress of the request. If
+            None, no progress is reported (default: None).
+
+    Returns:
+        str: Cadence response.
+    """
+    if progress is None:
+        return recv_skill(server)
+
+    with progress.running():
+        return recv_skill(server, progress)
+
+
+def progress_notifier(server, group):
+    """Create the function that sends the progress of a request to its clients.
+
+    Arguments:
+        server (Server): server that communicates with the clients.
+        group (list): (client socket, request) of each client whose request
+            is simulated. The socket is None for the current client.
+
+    Returns:
+        callable: sends the progress data to the clients.
+    """
+    # If the current client is gone, the request keeps running, so its
+    # response is buffered in the session ("nonlocal" doesn't exist in Python 2)
+    gone = []
+
+    def notify(data):
+        for conn, req in group:
+            msg = dict(type='progress', data=data)
+            if 'id' in req:
+                msg['id'] = req['id']
+            if conn is not None:
+                send_or_drop(server, msg, conn)
+            elif not gone:
+                try:
+                    server.send_data(msg)
+                except IOError as err:
+                    server.send_warn("[CONNECTION ERROR] {0}\n".format(err))
+                    gone.append(err)
+
+    return notify
+
+
+def update_extraction(loaded, measurements):
+    """Generate the extraction file with the measurements of the clients.
+
+    The extraction has the measurements of all the clients that share the
+    loaded simulator, so it is only generated again when a client consumes a
+    new measurement.
+
+    Arguments:
+        loaded (dict): loaded simulator, with the extracted measurements.
+        measurements (list): measurements consumed by the client.
+
+    Raises:
+        TypeError: if the extraction file is not defined.
+    """
+    if not EXTRACT_FILE:
+        raise TypeError("The extraction file is not defined in the server config.")
+
+    current = loaded.get('measurements', [])
+    new = [name for name in measurements if name not in current]
+    if new or not os.path.isfile(EXTRACT_FILE):
+        loaded['measurements'] = current + new
+        util.generate_extraction_file(EXTRACT_FILE, loaded['measurements'])
+
+
+def load_simulator(server, req, loaded):
+    """Load the simulator, unless the same setup is already loaded.
+
+    The fingerprint of the simulator setup (the load and template files)
+    identifies the loaded simulator, so a client of a daemon server skips the
+    loading when nothing changed. A different setup is refused once a setup
+    is loaded, as the tests of the loaded setup can't be deleted from the
+    Cadence session, and its new tests would collide with them. Cadence
+    creates the tests of any batch size from the master test, so the
+    population size of the client doesn't matter. If the request has the
+    measurements consumed by the client, the extraction file is generated
+    with them.
+
+    Arguments:
+        server (Server): server that communicates with Cadence.
+        req (dict): "loadSimulator" request object.
+        loaded (dict): fingerprint, response and extracted measurements of the
+            loaded simulator, updated when the simulator is loaded.
+
+    Raises:
+        KeyError: if the input request format is invalid.
+        TypeError: if the Cadence response is invalid.
+
+    Returns:
+        tuple: response type (type_) and response object (obj).
+    """
+    data = req['data']
+    measurements = data.get('measurements') if isinstance(data, dict) else None
+
+    key = util.fingerprint([SIM_FILE, TEMPLATE_FILE])
+    if loaded.get('fingerprint') == key:
+        if measurements is not None:
+            update_extraction(loaded, measurements)
+        server.send_skill("Simulator setup unchanged, skipping the loadSimulator")
+        return 'loadSimulator', loaded['variables']
+
+    if loaded:
+        return 'error', ("The simulator setup changed since it was loaded in this Cadence "
+                         "session. Restart the server to load the new setup.")
+
+    server.send_skill(process_skill_request(req))
+    type_, obj = process_skill_response(recv_skill(server))
+
+    loaded['fingerprint'] = key
+    loaded['variables'] = obj
+    # A new setup only extracts the measurements of its client
+    loaded.pop('measurements', None)
+    if measurements is not None:
+        update_extraction(loaded, measurements)
+
+    return type_, obj
+
+
+def handle_request(server, scheduler, req, loaded, notify=None):
+    """Process a client request.
+
+    Arguments:
+        server (Server): server that communicates with Cadence.
+        scheduler (Scheduler): simulations scheduler.
+        req (dict): request object.
+        loaded (dict): fingerprint, response and extracted measurements of the
+            loaded simulator.
+        notify (callable or None, optional): sends the progress of the
+            simulations to the client(s) (see "progress_notifier"). If None,
+            the progress is not reported (default: None).
+
+    Raises:
+        KeyError: if the input request format is invalid.
+        TypeError: if the request or the Cadence response is invalid.
+
+    Returns:
+        dict or str: response object, or the request that ends the session
+            ('exit' or 'shutdown').
+    """
+    # Timings of each stage, returned to the client in the response metadata
+    spans = {}
+
+    # Refuse the simulations that exceed the budget or the deadline
+    num_sims = get_num_simulations(req)
+    scheduler.start_request(num_sims)
+    reason = scheduler.check_budget(num_sims)
+
+    progress = None
+    if notify is not None and num_sims and not reason:
+        progress = Progress(notify, num_sims, HEARTBEAT)
+
+    if reason:
+        server.send_skill("[BUDGET] {0}".format(reason))
+        typ, obj = 'budgetExceeded', reason
+
+    elif req['type'] == 'updateAndRun':
+        typ, obj = run_batches(server, scheduler, req, spans, progress)
+
+    elif req['type'] == 'loadSimulator':
+        with util.span(spans, 'skill'):
+            typ, obj = load_simulator(server, req, loaded)
+
+    else:
+        # Process the client request
+        with util.span(spans, 'request'):
+            expr = process_skill_request(req)
+
+        if expr in ('exit', 'shutdown'):
+            return expr
+
+        with util.span(spans, 'skill'):
+            # Send the request to Cadence
+            server.send_skill(expr)
+            # Wait for a response from Cadence
+            res = wait_skill(server, progress)
+        # Process the Cadence response
+        with util.span(spans, 'response'):
+            typ, obj = process_skill_response(res)
+        if progress is not None:
+            progress.add_batch(obj, spans['skill'])
+        spans.update(util.get_skill_timings(res))
+        scheduler.consume(num_sims)
+
+    res = dict(type=typ, data=obj, meta=dict(spans=spans, scheduler=scheduler.report()))
+    # The response has the id of the request, if provided
+    if 'id' in req:
+        res['id'] = req['id']
+
+    return res
+
+
+def serve_client(server, scheduler, loaded, sessions):
+    """Process the requests of a client until it leaves.
+
+    If the client opens a session, the responses are buffered before being
+    sent, so a request sent again after a reconnection gets the buffered
+    response.
+
+    Arguments:
+        server (Server): server that communicates with Cadence and the client.
+        scheduler (Scheduler): simulations scheduler.
+        loaded (dict): fingerprint, response and extracted measurements of the
+            loaded simulator.
+        sessions (Sessions): client sessions.
+
+    Raises:
+        ConnectionError: if the connection with the client is broken.
+        KeyError: if a request format is invalid.
+        TypeError: if a request or a Cadence response is invalid.
+
+    Returns:
+        str: request that ended the session ('exit' or 'shutdown').
+    """
+    session = None
+
+    while True:
+        # Wait for a client request
+        req = server.recv_data()
+
+        if req.get('type') == 'session':
+            session = sessions.open(req.get('data'))
+            server.send_data(dict(type='session', data=session))
+            continue
+
+        res = sessions.get(session, req.get('id'))
+        if res is not None:
+            server.send_skill("Resending the buffered response of the request {0}".format(
+                req['id']))
+        else:
+            res = handle_request(server, scheduler, req, loaded,
+                                 notify=progress_notifier(server, [(None, req)]))
+            if res in ('exit', 'shutdown'):
+                return res
+            sessions.store(session, req.get('id'), res)
+
+        # Send the processed response to the client
+        server.send_data(res)
+
+
+def batch_key(req):
+    """Get the key of the requests whose simulations can run in the same batch.
+
+    Arguments:
+        req (dict): request object.
+
+    Returns:
+        str or None: simulation stage ('' for the full simulation), or None if
+            the request can't be merged with others.
+    """
+    if req.get('type') != 'updateAndRun':
+        return None
+    if isinstance(req.get('data'), dict):
+        return req['data'].get('stage', '')
+
+    return ''
+
+
+def merge_requests(reqs):
+    """Merge "updateAndRun" requests with the same batch key.
+
+    Arguments:
+        reqs (list): request objects.
+
+    Returns:
+        dict: request with the circuit variables of all requests, in order,
+            the measurements of the stage of all requests and the analyses
+            disabled by all of them.
+    """
+    variables = []
+    measurements = []  # Measurements of a stage (None: all the measurements)
+    disable = None  # Analyses disabled by all the requests of a stage
+    for req in reqs:
+        data = req['data']
+        if not isinstance(data, dict):
+            variables.extend(data)
+            continue
+        variables.extend(data['variables'])
+        if not data.get('measurements'):
+            measurements = None
+        elif measurements is not None:
+            measurements.extend([name for name in data['measurements']
+                                 if name not in measurements])
+        disable = [name for name in data.get('disable') or []
+                   if disable is None or name in disable]
+
+    data = reqs[0]['data']
+    if isinstance(data, dict):
+        # The stage extracts the measurements of all the clients, and only
+        # disables the analyses that none of them needs
+        data = dict(data, variables=variables)
+        data.pop('measurements', None)
+        data.pop('disable', None)
+        if measurements:
+            data['measurements'] = measurements
+        if disable:
+            data['disable'] = disable
+        return dict(type='updateAndRun', data=data)
+
+    return dict(type='updateAndRun', data=variables)
+
+
+def serve_clients(server, scheduler, loaded, sessions):
+    """Serve several clients at the same time, sharing the Cadence session.
+
+    The requests are processed in arrival order. The pending simulations of
+    all clients with the same stage are merged in a single request, so they
+    share the parallel jobs of each simulation run. The results are split and
+    routed back to each client, with the id of its request. The responses of
+    the clients with a session are buffered, as in "serve_client".
+
+    Arguments:
+        server (Server): listening server that communicates with Cadence.
+        scheduler (Scheduler): simulations scheduler.
+        loaded (dict): fingerprint, response and extracted measurements of the
+            loaded simulator.
+        sessions (Sessions): client sessions.
+
+    Raises:
+        ConnectionError: if the server socket fails.
+
+    Returns:
+        str: 'shutdown' if requested by a client, or 'exit' when the last
+            client leaves (not in daemon mode).
+    """
+    pending = []  # (client socket, request), in arrival order
+    served = False
+    client_sessions = {}  # Session of each client socket
+
+    while True:
+        if served and not server.clients and not pending and not DAEMON:
+            return 'exit'
+
+        # Only wait for new events if there are no pending requests
+        for event, conn, obj in server.poll(0 if pending else None):
+            if event == 'connect':
+                served = True
+                server.send_skill("Connected to client with address {0}:{1}".format(
+                    obj[0], obj[1]))
+            elif event == 'disconnect':
+                server.send_warn("[CONNECTION ERROR] Connection with a client lost\n")
+                pending = [(cli, req) for cli, req in pending if cli is not conn]
+                client_sessions.pop(conn, None)
+            elif obj.get('type') == 'session':
+                client_sessions[conn] = sessions.open(obj.get('data'))
+                send_or_drop(server, dict(type='session', data=client_sessions[conn]), conn)
+            elif sessions.get(client_sessions.get(conn), obj.get('id')) is not None:
+                send_or_drop(server, sessions.get(client_sessions[conn], obj['id']), conn)
+            else:
+                pending.append((conn, obj))
+
+        if not pending:
+            continue
+
+        conn, req = pending.pop(0)
+        key = batch_key(req)
+        group = [(conn, req)]
+        if key is not None:
+            group.extend((cli, other) for cli, other in pending if batch_key(other) == key)
+            pending = [(cli, other) for cli, other in pending if batch_key(other) != key]
+
+        if len(group) > 1:
+            server.send_skill("Merging the simulations of {0} clients".format(len(group)))
+            req = merge_requests([other for _, other in group])
+
+        try:
+            res = handle_request(server, scheduler, req, loaded,
+                                 progress_notifier(server, group))
+        except (TypeError, KeyError) as err:
+            server.send_warn("[REQUEST ERROR] {0}\n".format(err))
+            res = dict(type='error', data=str(err))
+
+        if res == 'shutdown':
+            return res
+        if res == 'exit':
+            server.drop(conn)
+            server.send_warn("Connection with a client ended!\n")
+            continue
+
+        # Route the results of each client
+        start = 0
+        for cli, other in group:
+            out = dict(res)
+            if len(group) > 1 and res['type'] == 'updateAndRun':
+                num_sims = get_num_simulations(other)
+                out['data'] = res['data'][start:start + num_sims]
+                start += num_sims
+            out.pop('id', None)
+            if 'id' in other:
+                out['id'] = other['id']
+
+            sessions.store(client_sessions.get(cli), other.get('id'), out)
+            send_or_drop(server, out, cli)
+
+
+def send_or_drop(server, obj, conn):
+    """Send an object to a client of the multi-client mode, or drop the client.
+
+    Arguments:
+        server (Server): server that communicates with the clients.
+        obj (dict): object to send.
+        conn (socket): client socket.
+    """
+    try:
+        server.send_data(obj, conn)
+    except IOError as err:
+        server.send_warn("[CONNECTION ERROR] {0}\n".format(err))
+        server.drop(conn)
+
+
 def main():
     """Module main function."""
     try:
@@ -126,46 +675,66 @@ def main():
         return 1
 
     try:
-        addr = server.run(HOST, PORT)
-
-        # Log the connectivity to Cadence
-        log = "Connected to client with address {0}:{1}".format(addr[0], addr[1])
-        server.send_skill(log)
-
+        server.listen(HOST, PORT, 5 if MULTI_CLIENT else 1)
     except IOError as err:  # NOTE: "ConnectionError" don't exist in Python 2 -_-
         server.send_warn("[CONNECTION ERROR] {0}".format(err))
         return 1
 
-    code = 0  # Return code
-    try:
-        while True:
-            # Wait for a client request
-            req = server.recv_data()
-
-            # Process the client request
-            expr = process_skill_request(req)
+    # Schedule the simulations in the available job slots
+    scheduler = Scheduler(SCHEDULER_CFG)
+    # Simulator setup loaded in the Cadence session, kept between clients
+    loaded = {}
+    # Sessions of the clients, kept to resume them after a connection loss
+    sessions = Sessions()
+
+    if MULTI_CLIENT:
+        code = 0
+        try:
+            serve_clients(server, scheduler, loaded, sessions)
+        except IOError as err:
+            server.send_warn("[CONNECTION ERROR] {0}".format(err))
+            code = 2
+
+        server.close(code)
+        return code
+
+    timeout = None  # Time to wait for a new client (None: no limit)
+    while True:
+        code = 0  # Return code
+        try:
+            addr = server.accept(timeout)
+        except IOError as err:
+            server.send_warn("[CONNECTION ERROR] {0}".format(err))
+            code = 1
+            break
 
-            if expr == 'exit':
-                break
-            else:
-                # Send the request to Cadence
-                server.send_skill(expr)
-                # Wait for a response from Cadence
-                res = server.recv_skill()
-                # Process the Cadence response
-                typ, obj = process_skill_response(res)
-                # Send the processed response to the client
-                server.send_data(dict(type=typ, data=obj))
+        # Log the connectivity to Cadence
+        log = "Connected to client with address {0}:{1}".format(addr[0], addr[1])
+        server.send_skill(log)
 
-    except IOError as err:  # NOTE: "ConnectionError" don't exist in Python 2 -_-
-        server.send_warn("[CONNECTION ERROR] {0}".format(err))
-        code = 2
-    except TypeError as err:
-        server.send_warn("[TYPE ERROR] {0}".format(err))
-        code = 3
-    except KeyError as err:
-        server.send_warn("[KEY ERROR] {0}".format(err))
-        code = 4
+        end = None
+        try:
+            end = serve_client(server, scheduler, loaded, sessions)
+        except IOError as err:  # NOTE: "ConnectionError" don't exist in Python 2 -_-
+            server.send_warn("[CONNECTION ERROR] {0}".format(err))
+            code = 2
+        except TypeError as err:
+            server.send_warn("[TYPE ERROR] {0}".format(err))
+            code = 3
+        except KeyError as err:
+            server.send_warn("[KEY ERROR] {0}".format(err))
+            code = 4
+
+        # A daemon server keeps the Cadence session for the next client, until
+        # a client requests the shutdown. A client with a session that lost the
+        # connection can reconnect to resume it.
+        resume = code == 2 and sessions.last is not None
+        if end == 'shutdown' or not (DAEMON or resume):
+            break
+        timeout = RESUME_TIMEOUT if resume and not DAEMON else None
+
+        server.disconnect()
+        server.send_skill("Waiting for a new client connection...")
 
     server.close(code)
     return code
@@ -16,6 +16,7 @@
 """Server that stands between a client and Cadence Virtuoso."""
 
 import json
+import select
 import socket
 import struct
 import time
@@ -59,6 +60,7 @@ class Server:
 
         # Uninitialized variables
         self.conn = None  # Client socket
+        self.clients = []  # Client sockets of the multi-client mode
 
         # Receive initial message from cadence, to check connectivity, and send it back
         # to print on screen
@@ -73,7 +75,7 @@ class Server:
             self.socket = sock
 
     def run(self, host, port):
-        """Start the server.
+        """Start the server and accept a single client.
 
         Arguments:
             host (str): remote socket IP address.
@@ -85,18 +87,70 @@ class Server:
         Returns:
             list: remote socket name.
         """
+        # NOTE: After the connection with the client, the "self.conn" is the socket
+        # that communicates with the client, so the "self.socket" is not required
+        # anymore and can be closed.
+        with closing(self.socket):
+            self.listen(host, port)
+            return self.accept()
+
+    def listen(self, host, port, backlog=1):
+        """Start listening for client connections.
+
+        Arguments:
+            host (str): remote socket IP address.
+            port (int): remote socket port.
+            backlog (int, optional): max number of pending connections
+                (default: 1).
+
+        Raises:
+            ConnectionError: if there's a communication problem.
+        """
+        try:
+            self.socket.bind((host, port))
+            self.socket.listen(backlog)
+        except (OSError, IOError) as err:
+            raise IOError(err)  # TODO: Replace to "ConnectionError"
+
+    def accept(self, timeout=None):
+        """Wait for a client connection.
+
+        The server must be listening, so it can accept a new client after the
+        previous one disconnects.
+
+        Arguments:
+            timeout (float or None, optional): max time to wait, in seconds. If
+                None, waits for a client (default: None).
+
+        Raises:
+            ConnectionError: if there's a communication problem or no client
+                connects before the timeout.
+
+        Returns:
+            list: remote socket name.
+        """
+        self.socket.settimeout(timeout)
+        try:
+            self.conn, name = self.handshake()
+        finally:
+            self.socket.settimeout(None)
+
+        return name
+
+    def handshake(self):
+        """Accept a client connection and exchange the socket names.
+
+        Raises:
+            ConnectionError: if there's a communication problem.
+
+        Returns:
+            tuple: client socket and remote socket name.
+        """
         try:
-            # Start connection between client and server (UNIX socket)
-            # NOTE: After the connection with the client, the "self.conn" is the socket
-            # that communicates with the client, so the "self.socket" is not required
-            # anymore and can be closed.
-            with closing(self.socket) as s:
-                s.bind((host, port))
-                s.listen(1)  # Waits for client connection
-
-                # Accept the client connection and get his socket and address
-                self.conn, addr = s.accept()
-        except OSError as err:
+            # Accept the client connection and get his socket and address
+            conn, addr = self.socket.accept()
+            conn.settimeout(None)
+        except (OSError, IOError) as err:
             raise IOError(err)  # TODO: Replace to "ConnectionError"
 
         # The next function calls don't need a try statement because if they
@@ -104,12 +158,68 @@ class Server:
         # calls this one
 
         # Send the socket address to the client
-        self.send_data(dict(data=addr))
+        self.send_data(dict(data=addr), conn)
 
         # Receive remote socket name
-        return self.recv_data()['data']
+        return conn, self.recv_data(conn)['data']
+
+    def poll(self, timeout=None):
+        """Wait for new clients and requests of the connected clients.
+
+        Used in the multi-client mode, where the server must be listening. The
+        connected clients are in "clients".
+
+        Arguments:
+            timeout (float or None, optional): max time to wait, in seconds. If
+                None, waits for an event (default: None).
+
+        Returns:
+            list: (event, client socket, object) of each event, where the event
+                is 'connect' (the object is the remote socket name), 'request'
+                (the object is the request) or 'disconnect'.
+        """
+        try:
+            readable = select.select([self.socket] + self.clients, [], [], timeout)[0]
+        except (OSError, IOError, select.error) as err:
+            raise IOError(err)  # TODO: Replace to "ConnectionError"
 
-    def send_data(self, obj):
+        events = []
+        for conn in readable:
+            if conn is self.socket:
+                try:
+                    conn, name = self.handshake()
+                except (IOError, TypeError):
+                    continue  # A client that failed the handshake is ignored
+                self.clients.append(conn)
+                events.append(('connect', conn, name))
+                continue
+
+            try:
+                events.append(('request', conn, self.recv_data(conn)))
+            except (IOError, TypeError):
+                self.drop(conn)
+                events.append(('disconnect', conn, None))
+
+        return events
+
+    def drop(self, conn):
+        """Close the connection with a client of the multi-client mode.
+
+        Arguments:
+            conn (socket): client socket.
+        """
+        if conn in self.clients:
+            self.clients.remove(conn)
+        conn.close()
+
+    def disconnect(self):
+        """Close the connection with the current client, keeping the server."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self.send_warn("Connection with the client ended!\n\n")
+
+    def send_data(self, obj, conn=None):
         """Send an object through a socket.
 
         1 - Serialize the object in JSON and encode the string;
@@ -122,6 +232,8 @@ class Server:
 
         Arguments:
             obj (dict): object to send.
+            conn (socket or None, optional): client socket. If None, sends to
+                the current client (default: None).
 
         Raises:
             TypeError: if the object is not serializable in JSON.
@@ -141,10 +253,13 @@ class Server:
         # Data to send
         data = pack_serialized_len + serialized
 
+        if conn is None:
+            conn = self.conn
+
         total_sent = 0
 
         while total_sent < serialized_len:
-            sent = self.conn.send(data[total_sent:])
+            sent = conn.send(data[total_sent:])
 
             if not sent:
                 # TODO: Replace to "ConnectionError"
@@ -152,7 +267,7 @@ class Server:
 
             total_sent += sent
 
-    def recv_data(self):
+    def recv_data(self, conn=None):
         """Receive an object through a socket.
 
         1 - Receive the first 4 bytes of data, which contains the data length;
@@ -161,6 +276,10 @@ class Server:
 
         3 - Convert the received data in an object.
 
+        Arguments:
+            conn (socket or None, optional): client socket. If None, receives
+                from the current client (default: None).
+
         Raises:
             ConnectionError: if the socket connection is broken.
             TypeError: if the received data is not in JSON format.
@@ -168,7 +287,7 @@ class Server:
         Returns:
             dict: decoded and de-serialized received data.
         """
-        data_len = self.recv_bytes(4)
+        data_len = self.recv_bytes(4, conn)
 
         if not data_len:
             # TODO: Replace to "ConnectionError"
@@ -176,7 +295,7 @@ class Server:
 
         msg_len = struct.unpack('>I', data_len)[0]
 
-        serialized = self.recv_bytes(msg_len).decode()
+        serialized = self.recv_bytes(msg_len, conn).decode()
 
         try:
             obj = json.loads(serialized)
@@ -185,11 +304,13 @@ class Server:
 
         return obj
 
-    def recv_bytes(self, n_bytes):
+    def recv_bytes(self, n_bytes, conn=None):
         """Receive a specified number of bytes through a socket.
 
         Arguments:
             n_bytes (int): number of bytes to receive.
+            conn (socket or None, optional): client socket. If None, receives
+                from the current client (default: None).
 
         Raises:
             ConnectionError: if the socket connection is broken.
@@ -197,12 +318,15 @@ class Server:
         Returns:
             bytes: received bytes stream.
         """
+        if conn is None:
+            conn = self.conn
+
         data = b''  # Bytes literal
         data_len = len(data)
 
         while data_len < n_bytes:
             # Receives a maximum of 1024 bytes per iteration
-            packet = self.conn.recv(min(n_bytes - data_len, 1024))
+            packet = conn.recv(min(n_bytes - data_len, 1024))
 
             if not packet:
                 # TODO: Replace to "ConnectionError"
@@ -264,9 +388,10 @@ class Server:
         Arguments:
             code (int): exit code.
         """
-        self.conn.close()
-        # Send feedback to Cadence
-        self.send_warn("Connection with the client ended!\n\n")
+        for conn in list(self.clients):
+            self.drop(conn)
+        self.disconnect()
+        self.socket.close()
         self.server_out.close()  # close stdout
         self.server_err.close()  # close stderr
         self.cad_stream.exit(code)  # close connection to cadence (code up to 255)
@@ -0,0 +1,154 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Progress of the simulations of a request, reported to the client."""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Prefix of the progress messages sent by the SKILL "smocProgress" procedure
+SKILL_PREFIX = 'smocProgress '
+
+
+class Progress:
+    """Report the progress of the simulations of a request.
+
+    The progress is sent to the client before the response: after each batch
+    (simulations done and failed), when the run file reports a step (see
+    "smocProgress" in "cadence.il"), and as a heartbeat while Cadence is busy,
+    so the client can tell a slow simulation from a hung server.
+
+    Arguments:
+        notify (callable): sends the progress data (dict) to the client.
+        total (int): number of simulations of the request.
+        heartbeat (float, optional): time between heartbeats, in seconds. If
+            0, no heartbeats are sent (default: 0).
+    """
+
+    def __init__(self, notify, total, heartbeat=0):
+        """Create the progress of a request."""
+        self.notify = notify
+        self.total = total
+        self.heartbeat = heartbeat
+
+        self.done = 0      # Simulations done
+        self.failed = 0    # Simulations without results
+        self.start = time.time()
+        self.last_event = self.start  # Last message or batch from Cadence
+
+        # The heartbeats are sent by another thread
+        self.lock = threading.Lock()
+        self.stop = None
+
+    def report(self, event, **info):
+        """Send the progress to the client.
+
+        Arguments:
+            event (str): 'batch', 'skill' or 'heartbeat'.
+            **info: extra progress data.
+        """
+        now = time.time()
+        data = dict(event=event, done=self.done, failed=self.failed, total=self.total,
+                    elapsed=now - self.start, idle=now - self.last_event)
+        data.update(info)
+
+        self.lock.acquire()
+        try:
+            self.notify(data)
+        finally:
+            self.lock.release()
+
+    def add_batch(self, results, run_time):
+        """Report a simulated batch.
+
+        Arguments:
+            results (list): simulation results of the batch.
+            run_time (float): run time of the batch, in seconds.
+        """
+        self.last_event = time.time()
+        self.done += len(results)
+        self.failed += len([res for res in results if is_failed(res)])
+        self.report('batch', batch_size=len(results), batch_time=run_time)
+
+    def add_message(self, msg):
+        """Report a message of the run file.
+
+        Arguments:
+            msg (str): message sent by "smocProgress", without the prefix.
+        """
+        self.last_event = time.time()
+        self.report('skill', message=msg)
+
+    def beat(self):
+        """Send heartbeats until stopped."""
+        stop = self.stop
+        while True:
+            stop.wait(self.heartbeat)
+            if stop.isSet():
+                return
+            try:
+                self.report('heartbeat')
+            except (IOError, TypeError):
+                return  # The connection errors are handled by the main thread
+
+    @contextmanager
+    def running(self):
+        """Send heartbeats while the code block runs (e.g. waiting for Cadence)."""
+        if not self.heartbeat:
+            yield
+            return
+
+        self.stop = threading.Event()
+        thread = threading.Thread(target=self.beat)
+        thread.daemon = True
+        thread.start()
+        try:
+            yield
+        finally:
+            self.stop.set()
+            thread.join()
+
+
+def is_failed(res):
+    """Check if a simulation failed, i.e. it has no valid results.
+
+    Arguments:
+        res (dict): simulation results.
+
+    Returns:
+        bool: True if all results are missing ("nan").
+    """
+    return all(isinstance(val, float) and math.isnan(val) for val in res.values())
+
+
+def recv_skill(server, progress=None):
+    """Receive the response of Cadence, reporting its progress messages.
+
+    Arguments:
+        server (Server): server that communicates with Cadence.
+        progress (Progress or None, optional): progress of the request. If
+            None, the progress messages are ignored (default: None).
+
+    Returns:
+        str: Cadence response.
+    """
+    while True:
+        msg = server.recv_skill()
+        if not msg.startswith(SKILL_PREFIX):
+            return msg
+        if progress is not None:
+            progress.add_message(msg[len(SKILL_PREFIX):])
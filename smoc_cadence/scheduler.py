@@ -0,0 +1,224 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Budget-aware scheduling of the simulations on the ADE XL job slots."""
+
+import math
+import multiprocessing
+import os
+import re
+import subprocess
+import time
+
+
+class Scheduler:
+    """Size the simulation batches and the number of parallel jobs.
+
+    The number of parallel jobs is limited by the configured job slots, the
+    free simulator licences (reported by an external command) and the load of
+    the machine. The runtime of a "wave" of parallel tests is tracked with an
+    exponentially weighted moving average, and used to split the requests in
+    batches that take about "batch_time" seconds, so the number of jobs is
+    updated between batches. The total number of simulations and the run time
+    can be limited by a budget and a deadline.
+
+    Arguments:
+        cfg (dict or None, optional): scheduler configuration with the keys
+            'max_jobs' (default: 4), 'min_jobs' (default: 1), 'adapt_to_load'
+            (default: True), 'licence_cmd', 'batch_time', 'budget', 'deadline'
+            (seconds after the server start) and 'alpha' (EWMA smoothing,
+            default: 0.3). The missing or null keys are disabled.
+    """
+
+    def __init__(self, cfg=None):
+        """Create the scheduler."""
+        cfg = cfg or {}
+        self.max_jobs = int(cfg.get('max_jobs') or 4)
+        self.min_jobs = int(cfg.get('min_jobs') or 1)
+        self.adapt_to_load = cfg.get('adapt_to_load', True)
+        self.licence_cmd = cfg.get('licence_cmd')
+        self.batch_time = cfg.get('batch_time')
+        self.budget = cfg.get('budget')
+        self.deadline = cfg.get('deadline')
+        self.alpha = cfg.get('alpha') or 0.3
+
+        self.start_time = time.time()
+        self.jobs = self.max_jobs   # Jobs of the last batch
+        self.wave_time = None       # Estimated runtime of a wave of parallel tests
+        self.used = 0               # Simulations performed
+
+        # Utilization of the current request
+        self.queue = 0
+        self.batches = 0
+        self.slots_used = 0
+        self.slots_offered = 0
+
+    def free_licences(self):
+        """Get the number of free simulator licences.
+
+        Returns:
+            int or None: free licences, or None if unknown.
+        """
+        if not self.licence_cmd:
+            return None
+
+        try:
+            proc = subprocess.Popen(self.licence_cmd, shell=True, stdout=subprocess.PIPE)
+            out = proc.communicate()[0]
+        except OSError:
+            return None
+
+        match = re.search(r'\d+', out.decode() if hasattr(out, 'decode') else out)
+        if match is None:
+            return None
+
+        return int(match.group(0))
+
+    def free_slots(self):
+        """Get the number of job slots available for the next batch.
+
+        The load average still includes the jobs of the last batch, that just
+        finished, so only the load above them is considered external.
+
+        Returns:
+            int: available job slots.
+        """
+        slots = self.max_jobs
+
+        if self.adapt_to_load:
+            try:
+                load = os.getloadavg()[0]
+                external = max(0.0, load - self.jobs)
+                slots = min(slots, int(multiprocessing.cpu_count() - external))
+            except (AttributeError, OSError, NotImplementedError):
+                pass
+
+        licences = self.free_licences()
+        if licences is not None:
+            slots = min(slots, licences)
+
+        return max(self.min_jobs, slots)
+
+    def estimate(self, num_sims, jobs=None):
+        """Estimate the time to perform a number of simulations.
+
+        Arguments:
+            num_sims (int): number of simulations.
+            jobs (int or None, optional): parallel jobs (default: last jobs).
+
+        Returns:
+            float: estimated time, in seconds (0 if there's no estimate yet).
+        """
+        if self.wave_time is None:
+            return 0.0
+
+        return math.ceil(float(num_sims) / (jobs or self.jobs)) * self.wave_time
+
+    def check_budget(self, num_sims):
+        """Check if a number of simulations fits in the budget and deadline.
+
+        Arguments:
+            num_sims (int): number of simulations requested.
+
+        Returns:
+            str or None: reason why the simulations are refused, or None.
+        """
+        if not num_sims:
+            return None
+
+        if self.budget is not None and self.used + num_sims > self.budget:
+            return "Simulation budget exceeded: {0} simulations used of {1}".format(
+                self.used, self.budget)
+
+        if self.deadline is not None:
+            remaining = self.deadline - (time.time() - self.start_time)
+            if self.estimate(num_sims) > remaining:
+                return "Deadline exceeded: {0:.0f}s remaining".format(max(0.0, remaining))
+
+        return None
+
+    def start_request(self, num_sims):
+        """Reset the utilization for a new request.
+
+        Arguments:
+            num_sims (int): number of simulations requested.
+        """
+        self.queue = num_sims
+        self.batches = 0
+        self.slots_used = 0
+        self.slots_offered = 0
+
+    def next_batch(self, num_sims):
+        """Get the size and number of jobs of the next batch.
+
+        Arguments:
+            num_sims (int): number of simulations still in the queue.
+
+        Returns:
+            tuple: number of jobs and batch size.
+        """
+        jobs = min(self.free_slots(), num_sims)
+
+        size = num_sims
+        if self.batch_time and self.wave_time:
+            waves = max(1, int(self.batch_time / self.wave_time))
+            size = min(num_sims, jobs * waves)
+
+        return jobs, size
+
+    def record(self, num_sims, jobs, run_time):
+        """Record a finished batch.
+
+        Arguments:
+            num_sims (int): number of simulations of the batch.
+            jobs (int): parallel jobs of the batch.
+            run_time (float): batch runtime, in seconds.
+        """
+        waves = int(math.ceil(float(num_sims) / jobs))
+        sample = run_time / waves
+
+        if self.wave_time is None:
+            self.wave_time = sample
+        else:
+            self.wave_time = self.alpha * sample + (1 - self.alpha) * self.wave_time
+
+        self.jobs = jobs
+        self.used += num_sims
+        self.batches += 1
+        self.slots_used += num_sims
+        self.slots_offered += waves * jobs
+
+    def consume(self, num_sims):
+        """Count simulations that were not scheduled in batches.
+
+        Arguments:
+            num_sims (int): number of simulations.
+        """
+        self.used += num_sims
+
+    def report(self):
+        """Get the queue and slot utilization, sent to the client.
+
+        Returns:
+            dict: scheduler report.
+        """
+        utilization = None
+        if self.slots_offered:
+            utilization = float(self.slots_used) / self.slots_offered
+
+        return dict(jobs=self.jobs, queue=self.queue, batches=self.batches,
+                    utilization=utilization, wave_time=self.wave_time, used=self.used,
+                    budget=self.budget, elapsed=time.time() - self.start_time,
+                    deadline=self.deadline)
@@ -0,0 +1,89 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Client sessions, to resume an optimization after a connection loss."""
+
+import uuid
+
+
+class Sessions:
+    """Buffer the last responses of each client session.
+
+    A client opens a session after the connection, and reopens it with the
+    same id after a reconnection. The responses of its last requests are
+    buffered, so a request that is sent again (with the same id) gets the
+    buffered response, without simulating again.
+
+    Arguments:
+        buffer_size (int, optional): number of buffered responses per
+            session (default: 2).
+    """
+
+    def __init__(self, buffer_size=2):
+        """Create the sessions."""
+        self.buffer_size = buffer_size
+        self.buffers = {}   # (request id, response) pairs of each session
+        self.last = None    # Last opened session
+
+    def open(self, session=None):
+        """Open a new session, or reopen an existing one.
+
+        Arguments:
+            session (str or None, optional): id of the session to reopen. If
+                None or unknown, a new session is opened (default: None).
+
+        Returns:
+            str: session id.
+        """
+        if session not in self.buffers:
+            session = uuid.uuid4().hex
+            self.buffers[session] = []
+
+        self.last = session
+        return session
+
+    def get(self, session, req_id):
+        """Get the buffered response of a request.
+
+        Arguments:
+            session (str or None): session id.
+            req_id (int or None): request id.
+
+        Returns:
+            dict or None: buffered response, or None if it isn't buffered.
+        """
+        if session is None or req_id is None:
+            return None
+
+        for buffered_id, res in self.buffers.get(session, []):
+            if buffered_id == req_id:
+                return res
+
+        return None
+
+    def store(self, session, req_id, res):
+        """Buffer the response of a request, before sending it.
+
+        Arguments:
+            session (str or None): session id.
+            req_id (int or None): request id.
+            res (dict): response object.
+        """
+        if session is None or req_id is None or session not in self.buffers:
+            return
+
+        buffer = self.buffers[session]
+        buffer.append((req_id, res))
+        del buffer[:-self.buffer_size]
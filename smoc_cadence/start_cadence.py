@@ -46,6 +46,8 @@ def main():
 
     project_cfg = config['project_cfg']
     client_cfg = config['client_cfg']
+    # Optional configs
+    scheduler_cfg = config.get('scheduler_cfg', {})
 
     # Directories
     project_dir = project_cfg['project_path'] + '/' + project_cfg['project_name']
@@ -65,10 +67,21 @@ def main():
     run_simulation_file = script_dir + '/' + project_cfg['runSimulation_fie']
     variables_file = script_dir + '/' + project_cfg['variables_file']
     results_file = project_dir + '/' + project_cfg['results_file']
+    # Optional files
+    mc_run_file = project_cfg.get('runMonteCarlo_file')
+    if mc_run_file:
+        mc_run_file = script_dir + '/' + mc_run_file
+    # Generated by the server, with the measurements of the optimizer
+    extract_file = script_dir + '/' + project_cfg.get('extract_file', 'extract.ocn')
+    stage_files = dict((stage, script_dir + '/' + fname)
+                       for stage, fname in project_cfg.get('stage_files', {}).items())
 
     # Check if files exist
     files = [load_simulator_file, template_simulations_file, run_simulation_file,
              variables_file]
+    if mc_run_file:
+        files.append(mc_run_file)
+    files.extend(stage_files.values())
     for file in files:
         if not os.path.isfile(file):
             print("[ERROR] The file {0} does not exist! Exiting SMOC...".format(file))
@@ -85,10 +98,20 @@ def main():
     os.environ['SMOC_TEMPLATE_FILE'] = template_simulations_file
     os.environ['SMOC_RUN_FILE'] = run_simulation_file
     os.environ['SMOC_VARS_FILE'] = variables_file
+    if mc_run_file:
+        os.environ['SMOC_MC_RUN_FILE'] = mc_run_file
     os.environ['SMOC_RESULTS_FILE'] = results_file
+    os.environ['SMOC_EXTRACT_FILE'] = extract_file
+    os.environ['SMOC_STAGE_FILES'] = json.dumps(stage_files)
     # Server
     os.environ['SMOC_CLIENT_ADDR'] = client_cfg['host']
     os.environ['SMOC_CLIENT_PORT'] = str(client_cfg['port'])
+    os.environ['SMOC_DAEMON'] = '1' if client_cfg.get('daemon') else '0'
+    os.environ['SMOC_MULTI_CLIENT'] = '1' if client_cfg.get('multi_client') else '0'
+    os.environ['SMOC_RESUME_TIMEOUT'] = str(client_cfg.get('resume_timeout') or 300)
+    os.environ['SMOC_HEARTBEAT'] = str(client_cfg.get('heartbeat', 30) or 0)
+    # Scheduler
+    os.environ['SMOC_SCHEDULER_CFG'] = json.dumps(scheduler_cfg)
 
     # Print license
     print("\nSMOC  Copyright (C) 2018  Miguel Fernandes")
@@ -110,10 +133,26 @@ def main():
     print("* Simulations template file (script folder):", project_cfg['templateSimulations_file'])
     print("* Run simulation file (script folder):", project_cfg['runSimulation_fie'])
     print("* Variables file (script folder):", project_cfg['variables_file'])
+    print("* Monte-Carlo run file (script folder):", project_cfg.get('runMonteCarlo_file'))
+    for stage, fname in project_cfg.get('stage_files', {}).items():
+        print("* Run file of the stage {0} (script folder):".format(stage), fname)
+    print("* Extraction file (script folder, generated):",
+          project_cfg.get('extract_file', 'extract.ocn'))
     print("* Results file (project folder):", project_cfg['results_file'])
     print("****************************** Client Parameters *******************************")
     print("* Host:", client_cfg['host'])
     print("* Port:", client_cfg['port'])
+    print("* Daemon mode (serve clients until a shutdown):", client_cfg.get('daemon', False))
+    print("* Multi-client mode (share the session):", client_cfg.get('multi_client', False))
+    print("* Time to resume a lost session (s):", client_cfg.get('resume_timeout') or 300)
+    print("* Time between heartbeats (s):", client_cfg.get('heartbeat', 30) or None)
+    print("**************************** Scheduler Parameters ******************************")
+    print("* Max parallel jobs:", scheduler_cfg.get('max_jobs') or 4)
+    print("* Adapt to the machine load:", scheduler_cfg.get('adapt_to_load', True))
+    print("* Licences command:", scheduler_cfg.get('licence_cmd'))
+    print("* Batch time (s):", scheduler_cfg.get('batch_time'))
+    print("* Simulation budget:", scheduler_cfg.get('budget'))
+    print("* Deadline (s):", scheduler_cfg.get('deadline'))
     print("***************************************************************************\n")
 
     # Run Cadence
@@ -15,9 +15,57 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 """Helpers to handle data."""
 
+import hashlib
 import re
+import time
+from contextlib import contextmanager
 from functools import reduce
 
+# Index columns of the results table
+TABLE_INDEX = ('TEST', 'POINT')
+
+# Extraction procedure, generated from the measurements of the optimizer
+EXTRACTION_TEMPLATE = """; Generated by SMOC from the optimizer measurements. Do not edit.
+smocMeasurements = <MEASUREMENTS>
+
+; Missing or non-numeric results are written as "nan"
+procedure( smocFormatValue(value)
+    if( numberp(value) then sprintf(nil "%.10g" float(value)) else "nan")
+)
+
+procedure( smocFormatRow(test measurements point)
+    buildString(cons("" mapcar(
+        lambda( (meas)
+            smocFormatValue(if( point then calcVal(meas test ?point point)
+                                else calcVal(meas test)))
+        ) measurements)) "\\t")
+)
+
+; Write the results of all tests to a table, with one row per test (or per
+; test and Monte-Carlo sample, sorted by test and then by sample)
+procedure( smocExtract(outPath numTests @key (points 0) (measurements smocMeasurements))
+    let( (outf name)
+        outf = outfile(outPath "w")
+        fprintf(outf "#TEST%s%s\\n" if(points > 0 "\\tPOINT" "")
+                buildString(cons("" measurements) "\\t"))
+
+        for( i 1 numTests
+            sprintf(name "test:%d" i)
+            if( points > 0 then
+                for( j 1 points
+                    fprintf(outf "%d\\t%d%s\\n" i j smocFormatRow(name measurements j))
+                )
+            else
+                fprintf(outf "%d%s\\n" i smocFormatRow(name measurements nil))
+            )
+        )
+
+        close(outf)
+        t
+    )
+)
+"""
+
 
 def get_vars_from_file(fname):
     """Get circuit variables from file and store in a dictionary.
@@ -84,9 +132,12 @@ def store_vars_in_file(variables, fname):
 def get_results_from_file(fname):
     """Get simulation results from file and store in a dictionary.
 
+    The file has a table written by the generated extraction (see
+    "generate_extraction_file"), or "<name>\t<value>" lines with the results
+    of each simulation in sequence.
+
     Arguments:
         fname (str): file path.
-        n_sims (int): number of simulations runing in parallel.
 
     Returns:
         list: simulation results in a list of dictionaries.
@@ -98,6 +149,9 @@ def get_results_from_file(fname):
     with open(fname, 'r') as f:
         content = f.read()
 
+    if content.startswith('#'):
+        return get_results_from_table(content)
+
     results_list = []
 
     for match in re.finditer(pattern, content):
@@ -115,14 +169,138 @@ def get_results_from_file(fname):
     return results_list
 
 
-def generate_simulations_file(template, fname, pop_size):
+def get_results_from_table(content):
+    """Get simulation results from a results table.
+
+    The first line is the header, with the index columns (test and Monte-Carlo
+    sample) and the measurement names, and each row has the results of one
+    simulation. The missing results are "nan".
+
+    Arguments:
+        content (str): results table.
+
+    Returns:
+        list: simulation results in a list of dictionaries.
+    """
+    lines = content.splitlines()
+    header = lines[0].lstrip('#').split('\t')
+    columns = [(idx, key) for idx, key in enumerate(header) if key not in TABLE_INDEX]
+
+    results_list = []
+    for line in lines[1:]:
+        if not line.strip():
+            continue
+        row = line.split('\t')
+        results_list.append(dict((key, float(row[idx])) for idx, key in columns))
+
+    return results_list
+
+
+def skill_list(names):
+    """Format a list of names as a SKILL list of strings.
+
+    Arguments:
+        names (list): names, e.g. of measurements.
+
+    Returns:
+        str: SKILL expression, e.g. 'list("GAIN" "POWER")'.
+    """
+    return 'list({0})'.format(' '.join(
+        '"{0}"'.format(name.replace('\\', '\\\\').replace('"', '\\"')) for name in names))
+
+
+def generate_extraction_file(fname, measurements):
+    """Generate the SKILL procedure that extracts the simulation results.
+
+    The procedure "smocExtract(outPath numTests ?points ?measurements)" writes
+    the measurements of all tests (and Monte-Carlo samples, if "points" is
+    given) to a single results table, so the run files don't hardcode them.
+
+    Arguments:
+        fname (str): file path.
+        measurements (list): names of the measurements (outputs of the tests)
+            consumed by the optimizer.
+    """
+    with open(fname, 'w') as f:
+        f.write(EXTRACTION_TEMPLATE.replace('<MEASUREMENTS>', skill_list(measurements)))
+
+
+def generate_simulations_file(template, fname):
+    """Generate the master test, from which Cadence creates the tests.
+
+    The template setup is wrapped in the SKILL procedure "smocMasterTest", so
+    Cadence only reads it once and creates each test by calling the procedure,
+    when a batch needs more tests (see "setNumTests" in "cadence.il").
+
+    Arguments:
+        template (str): file with the setup of one test.
+        fname (str): file path.
+    """
     # Read the template
     with open(template, 'r') as f:
         content = f.read()
 
     # Write the simulations file
     with open(fname, 'w') as f:
-        for idx in range(1, pop_size + 1):
-            f.write('ocnxlBeginTest("test:{0}")\n'.format(idx))
-            f.write(content)
-            f.write("ocnxlEndTest()\n\n")
+        f.write("; Generated by SMOC from the template test. Do not edit.\n")
+        f.write("procedure( smocMasterTest()\n")
+        f.write(content.rstrip('\n') + "\n")
+        f.write(")\n")
+
+
+@contextmanager
+def span(spans, name):
+    """Measure the duration of a code block and store it in a dictionary.
+
+    Arguments:
+        spans (dict): measured spans, in seconds.
+        name (str): span name.
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + time.time() - start
+
+
+def get_skill_timings(msg):
+    """Get the timings reported by SKILL in a response message.
+
+    The timings are reported as "name=seconds" pairs after the response
+    status, e.g. "updateAndRun_OK load=0.1 run=20.3 simulate=19.8".
+
+    Arguments:
+        msg (str): cadence response.
+
+    Returns:
+        dict: SKILL timings, in seconds.
+    """
+    pattern = r'(?P<name>\w+)=(?P<value>[-+0-9.eE]+)'
+
+    timings = {}
+    for match in re.finditer(pattern, msg):
+        timings['skill.' + match.group('name')] = float(match.group('value'))
+
+    return timings
+
+
+def fingerprint(fnames, *extra):
+    """Get a fingerprint of the contents of files and extra parameters.
+
+    Arguments:
+        fnames (list): files paths.
+        *extra: extra parameters, converted to strings.
+
+    Returns:
+        str: hexadecimal MD5 digest.
+    """
+    md5 = hashlib.md5()
+
+    for fname in fnames:
+        with open(fname, 'rb') as f:
+            md5.update(f.read())
+
+    for param in extra:
+        md5.update(str(param).encode())
+
+    return md5.hexdigest()
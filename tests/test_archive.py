@@ -0,0 +1,105 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Tests of the archive of non-dominated individuals."""
+
+import random
+
+from smoc.optimizer.archive import Archive, NDTree, SortedFront, archive_fname, covers
+from smoc.optimizer.individual import individual_class
+
+
+def non_dominated(points):
+    """Get the non-dominated points (maximization), by brute force."""
+    unique = set(points)
+    return {point for point in unique
+            if not any(covers(other, point) and other != point for other in unique)}
+
+
+def make_individual(wvalues, violation=0.0):
+    """Create an evaluated individual (maximization)."""
+    ind = individual_class((1.0,) * len(wvalues))([0.0])
+    ind.fitness.values = wvalues
+    ind.violation = violation
+    return ind
+
+
+def test_archive_fname():
+    assert archive_fname('cp_20180909.pickle') == 'cp_20180909.archive'
+
+
+def test_covers():
+    assert covers((1, 2), (1, 1))
+    assert covers((1, 1), (1, 1))
+    assert not covers((2, 0), (1, 1))
+
+
+def test_sorted_front():
+    front = SortedFront()
+    assert front.update((1, 1), 'a')
+    assert not front.update((1, 1), 'b')
+    assert not front.update((0, 1), 'c')
+    assert front.update((2, 0), 'd')
+    assert front.update((0, 3), 'e')
+    assert front.update((1, 2), 'f')  # Dominates 'a'
+    assert front.members() == ['e', 'f', 'd']
+
+
+def test_fronts_match_brute_force():
+    rng = random.Random(0)
+    for num_obj, front in ((2, SortedFront()), (3, NDTree(max_leaf=4)), (4, NDTree())):
+        points = [tuple(rng.randint(0, 20) for _ in range(num_obj)) for _ in range(500)]
+        for point in points:
+            front.update(point, point)
+        assert len(front) == len(front.members())
+        assert set(front.members()) == non_dominated(points)
+
+
+def test_archive_constrained_keeps_the_least_violation():
+    archive = Archive(2, constrained=True)
+    assert archive.insert(make_individual((5.0, 5.0), violation=0.4))
+    assert archive.insert(make_individual((0.0, 0.0), violation=0.1))
+    assert len(archive) == 1
+    assert not archive.insert(make_individual((9.0, 9.0), violation=0.2))
+
+    feasible = make_individual((1.0, 0.0))
+    assert archive.insert(feasible)
+    assert archive.members() == [feasible]
+
+
+def test_archive_ignores_invalid_fitness():
+    archive = Archive(2)
+    ind = individual_class((1.0, 1.0))([0.0])
+    assert not archive.insert(ind)
+    assert len(archive) == 0
+
+
+def test_archive_file(tmp_path):
+    fname = str(tmp_path / 'cp.archive')
+    archive = Archive(3, fname=fname)
+    assert archive.add([make_individual((1.0, 0.0, 0.0)), make_individual((0.0, 1.0, 0.0))]) == 2
+    assert archive.add([make_individual((2.0, 0.0, 0.0)), make_individual((0.0, 0.0, 0.0))]) == 1
+
+    # The appended batches are loaded, dropping the dominated individuals
+    loaded = Archive(3)
+    assert loaded.load(fname) == 2
+    assert sorted(ind.fitness.values for ind in loaded.members()) == \
+        [(0.0, 1.0, 0.0), (2.0, 0.0, 0.0)]
+
+    archive.save()
+    rewritten = Archive(3)
+    assert rewritten.load(fname) == 2
+
+    assert Archive(3).load(str(tmp_path / 'missing.archive')) == 0
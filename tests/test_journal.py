@@ -0,0 +1,106 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Tests of the write-ahead journal of the evaluations."""
+
+from smoc.optimizer.individual import individual_class
+from smoc.optimizer.journal import Journal, journal_fname
+
+
+def make_offspring(num):
+    """Create pending (not evaluated) offspring."""
+    cls = individual_class((-1.0, 1.0))
+    return [cls([float(idx), 2.0 * idx]) for idx in range(num)]
+
+
+def evaluate(ind):
+    """Set the results of an individual."""
+    ind.fitness.values = (ind[0], ind[1])
+    ind.result = {'A': ind[0], 'B': ind[1]}
+    ind.violation = 0.5
+
+
+def test_journal_fname():
+    assert journal_fname('cp_20180909.pickle') == 'cp_20180909.journal'
+    assert journal_fname('run.d/cp') == 'run.d/cp.journal'
+
+
+def test_load_without_journal(tmp_path):
+    assert Journal(str(tmp_path / 'cp.journal')).load() is None
+
+
+def test_resume_the_evaluated_offspring(tmp_path):
+    journal = Journal(str(tmp_path / 'cp.journal'))
+    offspring = make_offspring(4)
+    journal.begin(dict(generation=3, population=None, offspring=offspring, logbook=None,
+                       rnd_state=None))
+
+    for ind in offspring[2:]:
+        evaluate(ind)
+    journal.record(offspring, offspring[2:])
+    evaluate(offspring[0])
+    journal.record(offspring, offspring[:1])
+
+    checkpoint, done = journal.load()
+    assert checkpoint['generation'] == 3
+    assert done == 3
+
+    loaded = checkpoint['offspring']
+    assert [ind.fitness.valid for ind in loaded] == [True, False, True, True]
+    assert loaded[3].fitness.values == (3.0, 6.0)
+    assert loaded[3].result == {'A': 3.0, 'B': 6.0}
+    assert loaded[3].violation == 0.5
+
+
+def test_begin_restarts_the_journal(tmp_path):
+    journal = Journal(str(tmp_path / 'cp.journal'))
+    offspring = make_offspring(2)
+    journal.begin(dict(generation=1, offspring=offspring))
+    evaluate(offspring[0])
+    journal.record(offspring, offspring[:1])
+
+    journal.begin(dict(generation=2, offspring=make_offspring(2)))
+    checkpoint, done = journal.load()
+    assert checkpoint['generation'] == 2
+    assert done == 0
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    fname = str(tmp_path / 'cp.journal')
+    journal = Journal(fname)
+    offspring = make_offspring(2)
+    journal.begin(dict(generation=1, offspring=offspring))
+    for ind in offspring:
+        evaluate(ind)
+    journal.record(offspring, offspring[:1])
+    journal.record(offspring, offspring[1:])
+
+    # A crash while writing the last record
+    with open(fname, 'rb') as f:
+        data = f.read()
+    with open(fname, 'wb') as f:
+        f.write(data[:-5])
+
+    checkpoint, done = journal.load()
+    assert done == 1
+    assert [ind.fitness.valid for ind in checkpoint['offspring']] == [True, False]
+
+
+def test_remove(tmp_path):
+    journal = Journal(str(tmp_path / 'cp.journal'))
+    journal.remove()
+    journal.begin(dict(generation=1, offspring=[]))
+    journal.remove()
+    assert journal.load() is None
@@ -0,0 +1,53 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Tests of the MOEA/D scalarizing functions."""
+
+import numpy as np
+
+from smoc.optimizer.moead import scalarize
+
+WEIGHTS = np.array([[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]])
+IDEAL = np.zeros(2)
+
+
+def test_tchebycheff():
+    points = np.array([[0.2, 0.6], [0.4, 0.4]])
+    values = scalarize(points, WEIGHTS, IDEAL)
+    assert values.shape == (2, 3)
+    assert np.allclose(values, [[0.2, 0.3, 0.6], [0.4, 0.2, 0.4]])
+
+
+def test_tchebycheff_null_weights_still_count():
+    points = np.array([[0.0, 0.0], [0.0, 0.5]])
+    values = scalarize(points, WEIGHTS[:1], IDEAL)
+    # Both points are at the ideal of the weighted objective, so the second
+    # one is worse for its null-weighted objective
+    assert values[0, 0] < values[1, 0]
+
+
+def test_pbi():
+    points = np.array([[0.5, 0.5], [1.0, 0.0]])
+    values = scalarize(points, WEIGHTS[1:2], IDEAL, decomposition='pbi', theta=5.0)
+    # On the weight direction there is no penalty
+    assert np.isclose(values[0, 0], np.sqrt(0.5))
+    # Off the direction, the distance along it plus the penalized distance to it
+    assert np.isclose(values[1, 0], np.sqrt(0.5) + 5.0 * np.sqrt(0.5))
+
+
+def test_relative_to_the_ideal_point():
+    points = np.array([[1.2, 1.6]])
+    shifted = scalarize(points, WEIGHTS, np.array([1.0, 1.0]))
+    assert np.allclose(shifted, scalarize(points - 1.0, WEIGHTS, IDEAL))
@@ -0,0 +1,95 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Tests of the NSGA-III reference points and niching."""
+
+import random
+
+import numpy as np
+
+from smoc.optimizer.individual import individual_class
+from smoc.optimizer.nsga3 import (associate, das_dennis, default_divisions, normalize,
+                                  num_ref_points, sel_nsga3)
+
+
+def test_das_dennis_points_in_the_simplex():
+    for num_obj, divisions in ((2, 4), (3, 4), (4, 3)):
+        points = das_dennis(num_obj, divisions)
+        assert points.shape == (num_ref_points(num_obj, divisions), num_obj)
+        assert np.allclose(points.sum(axis=1), 1.0)
+        assert (points >= 0).all()
+        # The coordinates are multiple of 1/divisions and all points differ
+        assert np.allclose(points * divisions, np.round(points * divisions))
+        assert len(np.unique(points, axis=0)) == len(points)
+
+
+def test_das_dennis_two_objectives():
+    points = das_dennis(2, 2)
+    assert sorted(map(tuple, points)) == [(0.0, 1.0), (0.5, 0.5), (1.0, 0.0)]
+
+
+def test_num_ref_points():
+    assert num_ref_points(3, 12) == 91
+    assert num_ref_points(2, 5) == 6
+
+
+def test_default_divisions():
+    assert default_divisions(3, 92) == 12
+    assert default_divisions(3, 90) == 11
+    assert default_divisions(5, 2) == 1
+
+
+def test_normalize_to_the_intercepts():
+    points = np.array([[1.0, 5.0], [3.0, 3.0], [5.0, 1.0]])
+    norm = normalize(points)
+    assert np.allclose(norm.min(axis=0), 0.0)
+    assert np.allclose(norm, [[0.0, 1.0], [0.5, 0.5], [1.0, 0.0]])
+
+
+def test_associate_to_the_closest_line():
+    ref_points = das_dennis(2, 2)
+    points = np.array([[1.0, 0.1], [0.4, 0.5], [0.0, 2.0]])
+    niche, dist = associate(points, ref_points)
+
+    expected = [int(np.flatnonzero((ref_points == ref).all(axis=1))[0])
+                for ref in ([1.0, 0.0], [0.5, 0.5], [0.0, 1.0])]
+    assert niche.tolist() == expected
+    assert np.allclose(dist, [0.1, np.sqrt(0.005), 0.0])
+
+
+def test_sel_nsga3_spreads_the_last_front():
+    cls = individual_class((-1.0, -1.0))
+    individuals = []
+    # A cluster near the first objective axis and the two extremes
+    for values in ((0.0, 1.0), (0.1, 0.9), (0.12, 0.88), (0.14, 0.86), (1.0, 0.0)):
+        ind = cls([0.0])
+        ind.fitness.values = values
+        individuals.append(ind)
+
+    chosen = sel_nsga3(individuals, 3, das_dennis(2, 2), rng=random.Random(0))
+    assert len(chosen) == 3
+    assert individuals[0] in chosen and individuals[4] in chosen
+
+
+def test_sel_nsga3_keeps_the_first_fronts():
+    cls = individual_class((-1.0, -1.0))
+    individuals = []
+    for values in ((0.0, 0.0), (1.0, 1.0), (2.0, 2.0)):
+        ind = cls([0.0])
+        ind.fitness.values = values
+        individuals.append(ind)
+
+    chosen = sel_nsga3(individuals, 2, das_dennis(2, 2), rng=random.Random(0))
+    assert chosen == individuals[:2]
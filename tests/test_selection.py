@@ -0,0 +1,96 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Tests of the constraint-domination selection."""
+
+import numpy as np
+
+from smoc.optimizer.individual import individual_class
+from smoc.optimizer.selection import (constrained_domination, crowding_distance,
+                                      sel_constrained_nsga2, sort_constrained_fronts,
+                                      sort_fronts)
+
+
+def make_individuals(wvalues, violations):
+    """Create individuals with the given weighted fitness and violations."""
+    cls = individual_class((1.0, 1.0))
+    individuals = []
+    for values, violation in zip(wvalues, violations):
+        ind = cls([0.0])
+        ind.fitness.values = values
+        ind.violation = violation
+        individuals.append(ind)
+    return individuals
+
+
+def test_feasible_dominates_infeasible():
+    wvalues = np.array([[0.0, 0.0], [10.0, 10.0]])
+    dom = constrained_domination(wvalues, np.array([0.0, 0.5]))
+    assert dom[0, 1] and not dom[1, 0]
+
+
+def test_infeasible_compared_by_violation():
+    wvalues = np.array([[0.0, 0.0], [10.0, 10.0]])
+    dom = constrained_domination(wvalues, np.array([0.1, 0.5]))
+    assert dom[0, 1] and not dom[1, 0]
+
+    # Equal violations don't dominate, whatever the objectives
+    dom = constrained_domination(wvalues, np.array([0.5, 0.5]))
+    assert not dom.any()
+
+
+def test_feasible_compared_by_pareto_domination():
+    wvalues = np.array([[1.0, 1.0], [0.0, 0.0], [2.0, -1.0], [1.0, 1.0]])
+    dom = constrained_domination(wvalues, np.zeros(4))
+    assert dom[0, 1] and not dom[1, 0]
+    assert not dom[0, 2] and not dom[2, 0]
+    # Equal points don't dominate each other
+    assert not dom[0, 3] and not dom[3, 0]
+    assert not dom.diagonal().any()
+
+
+def test_sort_fronts():
+    wvalues = np.array([[3.0, 3.0], [2.0, 2.0], [1.0, 4.0], [1.0, 1.0]])
+    fronts = sort_fronts(constrained_domination(wvalues, np.zeros(4)), 4)
+    assert [sorted(front.tolist()) for front in fronts] == [[0, 2], [1], [3]]
+
+
+def test_sort_fronts_stops_after_k_points():
+    wvalues = np.array([[3.0, 3.0], [2.0, 2.0], [1.0, 1.0]])
+    fronts = sort_fronts(constrained_domination(wvalues, np.zeros(3)), 2)
+    assert [front.tolist() for front in fronts] == [[0], [1]]
+
+
+def test_crowding_distance_keeps_the_extremes():
+    wvalues = np.array([[0.0, 4.0], [1.0, 3.0], [3.0, 1.0], [4.0, 0.0]])
+    dist = crowding_distance(wvalues)
+    assert np.isinf(dist[0]) and np.isinf(dist[3])
+    assert np.allclose(dist[1:3], [1.5, 1.5])
+
+
+def test_sort_constrained_fronts():
+    individuals = make_individuals([(0.0, 0.0), (5.0, 5.0), (6.0, 6.0), (1.0, 1.0)],
+                                   [0.0, 0.2, 0.1, 0.0])
+    fronts = sort_constrained_fronts(individuals)
+    assert fronts == [[individuals[3]], [individuals[0]], [individuals[2]], [individuals[1]]]
+
+
+def test_sel_constrained_nsga2_prefers_feasible():
+    individuals = make_individuals([(9.0, 9.0), (0.0, 1.0), (1.0, 0.0), (8.0, 8.0)],
+                                   [0.3, 0.0, 0.0, 0.1])
+    chosen = sel_constrained_nsga2(individuals, 3)
+    assert len(chosen) == 3
+    assert individuals[1] in chosen and individuals[2] in chosen
+    assert individuals[3] in chosen
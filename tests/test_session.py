@@ -0,0 +1,67 @@
+# This file is part of SMOC
+# Copyright (C) 2018  Miguel Fernandes
+#
+# SMOC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMOC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""Tests of the server sessions."""
+
+from smoc_cadence.session import Sessions
+
+
+def test_open_new_and_reopen():
+    sessions = Sessions()
+    session = sessions.open()
+    assert sessions.last == session
+    assert sessions.open(session) == session
+
+    other = sessions.open('unknown')
+    assert other not in (session, 'unknown')
+    assert sessions.last == other
+
+
+def test_buffered_response():
+    sessions = Sessions()
+    session = sessions.open()
+    sessions.store(session, 1, {'type': 'updateAndRun', 'id': 1})
+    assert sessions.get(session, 1) == {'type': 'updateAndRun', 'id': 1}
+    assert sessions.get(session, 2) is None
+    # The buffers survive a reconnection
+    assert sessions.get(sessions.open(session), 1)['id'] == 1
+
+
+def test_buffer_keeps_the_last_responses():
+    sessions = Sessions(buffer_size=2)
+    session = sessions.open()
+    for req_id in (1, 2, 3):
+        sessions.store(session, req_id, {'id': req_id})
+    assert sessions.get(session, 1) is None
+    assert sessions.get(session, 2) == {'id': 2}
+    assert sessions.get(session, 3) == {'id': 3}
+
+
+def test_sessions_are_independent():
+    sessions = Sessions()
+    first, second = sessions.open(), sessions.open()
+    sessions.store(first, 1, {'id': 1})
+    assert sessions.get(second, 1) is None
+
+
+def test_requests_without_session_or_id_are_not_buffered():
+    sessions = Sessions()
+    session = sessions.open()
+    sessions.store(None, 1, {'id': 1})
+    sessions.store(session, None, {'id': None})
+    sessions.store('unknown', 1, {'id': 1})
+    assert sessions.buffers == {session: []}
+    assert sessions.get(None, 1) is None
+    assert sessions.get(session, None) is None